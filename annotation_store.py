@@ -0,0 +1,285 @@
+# annotation_store.py
+import os
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from spatial_index import GridIndex
+
+_EMPTY_XYXY = np.zeros((0, 4), dtype=np.float32)
+_EMPTY_CLASS_IDS = np.zeros(0, dtype=np.int16)
+_EMPTY_BOX_IDS = np.zeros(0, dtype=np.int64)
+
+
+class ImageBoxes:
+    """
+    Columnar boxes of one image: pixel xyxy (float32), class ids (int16) and
+    stable box ids (int64). Treated as immutable once stored.
+    """
+    __slots__ = ("xyxy", "class_ids", "box_ids")
+
+    def __init__(self, xyxy=_EMPTY_XYXY, class_ids=_EMPTY_CLASS_IDS, box_ids=_EMPTY_BOX_IDS):
+        self.xyxy = xyxy
+        self.class_ids = class_ids
+        self.box_ids = box_ids
+
+    def __len__(self):
+        return len(self.box_ids)
+
+    def row(self, box_id):
+        rows = np.flatnonzero(self.box_ids == box_id)
+        if not len(rows):
+            raise KeyError(box_id)
+        return int(rows[0])
+
+
+class AnnotationStore:
+    """
+    Array-backed storage for all bounding boxes of a project, replacing the
+    old dict of (QRectF, class_name) tuples. Class names are stored once and
+    boxes reference them by index into class_names, which is also the YOLO
+    class id. Box ids are unique for the lifetime of the store so GUI items
+    can refer to a box even after it has been moved.
+
+    Every mutation replaces the arrays of the image instead of writing into
+    them, so a reference taken from boxes() is an immutable snapshot that can
+    safely be handed to a worker thread. Images modified since their label
+    file was last written are tracked in `dirty`.
+    """
+    def __init__(self, class_names=()):
+        self._images = {}  # image path -> ImageBoxes
+        self.dirty = set()  # image paths with unsaved changes
+        self._spatial = {}  # image path -> GridIndex, built on first query and kept in sync
+        self._box_ids = itertools.count(1)
+        self.class_names = []
+        self.class_to_id = {}
+        self.set_class_names(class_names)
+
+    # ---------------- CLASSES -----------------
+
+    def set_class_names(self, class_names):
+        """
+        Sets the class list. Existing boxes are remapped by name; boxes whose
+        class no longer exists are dropped. Images whose class ids or boxes
+        changed are marked dirty, including images left without boxes.
+        Returns the number of dropped boxes per removed class name.
+        """
+        class_names = list(class_names)
+        dropped = {}
+        if self._images and class_names != self.class_names:
+            new_ids = {name: i for i, name in enumerate(class_names)}
+            lookup = np.array([new_ids.get(name, -1) for name in self.class_names] or [-1], dtype=np.int16)
+            identity = np.arange(len(lookup), dtype=np.int16)
+            counts = np.zeros(len(lookup), dtype=np.int64)
+            for path, boxes in list(self._images.items()):
+                if not len(boxes):
+                    continue
+                remapped = lookup[boxes.class_ids]
+                keep = remapped >= 0
+                if not keep.all():
+                    counts += np.bincount(boxes.class_ids[~keep], minlength=len(lookup))
+                    self._images[path] = ImageBoxes(boxes.xyxy[keep], remapped[keep], boxes.box_ids[keep])
+                    self._spatial.pop(path, None)
+                elif (remapped != identity[boxes.class_ids]).any():
+                    self._images[path] = ImageBoxes(boxes.xyxy, remapped, boxes.box_ids)
+                else:
+                    continue
+                # The label file has other boxes or class ids now
+                self.dirty.add(path)
+            dropped = {self.class_names[i]: int(c) for i, c in enumerate(counts) if c}
+        self.class_names = class_names
+        self.class_to_id = {name: i for i, name in enumerate(class_names)}
+        return dropped
+
+    def count_boxes(self, class_names):
+        """Number of boxes whose class is one of class_names."""
+        ids = [self.class_to_id[name] for name in class_names if name in self.class_to_id]
+        if not ids:
+            return 0
+        return sum(int(np.isin(boxes.class_ids, ids).sum()) for boxes in self._images.values())
+
+    def class_id(self, class_name):
+        return self.class_to_id[class_name]
+
+    def class_name(self, class_id):
+        return self.class_names[class_id]
+
+    # ---------------- BOXES -----------------
+
+    def __contains__(self, image_path):
+        return image_path in self._images
+
+    def __len__(self):
+        return len(self._images)
+
+    def paths(self):
+        return self._images.keys()
+
+    def boxes(self, image_path):
+        """Returns the ImageBoxes of an image (empty if it has none). Arrays must not be modified in place."""
+        return self._images.get(image_path) or ImageBoxes()
+
+    def box_count(self, image_path=None):
+        if image_path is not None:
+            return len(self.boxes(image_path))
+        return sum(len(b) for b in self._images.values())
+
+    def set_boxes(self, image_path, xyxy, class_ids, dirty=False):
+        """
+        Replaces all boxes of an image and returns the new box ids. Boxes read
+        from an existing label file are clean; pass dirty=True for edits.
+        """
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        class_ids = np.asarray(class_ids, dtype=np.int16).reshape(-1)
+        box_ids = np.fromiter(itertools.islice(self._box_ids, len(xyxy)), dtype=np.int64, count=len(xyxy))
+        self._images[image_path] = ImageBoxes(xyxy, class_ids, box_ids)
+        self._spatial.pop(image_path, None)
+        if dirty:
+            self.dirty.add(image_path)
+        else:
+            self.dirty.discard(image_path)
+        return box_ids
+
+    def add_box(self, image_path, x1, y1, x2, y2, class_id):
+        """Appends a box and returns its id."""
+        boxes = self.boxes(image_path)
+        box_id = next(self._box_ids)
+        self._images[image_path] = ImageBoxes(
+            np.vstack([boxes.xyxy, np.array([[x1, y1, x2, y2]], dtype=np.float32)]),
+            np.append(boxes.class_ids, np.int16(class_id)),
+            np.append(boxes.box_ids, np.int64(box_id))
+        )
+        if image_path in self._spatial:
+            self._spatial[image_path].insert(box_id, x1, y1, x2, y2)
+        self.dirty.add(image_path)
+        return box_id
+
+    def update_box(self, image_path, box_id, x1, y1, x2, y2):
+        boxes = self._images[image_path]
+        row = boxes.row(box_id)
+        xyxy = boxes.xyxy.copy()
+        xyxy[row] = (x1, y1, x2, y2)
+        self._images[image_path] = ImageBoxes(xyxy, boxes.class_ids, boxes.box_ids)
+        if image_path in self._spatial:
+            self._spatial[image_path].update(box_id, x1, y1, x2, y2)
+        self.dirty.add(image_path)
+
+    def remove_box(self, image_path, box_id):
+        boxes = self._images[image_path]
+        keep = boxes.box_ids != box_id
+        self._images[image_path] = ImageBoxes(boxes.xyxy[keep], boxes.class_ids[keep], boxes.box_ids[keep])
+        if image_path in self._spatial:
+            self._spatial[image_path].remove(box_id)
+        self.dirty.add(image_path)
+
+    def clear(self, image_path=None):
+        if image_path is None:
+            self._images.clear()
+            self._spatial.clear()
+            self.dirty.clear()
+        else:
+            self._images.pop(image_path, None)
+            self._spatial.pop(image_path, None)
+            self.dirty.discard(image_path)
+
+    def spatial_index(self, image_path):
+        """Returns the GridIndex of an image's boxes (keyed by box id) for point/region/nearest queries."""
+        index = self._spatial.get(image_path)
+        if index is None:
+            boxes = self.boxes(image_path)
+            index = GridIndex.from_boxes(boxes.box_ids, boxes.xyxy)
+            self._spatial[image_path] = index
+        return index
+
+    def snapshot(self, image_path):
+        """Returns the current ImageBoxes object; compare with `is` to detect later edits."""
+        return self._images.get(image_path)
+
+
+# ---------------- YOLO LABEL FILES -----------------
+
+def label_path_for_image(image_path, label_dir=None):
+    """Labels live in a `labels` folder next to the images (or in label_dir), one .txt per image."""
+    return os.path.join(
+        label_dir if label_dir is not None else os.path.join(os.path.dirname(image_path), "labels"),
+        os.path.splitext(os.path.basename(image_path))[0] + ".txt"
+    )
+
+
+def read_yolo_labels(label_path, img_w, img_h, num_classes=None):
+    """Parses a YOLO label file into pixel xyxy (float32) and class ids (int16)."""
+    with open(label_path, "r") as f:
+        values = np.array(f.read().split(), dtype=np.float64)
+    if values.size % 5:
+        raise ValueError(f"Malformed label file: {label_path}")
+    rows = values.reshape(-1, 5)
+    class_ids = rows[:, 0].astype(np.int16)
+    if num_classes is not None and len(class_ids) and (class_ids.min() < 0 or class_ids.max() >= num_classes):
+        raise ValueError(f"Unknown class id in {label_path}")
+    xc, yc, w, h = rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4]
+    xyxy = np.stack([
+        (xc - w / 2) * img_w,
+        (yc - h / 2) * img_h,
+        (xc + w / 2) * img_w,
+        (yc + h / 2) * img_h,
+    ], axis=1).astype(np.float32)
+    return xyxy, class_ids
+
+
+def format_yolo_labels(xyxy, class_ids, img_w, img_h):
+    """Formats pixel xyxy boxes as the text of a YOLO label file."""
+    if not len(xyxy):
+        return ""
+    xyxy = xyxy.astype(np.float64)
+    x_c = (xyxy[:, 0] + xyxy[:, 2]) / 2 / img_w
+    y_c = (xyxy[:, 1] + xyxy[:, 3]) / 2 / img_h
+    w = (xyxy[:, 2] - xyxy[:, 0]) / img_w
+    h = (xyxy[:, 3] - xyxy[:, 1]) / img_h
+    return "".join(
+        f"{c} {x:.6f} {y:.6f} {bw:.6f} {bh:.6f}\n"
+        for c, x, y, bw, bh in zip(class_ids.tolist(), x_c.tolist(), y_c.tolist(), w.tolist(), h.tolist())
+    )
+
+
+def write_yolo_labels(label_path, xyxy, class_ids, img_w, img_h):
+    """Writes a label file atomically: a temp file in the same folder is renamed over the target."""
+    os.makedirs(os.path.dirname(label_path), exist_ok=True)
+    tmp_path = f"{label_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(format_yolo_labels(xyxy, class_ids, img_w, img_h))
+    os.replace(tmp_path, label_path)
+
+
+def save_annotations(store, image_paths, image_sizes, max_workers=None):
+    """
+    Writes the label files of the given images in parallel. Each image is
+    normalised with its own dimensions from image_sizes (an ImageSizeIndex).
+    Images whose boxes were not edited while saving are marked clean.
+    Returns a list of (image_path, error message) for the files that failed.
+    """
+    snapshots = [(path, store.snapshot(path)) for path in image_paths]
+
+    def save_one(item):
+        path, boxes = item
+        if boxes is None:
+            return  # Never loaded, so the existing label file is still current
+        size = image_sizes.get(path)
+        if size is None:
+            raise ValueError("could not read image dimensions")
+        write_yolo_labels(label_path_for_image(path), boxes.xyxy, boxes.class_ids, size[0], size[1])
+
+    errors = []
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) * 4)  # Mostly waiting on I/O
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [(item, pool.submit(save_one, item)) for item in snapshots]
+        for (path, boxes), future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append((path, str(e)))
+                continue
+            if store.snapshot(path) is boxes:
+                store.dirty.discard(path)
+    return errors
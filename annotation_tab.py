@@ -1,19 +1,30 @@
 import os
 import cv2
 import yaml
+import numpy as np
 
 from PyQt5.QtWidgets import (
-    QWidget, QPushButton, QVBoxLayout, QLabel, QFileDialog,
+    QApplication, QWidget, QPushButton, QVBoxLayout, QLabel, QFileDialog,
     QHBoxLayout, QComboBox, QMessageBox, QShortcut,
     QDialog, QGraphicsScene, QGraphicsRectItem, QGraphicsTextItem,
     QGraphicsPixmapItem, QGraphicsView
 )
 from PyQt5.QtGui import (
-    QPixmap, QImage, QPen, QColor, QCursor, QKeySequence, QBrush, QFont
+    QPixmap, QPen, QColor, QCursor, QKeySequence, QBrush, QFont,
+    QPixmapCache, QImageReader
 )
-from PyQt5.QtCore import Qt, QRectF
+from PyQt5.QtCore import Qt, QRectF, QSize, QTimer
 
 from class_editor import ClassEditorDialog, InputDialog
+from annotation_store import AnnotationStore, read_yolo_labels, save_annotations, label_path_for_image
+from image_probe import ImageSizeIndex
+from image_cache import ImageCache, ImagePrefetcher
+from edit_journal import EditJournal, JournalCompactor
+from folder_index import FolderIndexer, merge_sorted_paths
+from thumbnail_cache import ThumbnailStrip
+from spatial_index import box_iou
+from update_scheduler import UpdateScheduler
+from tiled_image_item import TiledImageItem, TILED_RENDERING_MIN_PIXELS
 from PyQt5.QtWidgets import QGraphicsView
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QTransform
@@ -24,42 +35,59 @@ class BoundingBoxItem(QGraphicsRectItem):
     A custom QGraphicsRectItem subclass that displays a rectangular bounding box
     plus a text label for the associated class name.
     """
-    def __init__(self, rect, class_name, color, annotation_tab=None):
+    def __init__(self, rect, class_name, color, annotation_tab=None, box_id=None):
         super().__init__(rect)
-        self.class_name = class_name
-        self.color = color
+        self.class_name = None
+        self.color = None
+        self.box_id = None  # Id of the backing box in the AnnotationStore
         self.annotation_tab = annotation_tab
 
-        # Configure appearance
-        self.setPen(QPen(self.color, 2))
-        self.setBrush(QBrush(QColor(self.color.red(),
-                                    self.color.green(),
-                                    self.color.blue(),
-                                    80)))
         self.setFlag(QGraphicsRectItem.ItemIsSelectable, True)
         self.setFlag(QGraphicsRectItem.ItemIsMovable, True)
         self.setFlag(QGraphicsRectItem.ItemSendsGeometryChanges, True)
 
         # Add a text label
-        self.label_text = QGraphicsTextItem(self.class_name, self)
-        font = QFont("Arial", 20, QFont.Bold)
-        self.label_text.setFont(font)
+        self.label_text = QGraphicsTextItem(self)
+        self.label_text.setFont(QFont("Arial", 20, QFont.Bold))
         self.label_text.setDefaultTextColor(Qt.white)
-        self.label_text.setPos(rect.topLeft())
+
+        self.configure(rect, class_name, color, box_id)
+
+    def configure(self, rect, class_name, color, box_id=None):
+        """(Re)initialises the item in place so pooled items can be reused for another box."""
+        self.box_id = None  # Resetting the position below must not be reported as a move
+        self.setPos(0, 0)
+        self.setRect(rect)
+        if color != self.color:
+            self.color = color
+            self.setPen(QPen(self.color, 2))
+            self.setBrush(QBrush(QColor(self.color.red(),
+                                        self.color.green(),
+                                        self.color.blue(),
+                                        80)))
+        if class_name != self.class_name:
+            self.class_name = class_name
+            self.label_text.setPlainText(class_name)
+        self.box_id = box_id
 
     def itemChange(self, change, value):
         if change == QGraphicsRectItem.ItemPositionChange:
             new_rect = self.rect().translated(value - self.pos())
             self.label_text.setPos(new_rect.topLeft())
         elif change == QGraphicsRectItem.ItemPositionHasChanged:
-            if self.annotation_tab:
-                self.annotation_tab.update_image_info()
+            if self.annotation_tab and self.box_id is not None:
+                # Store/label updates are coalesced to once per frame while dragging
+                self.annotation_tab.schedule_box_moved(self)
         return super().itemChange(change, value)
 
     def setRect(self, rect):
         super().setRect(rect)
         self.label_text.setPos(self.rect().topLeft())
 
+    def scene_rect(self):
+        """The box in image coordinates, including any offset from dragging."""
+        return self.rect().translated(self.pos())
+
 
 class CustomGraphicsView(QGraphicsView):
     def __init__(self, annotation_tab, parent=None):
@@ -81,6 +109,11 @@ class CustomGraphicsView(QGraphicsView):
         self.drawing = False
         self.start_point = None
         self.current_rect_item = None
+        self._draw_point = None
+
+        # Shift + left-drag rubber band that selects the boxes inside it
+        self._band_start = None
+        self._band_item = None
 
     def mousePressEvent(self, event):
         if event.button() == Qt.RightButton:
@@ -91,20 +124,32 @@ class CustomGraphicsView(QGraphicsView):
             event.accept()
             return
 
+        if event.button() == Qt.LeftButton and event.modifiers() & Qt.ControlModifier:
+            # Select the box under (or nearest to) the cursor.
+            self.annotation_tab.select_box_at(self.mapToScene(event.pos()),
+                                              add=bool(event.modifiers() & Qt.ShiftModifier))
+            event.accept()
+            return
+
+        if event.button() == Qt.LeftButton and event.modifiers() & Qt.ShiftModifier:
+            # Start a rubber band selection.
+            self._band_start = self.mapToScene(event.pos())
+            self._band_item = QGraphicsRectItem(QRectF(self._band_start, self._band_start))
+            self._band_item.setPen(QPen(Qt.white, 0, Qt.DashLine))
+            self.annotation_tab.scene.addItem(self._band_item)
+            event.accept()
+            return
+
         if event.button() == Qt.LeftButton and self.annotation_tab.current_class:
             # Start drawing a bounding box.
             self.drawing = True
             self.start_point = self.mapToScene(event.pos())
             color = self.annotation_tab.classes[self.annotation_tab.current_class]
-            from annotation_tab import BoundingBoxItem  # if needed
-            rect_item = BoundingBoxItem(
+            self.current_rect_item = self.annotation_tab.acquire_box_item(
                 QRectF(self.start_point, self.start_point),
                 self.annotation_tab.current_class,
-                color,
-                annotation_tab=self.annotation_tab
+                color
             )
-            self.annotation_tab.scene.addItem(rect_item)
-            self.current_rect_item = rect_item
             event.accept()
             return
 
@@ -123,16 +168,25 @@ class CustomGraphicsView(QGraphicsView):
             event.accept()
             return
 
+        if self._band_item is not None:
+            self._band_item.setRect(QRectF(self._band_start, self.mapToScene(event.pos())).normalized())
+            event.accept()
+            return
+
         # Handle drawing if left button is active.
         if self.drawing and self.current_rect_item:
-            current_point = self.mapToScene(event.pos())
-            rect = QRectF(self.start_point, current_point).normalized()
-            self.current_rect_item.setRect(rect)
+            # Only the latest point matters; the rect is updated once per frame.
+            self._draw_point = self.mapToScene(event.pos())
+            self.annotation_tab.update_scheduler.schedule("draw", self._apply_draw_rect)
             event.accept()
             return
 
         super().mouseMoveEvent(event)
 
+    def _apply_draw_rect(self):
+        if self.drawing and self.current_rect_item:
+            self.current_rect_item.setRect(QRectF(self.start_point, self._draw_point).normalized())
+
     def mouseReleaseEvent(self, event):
         # End panning on right mouse release.
         if event.button() == Qt.RightButton and self._pan_start is not None:
@@ -142,22 +196,37 @@ class CustomGraphicsView(QGraphicsView):
             event.accept()
             return
 
+        if event.button() == Qt.LeftButton and self._band_item is not None:
+            rect = self._band_item.rect()
+            self.annotation_tab.scene.removeItem(self._band_item)
+            self._band_item = None
+            self._band_start = None
+            self.annotation_tab.select_boxes_in_rect(rect)
+            event.accept()
+            return
+
         # End drawing on left mouse release.
         if event.button() == Qt.LeftButton and self.drawing:
             self.drawing = False
+            self.annotation_tab.update_scheduler.cancel("draw")
             end_point = self.mapToScene(event.pos())
             rect = QRectF(self.start_point, end_point).normalized()
+            if self.current_rect_item:
+                self.current_rect_item.setRect(rect)
 
             if rect.width() < 5 or rect.height() < 5:
                 if self.current_rect_item:
-                    self.annotation_tab.scene.removeItem(self.current_rect_item)
+                    self.annotation_tab.release_box_item(self.current_rect_item)
             else:
                 image_path = self.annotation_tab.image_paths[self.annotation_tab.current_image_index]
-                if image_path not in self.annotation_tab.image_boxes:
-                    self.annotation_tab.image_boxes[image_path] = []
-                self.annotation_tab.image_boxes[image_path].append(
-                    (rect, self.annotation_tab.current_class)
+                store = self.annotation_tab.annotation_store
+                self.current_rect_item.box_id = store.add_box(
+                    image_path, rect.left(), rect.top(), rect.right(), rect.bottom(),
+                    store.class_id(self.annotation_tab.current_class)
                 )
+                self.annotation_tab.box_items[self.current_rect_item.box_id] = self.current_rect_item
+                self.annotation_tab.journal_edit(image_path)
+                self.annotation_tab.warn_overlaps(image_path, self.current_rect_item.box_id)
             self.current_rect_item = None
             event.accept()
             return
@@ -199,6 +268,7 @@ class AnnotationTab(QWidget):
         self.next_button.setEnabled(False)
 
         self.image_info_label = QLabel("No folder loaded", self)
+        self.save_status_label = QLabel("", self)
 
         # -- Zooming UI elements have been removed --
         # self.zoom_slider = QSlider(Qt.Horizontal, self)
@@ -229,6 +299,7 @@ class AnnotationTab(QWidget):
         top_hbox.addWidget(self.load_folder_button)
         top_hbox.addWidget(self.image_info_label)
         top_hbox.addStretch(1)
+        top_hbox.addWidget(self.save_status_label)
 
         nav_hbox = QHBoxLayout()
         nav_hbox.addWidget(self.prev_button)
@@ -255,6 +326,11 @@ class AnnotationTab(QWidget):
         self.image_view.setScene(self.scene)
 
         main_layout.addWidget(self.image_view)
+
+        # Filmstrip overview of the folder, backed by the on-disk thumbnail cache
+        self.thumbnail_strip = ThumbnailStrip(parent=self)
+        self.thumbnail_strip.image_activated.connect(self.jump_to_image)
+        main_layout.addWidget(self.thumbnail_strip)
         # main_layout.addLayout(zoom_hbox)  <-- Removed zoom layout
         main_layout.addWidget(self.edit_classes_button)
         main_layout.addLayout(class_hbox)
@@ -265,10 +341,37 @@ class AnnotationTab(QWidget):
         self.image_paths = []
         self.current_image_index = -1
         self.classes = {}
-        self.image_boxes = {}
-        self.pixmap_item = None
+        # All boxes of the project, per image path (see annotation_store.py)
+        self.annotation_store = AnnotationStore()
+        # Dimensions of every image, so labels are never normalised with the wrong size
+        self.image_sizes = ImageSizeIndex()
+        self.pixmap_item = None  # QGraphicsPixmapItem, or TiledImageItem for very large images
+        self.image_size = QSize()
         self.current_class = None
 
+        # Box items of the current image (box id -> item) and hidden items kept for reuse
+        self.box_items = {}
+        self._box_item_pool = []
+        self.max_pooled_box_items = 5000
+
+        # Batches label/status/store updates from drag events to one per frame
+        self.update_scheduler = UpdateScheduler(parent=self)
+
+        # Pyramid/tile rendering for very large images
+        self.tiled_rendering = True
+        QPixmapCache.setCacheLimit(256 * 1024)  # KB, holds the rendered tiles
+
+        # Decoded image cache + background prefetch of neighbouring images
+        self.image_cache = ImageCache(max_bytes=512 * 1024 * 1024)
+        self.prefetcher = ImagePrefetcher(self.image_cache, window=2)
+
+        # Background folder indexing + directory watching
+        self.folder_indexer = FolderIndexer(self)
+        self.folder_indexer.index_ready.connect(self.on_index_ready)
+        self.folder_indexer.entries_changed.connect(self.on_index_changed)
+        self.folder_indexer.scan_progress.connect(self.on_index_progress)
+        self.folder_indexer.scan_failed.connect(self.on_index_failed)
+
         # Shortcuts
         self.prev_shortcut = QShortcut(QKeySequence(Qt.Key_Left), self)
         self.prev_shortcut.activated.connect(self.prev_image)
@@ -279,58 +382,137 @@ class AnnotationTab(QWidget):
 
         # Load settings and classes
         self.load_classes()
+        self.annotation_store.set_class_names(self.classes.keys())
         self.load_settings()
         self.populate_class_combo()
         self.update_color_preview()
 
+        # Write-behind autosave: edits go to an append-only journal that a
+        # background thread compacts into the label files.
+        self.edit_journal = EditJournal()
+        self._journal_pending = set()  # Edited images not yet written to the journal
+        self._journal_seq = {}         # image path -> seq of its newest journal record
+        self.journal_timer = QTimer(self)
+        self.journal_timer.setSingleShot(True)
+        self.journal_timer.setInterval(250)  # Coalesces drag events into one record
+        self.journal_timer.timeout.connect(self.flush_journal)
+        self.recover_journal()
+        self.journal_compactor = JournalCompactor(self.edit_journal, interval=5.0, parent=self)
+        self.journal_compactor.compacted.connect(self.on_journal_compacted)
+        self.journal_compactor.failed.connect(self.on_journal_failed)
+        self.journal_compactor.start()
+
     # ---------------- FOLDER / IMAGE LOADING -----------------
 
     def load_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "Select Image Folder")
         if folder_path:
-            self.image_paths = [
-                os.path.join(folder_path, f) for f in os.listdir(folder_path)
-                if f.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff', '.bmp'))
-            ]
-            if self.image_paths:
-                self.current_image_index = 0
-                self.load_image()
-                self.update_image_info()
-                self.prev_button.setEnabled(True)
-                self.next_button.setEnabled(True)
-                self.save_button.setEnabled(True)
-                self.save_all_button.setEnabled(True)
-            else:
-                self.clear_image()
-                self.image_info_label.setText("No images found in folder.")
-                self.current_image_index = -1
-                self.prev_button.setEnabled(False)
-                self.next_button.setEnabled(False)
-                self.save_button.setEnabled(False)
-                self.save_all_button.setEnabled(False)
+            # Indexing runs in the background; results arrive via on_index_ready/on_index_changed
+            self.image_info_label.setText("Indexing folder...")
+            self.folder_indexer.open(folder_path)
+
+    def on_index_ready(self, folder_path, names):
+        self.image_paths = [os.path.join(folder_path, n) for n in names]
+        self.thumbnail_strip.set_paths(self.image_paths)
+        self.prefetcher.clear()
+        if self.image_paths:
+            self.current_image_index = 0
+            self.load_image()
+            self.update_image_info()
+            self.prev_button.setEnabled(True)
+            self.next_button.setEnabled(True)
+            self.save_button.setEnabled(True)
+            self.save_all_button.setEnabled(True)
+        else:
+            self.clear_image()
+            self.image_info_label.setText("No images found in folder.")
+            self.current_image_index = -1
+            self.prev_button.setEnabled(False)
+            self.next_button.setEnabled(False)
+            self.save_button.setEnabled(False)
+            self.save_all_button.setEnabled(False)
+
+    def on_index_changed(self, folder_path, added, removed):
+        """Applies files added to/removed from the open folder without a full reload."""
+        if not self.image_paths:
+            self.on_index_ready(folder_path, self.folder_indexer.names)
+            return
+
+        current_path = None
+        if 0 <= self.current_image_index < len(self.image_paths):
+            current_path = self.image_paths[self.current_image_index]
+
+        removed_paths = [os.path.join(folder_path, n) for n in removed]
+        for path in removed_paths:
+            self.image_cache.discard(path)
+            self.image_sizes.discard(path)
+        self.image_paths = merge_sorted_paths(
+            self.image_paths,
+            [os.path.join(folder_path, n) for n in added],
+            removed_paths
+        )
+        self.thumbnail_strip.set_paths(self.image_paths)
+
+        if not self.image_paths:
+            self.on_index_ready(folder_path, [])
+        elif current_path in self.image_paths:
+            # Keep showing the same image even though its position may have moved
+            self.current_image_index = self.image_paths.index(current_path)
+            self.thumbnail_strip.set_current_row(self.current_image_index)
+            self.update_image_info()
+        else:
+            self.current_image_index = min(self.current_image_index, len(self.image_paths) - 1)
+            self.load_image()
+            self.update_image_info()
+
+    def on_index_progress(self, count):
+        self.image_info_label.setText(f"Indexing folder... {count} images found")
+
+    def on_index_failed(self, message):
+        QMessageBox.critical(self, "Error", f"Error reading folder: {message}")
 
     def load_image(self):
+        # Pending drag updates refer to the image that is being replaced
+        self.update_scheduler.flush()
         if 0 <= self.current_image_index < len(self.image_paths):
             image_path = self.image_paths[self.current_image_index]
             try:
-                q_image = QImage(image_path)
-                if q_image.isNull():
-                    raise ValueError(f"Could not load image at {image_path}")
-
-                pixmap = QPixmap.fromImage(q_image)
-                if pixmap.isNull():
-                    raise ValueError(f"Could not convert QImage at {image_path}")
+                header_size = QImageReader(image_path).size()
+                tiled = (self.tiled_rendering and header_size.isValid()
+                         and header_size.width() * header_size.height() >= TILED_RENDERING_MIN_PIXELS)
+                if tiled:
+                    # Very large image: not decoded here; the item reads it on the prefetch threads
+                    q_image = self.image_cache.get(image_path)  # Used if a prefetch already decoded it
+                else:
+                    q_image = self.prefetcher.load(image_path)
+                    if q_image.isNull():
+                        raise ValueError(f"Could not load image at {image_path}")
 
                 # Remove old pixmap_item if needed
                 if self.pixmap_item:
+                    if isinstance(self.pixmap_item, TiledImageItem):
+                        self.pixmap_item.release()
                     self.scene.removeItem(self.pixmap_item)
                     self.pixmap_item = None
 
-                self.pixmap_item = QGraphicsPixmapItem(pixmap)
+                if tiled:
+                    # Only the visible tiles of a downsampled pyramid are drawn; full-resolution
+                    # tiles are decoded from the file on demand where the format allows it.
+                    self.pixmap_item = TiledImageItem(image_path, header_size, pool=self.prefetcher.pool,
+                                                      image=q_image)
+                    self.image_size = header_size
+                else:
+                    pixmap = QPixmap.fromImage(q_image)
+                    if pixmap.isNull():
+                        raise ValueError(f"Could not convert QImage at {image_path}")
+                    self.pixmap_item = QGraphicsPixmapItem(pixmap)
+                    self.image_size = q_image.size()
+                self.pixmap_item.setZValue(-1)  # Keep pooled box items above the new image
+                self.image_sizes.set(image_path, self.image_size.width(), self.image_size.height())
                 self.scene.addItem(self.pixmap_item)
 
                 # Set scene rect
-                self.scene.setSceneRect(QRectF(pixmap.rect()))
+                self.scene.setSceneRect(QRectF(0, 0, self.image_size.width(), self.image_size.height()))
 
                 # Fit the image in view
                 self.image_view.fitInView(self.pixmap_item, Qt.KeepAspectRatio)
@@ -342,6 +524,10 @@ class AnnotationTab(QWidget):
 
                 self.load_annotations()
 
+                # Start decoding the neighbours so the next navigation is a cache hit
+                self.prefetcher.prefetch(self.image_paths, self.current_image_index)
+                self.thumbnail_strip.set_current_row(self.current_image_index)
+
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Error loading image: {e}")
                 self.clear_image()
@@ -349,14 +535,25 @@ class AnnotationTab(QWidget):
             self.clear_image()
 
     def clear_image(self):
+        if isinstance(self.pixmap_item, TiledImageItem):
+            self.pixmap_item.release()
         self.scene.clear()
+        # scene.clear() deleted the pooled items too
+        self.box_items = {}
+        self._box_item_pool = []
         self.pixmap_item = None
+        self.image_size = QSize()
         if 0 <= self.current_image_index < len(self.image_paths):
             image_path = self.image_paths[self.current_image_index]
-            if image_path in self.image_boxes:
-                self.image_boxes[image_path].clear()
+            self.annotation_store.clear(image_path)
         else:
-            self.image_boxes.clear()
+            self.annotation_store.clear()
+
+    def jump_to_image(self, index):
+        if 0 <= index < len(self.image_paths) and index != self.current_image_index:
+            self.current_image_index = index
+            self.load_image()
+            self.update_image_info()
 
     def next_image(self):
         if self.current_image_index < len(self.image_paths) - 1:
@@ -376,6 +573,13 @@ class AnnotationTab(QWidget):
             idx = self.current_image_index + 1
             tot = len(self.image_paths)
             self.image_info_label.setText(f"Image: {fname} ({idx}/{tot})")
+            stats = self.image_cache.stats()
+            self.image_info_label.setToolTip(
+                f"Image cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%}), {stats['entries']} images, "
+                f"{stats['bytes'] / (1024 * 1024):.0f}/{stats['max_bytes'] / (1024 * 1024):.0f} MB\n"
+                f"{self.update_scheduler.report()}"
+            )
         else:
             self.image_info_label.setText("No folder loaded")
 
@@ -385,85 +589,258 @@ class AnnotationTab(QWidget):
         if not self.image_paths or not self.pixmap_item:
             return
 
-        # Remove existing bounding boxes from the scene
-        for item in self.scene.items():
-            if isinstance(item, BoundingBoxItem):
-                self.scene.removeItem(item)
+        # Return the previous image's boxes to the pool
+        self.release_all_box_items()
 
         image_path = self.image_paths[self.current_image_index]
-        self.image_boxes[image_path] = []
 
-        label_path = os.path.join(
-            os.path.dirname(image_path),
-            "labels",
-            os.path.splitext(os.path.basename(image_path))[0] + ".txt"
-        )
-        if os.path.exists(label_path):
-            try:
-                with open(label_path, "r") as f:
-                    for line in f:
-                        class_id, x_c, y_c, w, h = map(float, line.strip().split())
-                        class_name = list(self.classes.keys())[int(class_id)]
-                        color = self.classes[class_name]
-
-                        img_w = self.pixmap_item.pixmap().width()
-                        img_h = self.pixmap_item.pixmap().height()
-
-                        x = (x_c - w / 2) * img_w
-                        y = (y_c - h / 2) * img_h
-                        bw = w * img_w
-                        bh = h * img_h
-
-                        rect = QRectF(x, y, bw, bh)
-                        box_item = BoundingBoxItem(rect, class_name, color, annotation_tab=self)
-                        self.scene.addItem(box_item)
-                        self.image_boxes[image_path].append((rect, class_name))
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Error loading annotations: {e}")
+        try:
+            # Label files are only parsed the first time an image is shown;
+            # afterwards the store holds the (possibly edited) boxes.
+            if image_path not in self.annotation_store:
+                label_path = label_path_for_image(image_path)
+                if os.path.exists(label_path):
+                    xyxy, class_ids = read_yolo_labels(
+                        label_path,
+                        self.image_size.width(),
+                        self.image_size.height(),
+                        num_classes=len(self.annotation_store.class_names)
+                    )
+                    self.annotation_store.set_boxes(image_path, xyxy, class_ids)
+
+            boxes = self.annotation_store.boxes(image_path)
+            for (x1, y1, x2, y2), class_id, box_id in zip(
+                    boxes.xyxy.tolist(), boxes.class_ids.tolist(), boxes.box_ids.tolist()):
+                class_name = self.annotation_store.class_name(class_id)
+                rect = QRectF(x1, y1, x2 - x1, y2 - y1)
+                self.acquire_box_item(rect, class_name, self.classes[class_name], box_id)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Error loading annotations: {e}")
 
     def save_annotations(self):
         if 0 <= self.current_image_index < len(self.image_paths):
+            self.flush_journal()
             self.save_annotation_for_image(self.image_paths[self.current_image_index])
-            QMessageBox.information(self, "Saved", "Annotations saved for current image.")
 
     def save_all_annotations(self):
-        for image_path in self.image_paths:
-            self.save_annotation_for_image(image_path)
-        QMessageBox.information(self, "Saved", "All annotations saved for all images.")
+        # Only images edited since their last save are written
+        with self.edit_journal.compact_lock:
+            self.flush_journal()
+            dirty = [p for p in self.annotation_store.dirty]
+            errors = self.write_annotations(dirty)
+        if errors:
+            details = "\n".join(f"{os.path.basename(p)}: {e}" for p, e in errors[:10])
+            QMessageBox.warning(self, "Saved with errors",
+                                f"{len(errors)} of {len(dirty)} label files could not be saved:\n{details}")
+        else:
+            # Everything in the journal is now on disk
+            self.edit_journal.discard()
+            self.update_save_status()
 
     def save_annotation_for_image(self, image_path):
-        if not self.pixmap_item:
+        # Like save_all_annotations: no compaction may write an older journaled state over this save
+        with self.edit_journal.compact_lock:
+            self.flush_journal()
+            errors = self.write_annotations([image_path])
+        if errors:
+            QMessageBox.critical(self, "Error", f"Error saving annotations: {errors[0][1]}")
+        self.update_save_status()
+
+    def write_annotations(self, image_paths):
+        """Writes the label files of image_paths in parallel; returns (path, error) for failures."""
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            return save_annotations(self.annotation_store, image_paths, self.image_sizes)
+        finally:
+            QApplication.restoreOverrideCursor()
+
+    # ---------------- AUTOSAVE JOURNAL -----------------
+
+    def journal_edit(self, image_path):
+        """Marks an image as edited; its boxes are journaled shortly after (write-behind)."""
+        self._journal_pending.add(image_path)
+        self.journal_timer.start()
+        self.update_scheduler.schedule("status", lambda: self.save_status_label.setText("Unsaved changes"))
+
+    def flush_journal(self):
+        self.update_scheduler.flush()
+        self.journal_timer.stop()
+        pending, self._journal_pending = self._journal_pending, set()
+        for image_path in pending:
+            size = self.image_sizes.get(image_path)  # Probes the header if not known yet
+            if size is None:
+                # Unreadable right now; keep it pending (and the edit unsaved) for the next flush
+                self._journal_pending.add(image_path)
+                continue
+            self._journal_seq[image_path] = self.edit_journal.append(
+                image_path, self.annotation_store.boxes(image_path),
+                self.annotation_store.class_names, size
+            )
+
+    def recover_journal(self):
+        """Restores edits that were journaled but never written to the label files."""
+        recovered = self.edit_journal.replay()
+        for image_path, record in recovered.items():
+            rows = np.array(record["boxes"], dtype=np.float32).reshape(-1, 5)
+            # Journaled class ids refer to the class list at the time of the edit
+            lookup = np.array([self.annotation_store.class_to_id.get(n, -1) for n in record["classes"]] or [-1],
+                              dtype=np.int16)
+            class_ids = lookup[rows[:, 4].astype(np.int64)]
+            keep = class_ids >= 0
+            self.annotation_store.set_boxes(image_path, rows[keep, :4], class_ids[keep], dirty=True)
+            self.image_sizes.set(image_path, *record["size"])
+            self._journal_seq[image_path] = record["seq"]
+        if recovered:
+            self.save_status_label.setText(f"Recovered unsaved edits for {len(recovered)} images")
+
+    def on_journal_compacted(self, written):
+        for image_path, seq in written.items():
+            # Still dirty if it was edited again after this record was journaled
+            if self._journal_seq.get(image_path) == seq and image_path not in self._journal_pending:
+                self.annotation_store.dirty.discard(image_path)
+                del self._journal_seq[image_path]
+        self.update_save_status()
+
+    def on_journal_failed(self, errors):
+        details = "\n".join(f"{os.path.basename(p)}: {e}" for p, e in errors[:10])
+        self.save_status_label.setText("Autosave failed")
+        self.save_status_label.setToolTip(details)
+
+    def update_save_status(self):
+        if self.annotation_store.dirty or self._journal_pending:
+            self.save_status_label.setText("Unsaved changes")
+        else:
+            self.save_status_label.setText("All changes saved")
+        self.save_status_label.setToolTip("")
+
+    def shutdown(self):
+        """Flushes pending edits and stops the autosave and folder scan threads (called on application exit)."""
+        self.folder_indexer.stop()
+        self.flush_journal()
+        self.journal_compactor.stop()
+        self.edit_journal.close()
+        self.prefetcher.cancel_pending()
+        self.image_sizes.save()
+
+    # ---------------- BOX ITEM POOL -----------------
+
+    def acquire_box_item(self, rect, class_name, color, box_id=None):
+        """Returns a visible BoundingBoxItem for a box, reusing a pooled item when possible."""
+        if self._box_item_pool:
+            item = self._box_item_pool.pop()
+            item.configure(rect, class_name, color, box_id)
+            item.setVisible(True)
+        else:
+            item = BoundingBoxItem(rect, class_name, color, annotation_tab=self, box_id=box_id)
+            self.scene.addItem(item)
+        if box_id is not None:
+            self.box_items[box_id] = item
+        return item
+
+    def release_box_item(self, item):
+        """Hides an item and keeps it in the scene for reuse instead of deleting it."""
+        if item.box_id is not None:
+            self.box_items.pop(item.box_id, None)
+        item.box_id = None
+        item.setSelected(False)
+        item.setVisible(False)
+        if len(self._box_item_pool) < self.max_pooled_box_items:
+            self._box_item_pool.append(item)
+        else:
+            self.scene.removeItem(item)
+
+    def release_all_box_items(self):
+        for item in list(self.box_items.values()):
+            self.release_box_item(item)
+
+    # ---------------- SPATIAL QUERIES -----------------
+
+    def current_spatial_index(self):
+        if not (0 <= self.current_image_index < len(self.image_paths)):
+            return None
+        return self.annotation_store.spatial_index(self.image_paths[self.current_image_index])
+
+    def select_box_at(self, point, add=False, tolerance=10.0):
+        """
+        Selects the smallest box containing point; if there is none, the
+        nearest box within `tolerance` screen pixels.
+        """
+        index = self.current_spatial_index()
+        if index is None:
+            return
+        if not add:
+            self.scene.clearSelection()
+        hits = index.query_point(point.x(), point.y())
+        if hits:
+            def area(box_id):
+                x1, y1, x2, y2 = index.box(box_id)
+                return (x2 - x1) * (y2 - y1)
+            box_id = min(hits, key=area)
+        else:
+            scale = self.image_view.transform().m11() or 1.0
+            nearest = index.nearest(point.x(), point.y(), max_distance=tolerance / scale)
+            if nearest is None:
+                return
+            box_id = nearest[0]
+        item = self.box_items.get(box_id)
+        if item is not None:
+            item.setSelected(True)
+
+    def select_boxes_in_rect(self, rect):
+        """Selects every box lying completely inside rect (press Delete to remove them)."""
+        index = self.current_spatial_index()
+        if index is None:
             return
-        folder_path = os.path.dirname(image_path)
-        labels_dir = os.path.join(folder_path, "labels")
-        os.makedirs(labels_dir, exist_ok=True)
-        name = os.path.splitext(os.path.basename(image_path))[0]
-        txt_path = os.path.join(labels_dir, f"{name}.txt")
-
-        boxes = self.image_boxes.get(image_path, [])
-        img_w = self.pixmap_item.pixmap().width() if self.pixmap_item else 1
-        img_h = self.pixmap_item.pixmap().height() if self.pixmap_item else 1
-
-        with open(txt_path, "w") as f:
-            for rect, class_name in boxes:
-                x_c = rect.center().x() / img_w
-                y_c = rect.center().y() / img_h
-                w = rect.width() / img_w
-                h = rect.height() / img_h
-                class_id = list(self.classes.keys()).index(class_name)
-                f.write(f"{class_id} {x_c:.6f} {y_c:.6f} {w:.6f} {h:.6f}\n")
+        self.scene.clearSelection()
+        box_ids = index.query_rect(rect.left(), rect.top(), rect.right(), rect.bottom(), contained=True)
+        for box_id in box_ids:
+            item = self.box_items.get(box_id)
+            if item is not None:
+                item.setSelected(True)
+        self.save_status_label.setText(f"{len(box_ids)} boxes selected")
+
+    def warn_overlaps(self, image_path, box_id, iou_threshold=0.7):
+        """Reports in the status label when a new box nearly duplicates a box of the same class."""
+        index = self.annotation_store.spatial_index(image_path)
+        boxes = self.annotation_store.boxes(image_path)
+        new_box = index.box(box_id)
+        candidates = [other for other in index.query_rect(*new_box) if other != box_id]
+        if not candidates:
+            return
+        class_id = boxes.class_ids[boxes.row(box_id)]
+        rows = np.flatnonzero(np.isin(boxes.box_ids, candidates) & (boxes.class_ids == class_id))
+        best = max((box_iou(new_box, index.box(other)) for other in boxes.box_ids[rows].tolist()), default=0.0)
+        if best >= iou_threshold:
+            self.save_status_label.setText(f"Warning: overlaps an existing box of the same class (IoU {best:.2f})")
+
+    def schedule_box_moved(self, item):
+        """Called for every position change of a dragged box; the work runs once per frame."""
+        self.update_scheduler.schedule(("move", item.box_id), lambda: self.box_moved(item))
+        self.update_scheduler.schedule("info", self.update_image_info)
+
+    def box_moved(self, item):
+        """Writes the new scene geometry of a dragged box back to the store."""
+        if item.box_id is None or not (0 <= self.current_image_index < len(self.image_paths)):
+            return
+        rect = item.scene_rect()
+        image_path = self.image_paths[self.current_image_index]
+        self.annotation_store.update_box(
+            image_path, item.box_id,
+            rect.left(), rect.top(), rect.right(), rect.bottom()
+        )
+        self.journal_edit(image_path)
 
     def delete_selected_box(self):
         if self.current_image_index < 0:
             return
+        self.update_scheduler.flush()
         image_path = self.image_paths[self.current_image_index]
         for item in self.scene.selectedItems():
             if isinstance(item, BoundingBoxItem):
-                for bd in self.image_boxes[image_path]:
-                    if bd[0] == item.rect():
-                        self.image_boxes[image_path].remove(bd)
-                        break
-                self.scene.removeItem(item)
+                if item.box_id is not None and image_path in self.annotation_store:
+                    self.annotation_store.remove_box(image_path, item.box_id)
+                    self.journal_edit(image_path)
+                self.release_box_item(item)
 
     # ---------------- CLASSES / SETTINGS -----------------
 
@@ -480,9 +857,25 @@ class AnnotationTab(QWidget):
     def open_class_editor(self):
         dialog = ClassEditorDialog(self, self.classes)
         if dialog.exec_() == QDialog.Accepted:
-            self.classes = dialog.get_classes()
+            classes = dialog.get_classes()
+            removed = [name for name in self.annotation_store.class_names if name not in classes]
+            box_count = self.annotation_store.count_boxes(removed)
+            if box_count:
+                reply = QMessageBox.question(
+                    self, "Delete boxes",
+                    f"{box_count} boxes of the removed classes ({', '.join(removed)}) will be deleted. Continue?",
+                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+                if reply != QMessageBox.Yes:
+                    return
+            self.classes = classes
+            dropped = self.annotation_store.set_class_names(self.classes.keys())
+            for name, count in dropped.items():
+                print(f"Deleted {count} boxes of removed class {name}")
+            for image_path in self.annotation_store.dirty:
+                self.journal_edit(image_path)
             self.save_classes()
             self.populate_class_combo()
+            self.load_annotations()  # Refresh names/colors and drop boxes of deleted classes
 
     def load_classes(self):
         try:
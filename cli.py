@@ -0,0 +1,186 @@
+# cli.py
+"""
+Headless dataset export and training, for machines without a display:
+
+    python cli.py --images DIR --classes classes.yaml --out EXPORT_DIR [--validate] [--train]
+
+Runs the same split, export, pre-resize and shard steps as the Training
+tab, writes data.yaml and train_config.yaml and optionally trains with
+train_script.py. Ctrl-C stops the export at a resumable point.
+"""
+import os
+import sys
+import signal
+import argparse
+import threading
+import subprocess
+
+import yaml
+
+from annotation_store import AnnotationStore
+from dataset_export import DatasetExporter, MATERIALIZE_MODES
+from dataset_stats import validate_dataset, write_report, format_report, REPORT_FILENAME
+from export_pipeline import run_export, write_train_config, StageProgress
+from folder_index import scan_image_names
+from near_duplicates import DEFAULT_MAX_DISTANCE, MAX_DISTANCE
+
+
+def load_class_names(classes_path):
+    """Returns the class names of a classes.yaml written by the class editor, in order."""
+    with open(classes_path, "r") as f:
+        data = yaml.safe_load(f)
+    if not data or not data.get("classes"):
+        raise ValueError(f"No classes in {classes_path}")
+    return list(data["classes"])
+
+
+def print_progress(stage, done, total, bytes_done, eta):
+    text = f"{stage} {done}/{total}"
+    if bytes_done:
+        text += f" ({bytes_done / (1024 * 1024):.0f} MB)"
+    if eta >= 0 and done < total:
+        minutes, seconds = divmod(int(eta), 60)
+        text += f", {minutes}:{seconds:02d} left"
+    print(text, flush=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export a YOLO dataset (and optionally train) without the GUI")
+    parser.add_argument("--images", required=True, help="Folder with the images")
+    parser.add_argument("--labels", default=None, help="Folder with the YOLO label files (default: <images>/labels)")
+    parser.add_argument("--classes", required=True, help="classes.yaml with the class names")
+    parser.add_argument("--out", required=True, help="Export directory")
+
+    split = parser.add_argument_group("split")
+    split.add_argument("--train-percent", type=int, default=70)
+    split.add_argument("--valid-percent", type=int, default=20)
+    split.add_argument("--test-percent", type=int, default=10)
+    split.add_argument("--seed", type=int, default=0, help="Split seed")
+    split.add_argument("--no-dedup", action="store_true", help="Do not keep near-duplicate images in one split")
+    split.add_argument("--dedup-distance", type=int, default=DEFAULT_MAX_DISTANCE,
+                       help=f"Max. differing hash bits of near-duplicates (0-{MAX_DISTANCE})")
+
+    export = parser.add_argument_group("export")
+    export.add_argument("--mode", choices=MATERIALIZE_MODES, default="copy", help="How exported images refer to the originals")
+    export.add_argument("--workers", type=int, default=None, help="Export threads (default: 4 per core, at most 32)")
+    export.add_argument("--full", action="store_true", help="Rewrite everything instead of exporting incrementally")
+    export.add_argument("--verify", action="store_true", help="Re-hash all files instead of trusting size and mtime")
+    export.add_argument("--preresize", action="store_true", help="Also write letterboxed copies at --imgsz and train on them")
+    export.add_argument("--shards", type=int, default=None, metavar="MB", help="Also pack tar shards of about MB each")
+    export.add_argument("--validate", action="store_true", help=f"Write {REPORT_FILENAME} and print the summary first")
+
+    train = parser.add_argument_group("training")
+    train.add_argument("--model", default="yolov8n.pt", help="Model weights")
+    train.add_argument("--epochs", type=int, default=150)
+    train.add_argument("--imgsz", type=int, default=640)
+    train.add_argument("--batch-size", type=int, default=16)
+    train.add_argument("--lr0", type=float, default=0.01)
+    train.add_argument("--run-name", default="train_run1")
+    train.add_argument("--no-save-best", action="store_true", help="Do not copy best.pt next to the export")
+    train.add_argument("--warm-start", nargs="?", const="best.pt", default=None, metavar="WEIGHTS",
+                       help="Fine-tune from WEIGHTS, relative to --out (default: best.pt of the last run), when it exists")
+    train.add_argument("--train", action="store_true", help="Train with train_script.py after exporting")
+    train.add_argument("--resume", action="store_true", help="With --train: continue the last unfinished run of --run-name")
+    train.add_argument("--scratch-dir", default=None, help="With --shards and --train: where to unpack the shards")
+
+    args = parser.parse_args(argv)
+    if args.train_percent + args.valid_percent + args.test_percent != 100:
+        parser.error("--train-percent, --valid-percent and --test-percent must sum to 100")
+    if args.resume and not args.train:
+        parser.error("--resume requires --train")
+    if not 0 <= args.dedup_distance <= MAX_DISTANCE:
+        parser.error(f"--dedup-distance must be between 0 and {MAX_DISTANCE}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    images_dir = os.path.abspath(args.images)
+    label_dir = os.path.abspath(args.labels) if args.labels else None
+    class_names = load_class_names(args.classes)
+    image_paths = [os.path.join(images_dir, name) for name in scan_image_names(images_dir)]
+    print(f"{len(image_paths)} images in {images_dir}, {len(class_names)} classes", flush=True)
+    if not image_paths:
+        print("No images to export.", file=sys.stderr)
+        return 1
+    store = AnnotationStore(class_names)  # Empty: every image is read from its label file
+
+    if args.validate:
+        report = validate_dataset(image_paths, store, class_names, label_dir=label_dir)
+        os.makedirs(args.out, exist_ok=True)
+        write_report(report, os.path.join(args.out, REPORT_FILENAME))
+        print(format_report(report), flush=True)
+
+    exporter = DatasetExporter(args.out, class_names, mode=args.mode, max_workers=args.workers,
+                               source_label_dir=label_dir)
+    # Ctrl-C cancels the export at a resumable point; a second Ctrl-C aborts.
+    cancel = threading.Event()
+
+    def interrupt(signum, frame):
+        print("Cancelling export, press Ctrl-C again to abort...", file=sys.stderr, flush=True)
+        cancel.set()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    previous_handler = signal.signal(signal.SIGINT, interrupt)
+    try:
+        result = run_export(
+            exporter, image_paths, store,
+            (args.train_percent, args.valid_percent, args.test_percent),
+            seed=args.seed,
+            incremental=not args.full,
+            verify=args.verify,
+            dedup_distance=None if args.no_dedup else args.dedup_distance,
+            resize_size=args.imgsz if args.preresize else None,
+            shard_bytes=args.shards * 1024 * 1024 if args.shards else None,
+            progress=StageProgress(print_progress, interval=2.0),
+            cancel=cancel
+        )
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+
+    counts = result.split_counts
+    if result.duplicate_groups:
+        print(f"Near-duplicates: {result.duplicate_groups} groups kept in one split each")
+    print(f"Train images: {counts['train']}, Valid images: {counts['valid']}, Test images: {counts['test']}")
+    if result.stats is not None:
+        print(result.stats.summary())
+    if result.resize_stats is not None:
+        print(f"Pre-resized: {result.resize_stats.summary()}")
+    if result.errors:
+        for path, error in result.errors:
+            print(f"{path}: {error}", file=sys.stderr)
+        print(f"Export failed for {len(result.errors)} images.", file=sys.stderr)
+        return 1
+    if result.cancelled:
+        print("Export cancelled. Run again to resume.", file=sys.stderr)
+        return 130
+
+    train_config_path = write_train_config(
+        args.out, result,
+        model_weights=args.model,
+        epochs=args.epochs,
+        imgsz=args.imgsz,
+        batch_size=args.batch_size,
+        lr0=args.lr0,
+        run_name=args.run_name,
+        save_best=not args.no_save_best,
+        warm_start=args.warm_start
+    )
+    print(f"Wrote {train_config_path}", flush=True)
+    if not args.train:
+        return 0
+
+    # Same command as the Training tab's Start Training button
+    command = [sys.executable, "-u", os.path.join(os.path.dirname(os.path.abspath(__file__)), "train_script.py"),
+               "--config", train_config_path, "--events", os.path.join(args.out, "train_events.jsonl")]
+    if args.resume:
+        command.append("--resume")
+    if result.shards:
+        command.append("--from-shards")
+        if args.scratch_dir:
+            command += ["--scratch-dir", args.scratch_dir]
+    return subprocess.call(command)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,395 @@
+# dataset_export.py
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import yaml
+
+from annotation_store import format_yolo_labels, label_path_for_image
+from image_probe import ImageSizeIndex
+
+SPLITS = ("train", "valid", "test")
+
+# How exported images refer to their source files
+MATERIALIZE_MODES = ("copy", "hardlink", "reflink", "symlink")
+
+MANIFEST_FILENAME = "export_manifest.json"
+MANIFEST_VERSION = 1
+CHECKPOINT_INTERVAL = 10.0  # Seconds between manifest checkpoints during an export
+
+_FICLONE = 0x40049409  # Linux ioctl: share the source file's extents (btrfs, XFS, ...)
+
+
+def _reflink(src, dst):
+    """Creates a copy-on-write clone of src at dst, or raises OSError if unsupported."""
+    if sys.platform.startswith("linux"):
+        import fcntl
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            except OSError:
+                fdst.close()
+                os.remove(dst)
+                raise
+        shutil.copystat(src, dst)
+    elif sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL("libc.dylib", use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), src)
+    else:
+        raise OSError(f"reflink is not supported on {sys.platform}")
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Returns the BLAKE2b content hash of a file as a hex string."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _remove_if_exists(path):
+    if os.path.lexists(path):
+        os.remove(path)
+
+
+def materialize(src, dst, mode="copy"):
+    """
+    Makes src available at dst using the given mode. Hardlinks and reflinks
+    fall back to a copy when the filesystem cannot provide them. Returns the
+    mode that was actually used.
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    if mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass  # e.g. export directory on another device
+    elif mode == "reflink":
+        try:
+            _reflink(src, dst)
+            return "reflink"
+        except OSError:
+            pass
+    elif mode == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+        return "symlink"
+    elif mode != "copy":
+        raise ValueError(f"Unknown materialization mode: {mode}")
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+class ExportStats:
+    """Counters of an export run, used for the throughput summary."""
+    def __init__(self):
+        self.files = 0      # Images materialized in this run
+        self.bytes = 0
+        self.labels = 0     # Label files written in this run
+        self.unchanged = 0  # Images already up to date in the export
+        self.removed = 0    # Images no longer in the dataset, deleted from the export
+        self.resumed = 0    # Images left over from an interrupted export
+        self.cancelled = False
+        self.elapsed = 0.0
+        self.modes = Counter()  # materialization mode actually used -> files
+        self.errors = []        # (image path, error message)
+
+    @property
+    def files_per_second(self):
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_second(self):
+        return self.bytes / (1024 * 1024) / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        modes = ", ".join(f"{count} {mode}" for mode, count in sorted(self.modes.items()))
+        cancelled = "Cancelled after " if self.cancelled else ""
+        return (f"{cancelled}{self.files} images ({self.bytes / (1024 * 1024):.1f} MB) and {self.labels} label files "
+                f"in {self.elapsed:.1f} s: {self.files_per_second:.1f} files/s, "
+                f"{self.mb_per_second:.1f} MB/s [{modes}]; "
+                f"{self.unchanged} unchanged, {self.removed} removed")
+
+
+class DatasetExporter:
+    """
+    Exports images and YOLO labels into the train/valid/test layout. Files
+    are materialized in a thread pool (the work is dominated by file system
+    calls, which release the GIL). Label normalisation uses image_sizes, so
+    image dimensions come from file headers instead of full decodes.
+
+    Every export writes export_manifest.json with the source size, mtime and
+    content hash, the split and the label hash of each image. Incremental
+    exports compare against it and only touch entries that changed; images
+    missing from the new export are removed.
+
+    The manifest is also checkpointed while exporting and when an export is
+    cancelled, with the images still to do listed under "resume". The next
+    export picks up from there, whatever its incremental setting.
+    """
+    def __init__(self, export_dir, class_names, mode="copy", max_workers=None, image_sizes=None,
+                 source_label_dir=None):
+        self.export_dir = export_dir
+        self.source_label_dir = source_label_dir  # Label files of unopened images; None: `labels` next to the images
+        self.class_names = list(class_names)
+        self.mode = mode
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self.image_sizes = image_sizes if image_sizes is not None else ImageSizeIndex()
+
+    def image_dir(self, split):
+        return os.path.join(self.export_dir, split, "images")
+
+    def label_dir(self, split):
+        return os.path.join(self.export_dir, split, "labels")
+
+    def make_dirs(self):
+        os.makedirs(self.export_dir, exist_ok=True)
+        for split in SPLITS:
+            os.makedirs(self.image_dir(split), exist_ok=True)
+            os.makedirs(self.label_dir(split), exist_ok=True)
+
+    def dest_paths(self, image_path, split):
+        """Returns the exported (image path, label path) of a source image in a split."""
+        filename = os.path.basename(image_path)
+        return (os.path.join(self.image_dir(split), filename),
+                os.path.join(self.label_dir(split), os.path.splitext(filename)[0] + ".txt"))
+
+    # ---------------- MANIFEST -----------------
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.export_dir, MANIFEST_FILENAME)
+
+    def load_manifest(self):
+        """Returns the manifest of the previous export ({"mode": ..., "entries": {...}}), or None."""
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != MANIFEST_VERSION:
+            return None
+        return manifest
+
+    def _save_manifest(self, entries, resume=None):
+        manifest = {"version": MANIFEST_VERSION, "mode": self.mode, "entries": entries}
+        if resume is not None:
+            manifest["resume"] = resume  # Checkpoint of an unfinished export
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    # ---------------- EXPORT -----------------
+
+    def _label_text(self, image_path, boxes):
+        """Returns the YOLO label file content for an image, or None if it has no boxes."""
+        if boxes is None:
+            # Never opened in the annotation tab: export the saved label file as is.
+            source_label = label_path_for_image(image_path, self.source_label_dir)
+            if not os.path.exists(source_label):
+                return None
+            with open(source_label, "r") as f:
+                return f.read()
+        if not len(boxes):  # Only if there are any boxes annotated.
+            return None
+        dims = self.image_sizes.get(image_path)
+        if dims is None:
+            raise ValueError(f"Could not read image to get dimensions: {image_path}")
+        return format_yolo_labels(boxes.xyxy, boxes.class_ids, dims[0], dims[1])
+
+    def _export_one(self, image_path, split, boxes, previous=None, verify=False):
+        """
+        Brings one image and its label up to date in the export. previous is
+        the image's manifest entry from the last export, if any. Returns
+        (manifest entry, bytes materialized, label written).
+        """
+        st = os.stat(image_path)
+        dest_image_path, dest_label_path = self.dest_paths(image_path, split)
+        if previous is not None and previous["split"] != split:
+            for path in self.dest_paths(image_path, previous["split"]):
+                _remove_if_exists(path)
+            previous = None
+
+        # Size and mtime identify an unchanged source unless asked to verify.
+        if (previous is not None and previous["hash"] is not None and not verify
+                and previous["size"] == st.st_size and previous["mtime_ns"] == st.st_mtime_ns):
+            content_hash = previous["hash"]
+        else:
+            content_hash = file_hash(image_path)
+
+        used_mode = previous["mode"] if previous is not None else None
+        image_current = (previous is not None and previous["hash"] == content_hash
+                         and os.path.lexists(dest_image_path))
+        if image_current and verify and used_mode in ("copy", "reflink"):
+            image_current = file_hash(dest_image_path) == content_hash
+        size = 0
+        if not image_current:
+            used_mode = materialize(image_path, dest_image_path, self.mode)
+            size = st.st_size
+
+        label_text = self._label_text(image_path, boxes)
+        label_hash = text_hash(label_text) if label_text is not None else None
+        label_written = False
+        if label_text is None:
+            _remove_if_exists(dest_label_path)
+        elif (previous is None or previous["label_hash"] != label_hash
+              or not os.path.exists(dest_label_path)):
+            with open(dest_label_path, "w") as f:
+                f.write(label_text)
+            label_written = True
+
+        entry = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "hash": content_hash,
+            "split": split,
+            "label_hash": label_hash,
+            "mode": used_mode,
+        }
+        return entry, size, label_written
+
+    def export(self, assignments, store, progress=None, incremental=True, verify=False, cancel=None):
+        """
+        Exports [(image_path, split)] using the boxes in store. progress, if
+        given, is called as progress(done, total, bytes) after every image.
+
+        With incremental=True entries matching the previous manifest are kept
+        as they are; verify=True additionally re-hashes the sources (and
+        exported copies) instead of trusting size and mtime. A full export
+        rewrites every entry. Either way images that are no longer part of
+        the dataset are removed from the export.
+
+        cancel, an optional threading.Event, stops the export once the images
+        in progress are done; stats.cancelled is then set and the manifest
+        records where to resume.
+
+        Returns ExportStats; per-image failures are collected in stats.errors.
+        """
+        stats = ExportStats()
+        start = time.perf_counter()
+        manifest = self.load_manifest()
+        old_entries = manifest["entries"] if manifest is not None else {}
+        resume = manifest.get("resume") if manifest is not None else None
+        same_mode = manifest is not None and manifest.get("mode") == self.mode
+        # Entries made with another mode are re-materialized with the new one.
+        reuse = same_mode and (incremental or resume is not None)
+        pending_verify = set()
+        if resume is not None and same_mode:
+            # The checkpoint already invalidated what a full export still has to
+            # rewrite; only images the interrupted run had not verified are re-verified.
+            pending_verify = set(resume["verify"])
+            stats.resumed = len(resume["pending"])
+
+        assigned = {path for path, _ in assignments}
+        for path, entry in old_entries.items():
+            if path not in assigned:
+                for dest in self.dest_paths(path, entry["split"]):
+                    try:
+                        _remove_if_exists(dest)
+                    except OSError as e:
+                        stats.errors.append((path, str(e)))
+                stats.removed += 1
+
+        # Box arrays are immutable snapshots, so workers can read them safely.
+        jobs = []
+        for path, split in assignments:
+            previous = old_entries.get(path)
+            if previous is not None and not reuse:
+                # Still clean up the old split, but rewrite everything else.
+                previous = dict(previous, hash=None, label_hash=None)
+            jobs.append((path, split, store.snapshot(path), previous, verify or path in pending_verify))
+        total = len(jobs)
+        entries = {}
+        done = 0
+        last_checkpoint = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._export_one, *job): job for job in jobs}
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                if cancel is not None and cancel.is_set() and not stats.cancelled:
+                    stats.cancelled = True
+                    for f in futures:
+                        f.cancel()  # Images already being exported still finish
+                image_path, _, _, previous, _ = futures[future]
+                done += 1
+                try:
+                    entry, size, label_written = future.result()
+                except Exception as e:
+                    stats.errors.append((image_path, str(e)))
+                    if previous is not None:
+                        # Keep the entry so its files can still be cleaned up, but force a rewrite.
+                        entries[image_path] = dict(previous, hash=None, label_hash=None)
+                else:
+                    entries[image_path] = entry
+                    if size:
+                        stats.files += 1
+                        stats.bytes += size
+                        stats.modes[entry["mode"]] += 1
+                    else:
+                        stats.unchanged += 1
+                    stats.labels += int(label_written)
+                if progress:
+                    progress(done, total, stats.bytes)
+                if time.perf_counter() - last_checkpoint > CHECKPOINT_INTERVAL:
+                    self._save_manifest(*self._checkpoint(entries, jobs))
+                    last_checkpoint = time.perf_counter()
+
+        if stats.cancelled:
+            self._save_manifest(*self._checkpoint(entries, jobs))
+            self.image_sizes.save()
+            stats.elapsed = time.perf_counter() - start
+            return stats
+        # Failed images are left out, so the next export retries them.
+        self._save_manifest(entries)
+        self.image_sizes.save()
+        stats.elapsed = time.perf_counter() - start
+        return stats
+
+    @staticmethod
+    def _checkpoint(entries, jobs):
+        """
+        Returns the (entries, resume) of a manifest checkpoint: finished images
+        with their new entries, unfinished ones with the entry they were
+        started from (invalidated for full exports), so a resumed export only
+        redoes the unfinished ones.
+        """
+        checkpoint = dict(entries)
+        pending, pending_verify = [], []
+        for path, _, _, previous, verify in jobs:
+            if path in entries:
+                continue
+            pending.append(path)
+            if previous is not None:
+                checkpoint[path] = previous
+            if verify:
+                pending_verify.append(path)
+        return checkpoint, {"pending": pending, "verify": pending_verify}
+
+    def write_data_yaml(self):
+        data_yaml_path = os.path.join(self.export_dir, "data.yaml")
+        data_yaml_content = {
+            'train': os.path.relpath(self.image_dir("train"), self.export_dir).replace("\\", "/"),  # Use relative paths
+            'val': os.path.relpath(self.image_dir("valid"), self.export_dir).replace("\\", "/"),    # and forward slashes
+            'test': os.path.relpath(self.image_dir("test"), self.export_dir).replace("\\", "/"),   # for cross-platform compatibility
+            'nc': len(self.class_names),
+            'names': self.class_names
+        }
+        with open(data_yaml_path, 'w') as outfile:
+            yaml.dump(data_yaml_content, outfile, default_flow_style=False)
+        return data_yaml_path
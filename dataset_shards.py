@@ -0,0 +1,270 @@
+# dataset_shards.py
+import io
+import os
+import json
+import shutil
+import tarfile
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+SHARD_DIRNAME = "shards"
+SHARD_INDEX_FILENAME = "shards.json"
+SHARD_INDEX_VERSION = 1
+DEFAULT_SHARD_BYTES = 256 * 1024 * 1024
+
+_BLOCK = tarfile.BLOCKSIZE
+
+
+def _padded(size):
+    return (size + _BLOCK - 1) // _BLOCK * _BLOCK
+
+
+class _ShardWriter:
+    """Appends samples to numbered tar files of one split, starting a new file past target_bytes."""
+    def __init__(self, shard_dir, split, target_bytes):
+        self.shard_dir = shard_dir
+        self.split = split
+        self.target_bytes = target_bytes
+        self.shards = []   # file names
+        self.samples = []  # [key, shard, image name, offset, size, label offset, label size]
+        self._tar = None
+
+    def _open_next(self):
+        self.close()
+        name = f"{self.split}-{len(self.shards):05d}.tar"
+        self.shards.append(name)
+        self._tar = tarfile.open(os.path.join(self.shard_dir, name + ".tmp"), "w", format=tarfile.GNU_FORMAT)
+
+    def _add(self, name, fileobj, size):
+        """Adds a member and returns the offset of its data in the tar file."""
+        info = tarfile.TarInfo(name)
+        info.size = size
+        self._tar.addfile(info, fileobj)
+        return self._tar.offset - _padded(size)
+
+    def add(self, key, image_path, label_text):
+        if self._tar is None or self._tar.offset >= self.target_bytes:
+            self._open_next()
+        image_name = key + os.path.splitext(image_path)[1].lower()
+        size = os.path.getsize(image_path)
+        with open(image_path, "rb") as f:
+            offset = self._add(image_name, f, size)
+        label_offset = label_size = None
+        if label_text is not None:
+            data = label_text.encode("utf-8")
+            label_offset = self._add(key + ".txt", io.BytesIO(data), len(data))
+            label_size = len(data)
+        self.samples.append([key, len(self.shards) - 1, image_name, offset, size, label_offset, label_size])
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+    def commit(self):
+        """Moves the finished shards into place."""
+        self.close()
+        for name in self.shards:
+            path = os.path.join(self.shard_dir, name)
+            os.replace(path + ".tmp", path)
+
+
+def _split_digest(entries):
+    """Digest of the manifest entries of one split; unchanged digest means unchanged shards."""
+    h = hashlib.blake2b(digest_size=16)
+    for path in sorted(entries):
+        entry = entries[path]
+        h.update(f"{path}\0{entry['hash']}\0{entry['label_hash']}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+class ShardPacker:
+    """
+    Packs an exported YOLO dataset into tar shards of about target_bytes
+    each, one set per split, under <export_dir>/shards. Each sample is stored
+    as <key>.<ext> (the image) followed by <key>.txt (the label, if any), so
+    readers stream every shard front to back instead of opening one file per
+    image and label. shards.json lists the shards and the data offset of
+    every member for random access.
+
+    Splits whose entries in export_manifest.json did not change since the
+    last pack are left as they are.
+    """
+    def __init__(self, exporter, target_bytes=DEFAULT_SHARD_BYTES):
+        self.exporter = exporter
+        self.target_bytes = target_bytes
+        self.shard_dir = os.path.join(exporter.export_dir, SHARD_DIRNAME)
+        self.index_path = os.path.join(self.shard_dir, SHARD_INDEX_FILENAME)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if index.get("version") != SHARD_INDEX_VERSION or index.get("target_bytes") != self.target_bytes:
+            return None
+        return index
+
+    def _pack_split(self, split, entries):
+        writer = _ShardWriter(self.shard_dir, split, self.target_bytes)
+        try:
+            for path in sorted(entries, key=lambda p: os.path.basename(p)):
+                image_path, label_path = self.exporter.dest_paths(path, split)
+                label_text = None
+                if os.path.exists(label_path):
+                    with open(label_path, "r") as f:
+                        label_text = f.read()
+                writer.add(os.path.splitext(os.path.basename(path))[0], image_path, label_text)
+            writer.commit()
+        except BaseException:
+            writer.close()
+            for name in writer.shards:
+                tmp_path = os.path.join(self.shard_dir, name + ".tmp")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            raise
+        return {"digest": _split_digest(entries), "shards": writer.shards, "samples": writer.samples}
+
+    def pack(self):
+        """Packs the splits that changed. Returns the names of the splits that were rebuilt."""
+        manifest = self.exporter.load_manifest()
+        if manifest is None:
+            raise ValueError(f"No export manifest in {self.exporter.export_dir}; export the dataset first.")
+        os.makedirs(self.shard_dir, exist_ok=True)
+        by_split = {}
+        for path, entry in manifest["entries"].items():
+            by_split.setdefault(entry["split"], {})[path] = entry
+
+        old_index = self._load_index()
+        old_splits = old_index["splits"] if old_index is not None else {}
+        splits, todo = {}, []
+        for split, entries in by_split.items():
+            old = old_splits.get(split)
+            if (old is not None and old["digest"] == _split_digest(entries)
+                    and all(os.path.exists(os.path.join(self.shard_dir, n)) for n in old["shards"])):
+                splits[split] = old
+            else:
+                todo.append(split)
+
+        # Splits are independent files, so they are packed concurrently.
+        with ThreadPoolExecutor(max_workers=max(1, len(todo))) as pool:
+            for split, packed in zip(todo, pool.map(lambda s: self._pack_split(s, by_split[s]), todo)):
+                splits[split] = packed
+
+        index = {
+            "version": SHARD_INDEX_VERSION,
+            "target_bytes": self.target_bytes,
+            "names": self.exporter.class_names,
+            "splits": splits,
+        }
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+        # Remove shards of earlier packs that are no longer referenced.
+        live = {name for packed in splits.values() for name in packed["shards"]}
+        for name in os.listdir(self.shard_dir):
+            if name.endswith(".tar") and name not in live:
+                os.remove(os.path.join(self.shard_dir, name))
+        return todo
+
+
+class ShardReader:
+    """
+    Reads a dataset packed by ShardPacker. samples() streams the shards of a
+    split sequentially; read() fetches single samples by their offsets;
+    unpack() recreates the YOLO directory layout (e.g. on fast local disk).
+    """
+    def __init__(self, index_path):
+        if os.path.isdir(index_path):
+            index_path = os.path.join(index_path, SHARD_INDEX_FILENAME)
+        self.index_path = index_path
+        self.shard_dir = os.path.dirname(os.path.abspath(index_path))
+        with open(index_path, "r") as f:
+            self.index = json.load(f)
+        if self.index.get("version") != SHARD_INDEX_VERSION:
+            raise ValueError(f"Unsupported shard index version in {index_path}")
+        self._by_key = None  # (split, key) -> sample row, built on the first read()
+
+    @property
+    def splits(self):
+        return list(self.index["splits"])
+
+    @property
+    def class_names(self):
+        return self.index["names"]
+
+    def __len__(self):
+        return sum(len(s["samples"]) for s in self.index["splits"].values())
+
+    def samples(self, split):
+        """Yields (key, image name, image bytes, label text or None) in shard order."""
+        packed = self.index["splits"].get(split)
+        if packed is None:
+            return
+        by_shard = {}
+        for key, shard, image_name, offset, size, label_offset, label_size in packed["samples"]:
+            by_shard.setdefault(shard, []).append((key, image_name, offset, size, label_offset, label_size))
+        for shard, samples in sorted(by_shard.items()):
+            with open(os.path.join(self.shard_dir, packed["shards"][shard]), "rb", buffering=1024 * 1024) as f:
+                for key, image_name, offset, size, label_offset, label_size in samples:
+                    # Samples are stored in index order, so these seeks only skip tar headers.
+                    f.seek(offset)
+                    image = f.read(size)
+                    label = None
+                    if label_offset is not None:
+                        f.seek(label_offset)
+                        label = f.read(label_size).decode("utf-8")
+                    yield key, image_name, image, label
+
+    def read(self, split, key):
+        """Returns (image name, image bytes, label text or None) of one sample."""
+        if self._by_key is None:
+            self._by_key = {(s, row[0]): row for s, packed in self.index["splits"].items()
+                            for row in packed["samples"]}
+        _, shard, image_name, offset, size, label_offset, label_size = self._by_key[(split, key)]
+        with open(os.path.join(self.shard_dir, self.index["splits"][split]["shards"][shard]), "rb") as f:
+            f.seek(offset)
+            image = f.read(size)
+            label = None
+            if label_offset is not None:
+                f.seek(label_offset)
+                label = f.read(label_size).decode("utf-8")
+        return image_name, image, label
+
+    def unpack(self, dest_dir, progress=None):
+        """
+        Writes the images and labels of every split to dest_dir in the YOLO
+        layout, plus a data.yaml pointing at them. Returns the data.yaml path.
+        """
+        split_dirs = {}
+        done, total = 0, len(self)
+        for split in self.splits:
+            image_dir = os.path.join(dest_dir, split, "images")
+            label_dir = os.path.join(dest_dir, split, "labels")
+            for d in (image_dir, label_dir):
+                shutil.rmtree(d, ignore_errors=True)
+                os.makedirs(d)
+            split_dirs[split] = image_dir
+            for key, image_name, image, label in self.samples(split):
+                with open(os.path.join(image_dir, image_name), "wb") as f:
+                    f.write(image)
+                if label is not None:
+                    with open(os.path.join(label_dir, key + ".txt"), "w") as f:
+                        f.write(label)
+                done += 1
+                if progress:
+                    progress(done, total)
+
+        data_yaml_path = os.path.join(dest_dir, "data.yaml")
+        data = {"nc": len(self.class_names), "names": self.class_names}
+        for split, key in (("train", "train"), ("valid", "val"), ("test", "test")):
+            if split in split_dirs:
+                data[key] = os.path.relpath(split_dirs[split], dest_dir).replace("\\", "/")
+        with open(data_yaml_path, "w") as f:
+            yaml.dump(data, f, default_flow_style=False)
+        return data_yaml_path
@@ -0,0 +1,204 @@
+# dataset_split.py
+import os
+import json
+from collections import Counter
+
+import numpy as np
+
+from annotation_store import label_path_for_image
+from dataset_export import SPLITS
+
+SPLITS_FILENAME = "splits.json"
+SPLITS_VERSION = 1
+
+
+def image_class_ids(store, image_path, label_dir=None):
+    """
+    Returns the sorted unique class ids annotated on an image. Images never
+    opened in the annotation tab are read from their label file.
+    """
+    boxes = store.snapshot(image_path)
+    if boxes is not None:
+        return np.unique(boxes.class_ids.astype(np.int64))
+    ids = set()
+    try:
+        with open(label_path_for_image(image_path, label_dir), "r") as f:
+            for line in f:
+                parts = line.split(maxsplit=1)
+                if parts:
+                    try:
+                        ids.add(int(float(parts[0])))
+                    except ValueError:
+                        continue
+    except OSError:
+        pass
+    return np.array(sorted(i for i in ids if i >= 0), dtype=np.int64)
+
+
+def iterative_stratification(labels, ratios, seed=0, fixed=None, label_counts=None, weights=None):
+    """
+    Assigns images to splits so every class is spread over the splits in
+    the given ratios (Sechidis et al., "On the Stratification of Multi-Label
+    Data", 2011).
+
+    labels is a list with the unique class ids of each image, ratios the
+    target fraction of each split. fixed, if given, holds a split index per
+    image or -1; fixed images keep their split and count towards the
+    targets, so new images fill whatever the existing assignment is missing.
+
+    Items may also be groups of images that must stay together: weights
+    gives the number of images per item and label_counts, parallel to
+    labels, the number of those images containing each class.
+
+    Classes are visited once, rarest first, instead of re-selecting the
+    rarest class after every assignment; together with per-class lists of
+    images this keeps the run time linear in the number of labels.
+    Returns an array with the split index of each image.
+    """
+    n = len(labels)
+    k = len(ratios)
+    ratios = np.asarray(ratios, dtype=np.float64)
+    ratios = ratios / ratios.sum()
+    rng = np.random.RandomState(seed)
+    assign = np.full(n, -1, dtype=np.int64) if fixed is None else np.array(fixed, dtype=np.int64)
+    if n == 0:
+        return assign
+
+    lengths = np.fromiter((len(l) for l in labels), dtype=np.int64, count=n)
+    flat = np.concatenate([np.asarray(l, dtype=np.int64) for l in labels]) if lengths.sum() else np.zeros(0, np.int64)
+    owner = np.repeat(np.arange(n), lengths)
+    num_labels = int(flat.max()) + 1 if len(flat) else 0
+    if label_counts is None:
+        flat_counts = np.ones(len(flat))
+    else:
+        flat_counts = (np.concatenate([np.asarray(c, dtype=np.float64) for c in label_counts])
+                       if len(flat) else np.zeros(0))
+    weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+
+    # Remaining wanted images per (class, split) and per split.
+    totals = np.bincount(flat, weights=flat_counts, minlength=num_labels)
+    desired = np.outer(totals, ratios)
+    desired_images = ratios * weights.sum()
+    is_fixed = assign >= 0
+    if is_fixed.any():
+        fixed_rows = is_fixed[owner]
+        np.subtract.at(desired, (flat[fixed_rows], assign[owner[fixed_rows]]), flat_counts[fixed_rows])
+        desired_images -= np.bincount(assign[is_fixed], weights=weights[is_fixed], minlength=k)
+    desired = desired.tolist()               # Python lists are faster than numpy for
+    desired_images = desired_images.tolist()  # the per-image updates below
+    allowed = [s for s in range(k) if ratios[s] > 0]
+
+    # Images of each class, in a seeded random order.
+    rank = np.empty(n, dtype=np.int64)
+    rank[rng.permutation(n)] = np.arange(n)
+    order = np.lexsort((rank[owner], flat))
+    by_label = np.split(owner[order], np.cumsum(np.bincount(flat, minlength=num_labels))[:-1])
+    remaining = np.bincount(flat[~is_fixed[owner]], minlength=num_labels)
+    image_labels = [np.asarray(ids, dtype=np.int64).tolist() for ids in labels]
+    image_counts = [np.asarray(c).tolist() for c in label_counts] if label_counts is not None else None
+    weight_list = weights.tolist()
+    rank_list = rank.tolist()
+
+    for label in np.argsort(remaining, kind="stable").tolist():
+        if remaining[label] == 0:
+            continue
+        for i in by_label[label].tolist():
+            if assign[i] >= 0:
+                continue
+            want = desired[label]
+            # Split wanting this class most, then the one wanting most images,
+            # then a seeded rotation so ties do not always favour train.
+            r = rank_list[i]
+            best = max(allowed, key=lambda s: (want[s], desired_images[s], (s - r) % k))
+            assign[i] = best
+            desired_images[best] -= weight_list[i]
+            if image_counts is None:
+                for l in image_labels[i]:
+                    desired[l][best] -= 1
+            else:
+                for l, count in zip(image_labels[i], image_counts[i]):
+                    desired[l][best] -= count
+
+    # Images without boxes only need to follow the overall ratios.
+    unlabeled = np.flatnonzero(assign < 0)
+    for i in unlabeled[np.argsort(rank[unlabeled])].tolist():
+        r = rank_list[i]
+        best = max(allowed, key=lambda s: (desired_images[s], (s - r) % k))
+        assign[i] = best
+        desired_images[best] -= weight_list[i]
+    return assign
+
+
+def load_split_assignments(export_dir):
+    """Returns the persisted split settings ({"seed", "ratios", "assignments"}) of an export, or None."""
+    try:
+        with open(os.path.join(export_dir, SPLITS_FILENAME), "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != SPLITS_VERSION:
+        return None
+    return data
+
+
+def save_split_assignments(export_dir, assignments, ratios, seed):
+    path = os.path.join(export_dir, SPLITS_FILENAME)
+    data = {"version": SPLITS_VERSION, "seed": seed, "ratios": list(ratios), "assignments": assignments}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def split_dataset(image_paths, store, ratios, seed=0, export_dir=None, groups=None, label_dir=None):
+    """
+    Returns {image_path: split} for a seeded, class-stratified split with
+    the given (train, valid, test) ratios. The result does not depend on the
+    order of image_paths.
+
+    groups, if given, is a list of path lists (e.g. near-duplicate images)
+    that must end up in the same split; each group is stratified as one item.
+
+    With export_dir, assignments are persisted in its splits.json: images
+    assigned before keep their split as long as the seed and ratios are
+    unchanged, and new images are stratified around them. A group whose
+    members were assigned to different splits moves to the split most of
+    them are in.
+    """
+    paths = sorted(set(image_paths))
+    previous = {}
+    if export_dir is not None:
+        persisted = load_split_assignments(export_dir)
+        if (persisted is not None and persisted["seed"] == seed
+                and np.allclose(persisted["ratios"], ratios)):
+            previous = persisted["assignments"]
+
+    # Items: one per group, one per remaining image.
+    path_set = set(paths)
+    items, grouped = [], set()
+    for group in groups or ():
+        members = sorted(p for p in set(group) if p in path_set and p not in grouped)
+        if members:
+            items.append(members)
+            grouped.update(members)
+    items.extend([p] for p in paths if p not in grouped)
+    items.sort()
+
+    split_index = {name: i for i, name in enumerate(SPLITS)}
+    fixed, labels, label_counts = [], [], []
+    for members in items:
+        previous_splits = [previous[p] for p in members if p in previous]
+        fixed.append(split_index.get(Counter(previous_splits).most_common(1)[0][0], -1) if previous_splits else -1)
+        if len(members) == 1:
+            ids = image_class_ids(store, members[0], label_dir)
+            counts = np.ones(len(ids), dtype=np.int64)
+        else:
+            ids, counts = np.unique(np.concatenate([image_class_ids(store, p, label_dir) for p in members]), return_counts=True)
+        labels.append(ids)
+        label_counts.append(counts)
+    assign = iterative_stratification(labels, ratios, seed=seed, fixed=fixed, label_counts=label_counts,
+                                      weights=[len(members) for members in items])
+    assignments = {p: SPLITS[s] for members, s in zip(items, assign.tolist()) for p in members}
+    if export_dir is not None:
+        save_split_assignments(export_dir, assignments, ratios, seed)
+    return assignments
@@ -0,0 +1,271 @@
+# dataset_stats.py
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from annotation_store import label_path_for_image
+
+REPORT_FILENAME = "dataset_report.json"
+
+# Boxes whose sides are smaller than this (normalised) are reported as degenerate.
+MIN_BOX_SIDE = 1e-4
+# Coordinates may exceed the image by this much (normalised) before a box counts as out of bounds.
+BOUNDS_TOLERANCE = 1e-3
+# Bins of sqrt(w * h), the box size relative to the image.
+SIZE_BINS = (0.0, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, np.inf)
+PERCENTILES = (0, 5, 25, 50, 75, 95, 100)
+MAX_LISTED = 100  # Example image paths listed per issue
+
+
+class BoxTable:
+    """All boxes of a dataset as flat arrays: owning image index, class id and normalised xc, yc, w, h."""
+    def __init__(self, image_index, class_ids, xywh, has_labels, malformed, missing_size):
+        self.image_index = image_index  # int64 (N,)
+        self.class_ids = class_ids      # int64 (N,)
+        self.xywh = xywh                # float64 (N, 4)
+        self.has_labels = has_labels    # bool per image: annotated in the store or has a label file
+        self.malformed = malformed      # {image index: malformed label lines}
+        self.missing_size = missing_size  # image indices whose size could not be read
+
+    def __len__(self):
+        return len(self.class_ids)
+
+
+def _read_label_files(label_paths, max_workers):
+    """Returns the bytes of each label file, or None where there is none. Files are read in chunks in a thread pool."""
+    def read_chunk(paths):
+        texts = []
+        for path in paths:
+            try:
+                with open(path, "rb") as f:
+                    texts.append(f.read())
+            except FileNotFoundError:
+                texts.append(None)
+        return texts
+
+    chunk_size = 1000  # One task per file costs more than reading a small label file
+    chunks = [label_paths[i:i + chunk_size] for i in range(0, len(label_paths), chunk_size)]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return [text for texts in pool.map(read_chunk, chunks) for text in texts]
+
+
+def _parse_label_text(text):
+    """Returns (rows (M, 5), malformed line count) of one label file, keeping the lines that parse."""
+    rows, malformed = [], 0
+    for line in text.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        try:
+            if len(parts) != 5:
+                raise ValueError
+            rows.append([float(p) for p in parts])
+        except ValueError:
+            malformed += 1
+    return np.array(rows, dtype=np.float64).reshape(-1, 5), malformed
+
+
+def _tokens_per_line(data):
+    """Number of whitespace-separated tokens on each newline-terminated line of data."""
+    buf = np.frombuffer(data, dtype=np.uint8)
+    space = (buf == 32) | ((buf >= 9) & (buf <= 13))  # What bytes.split() splits on
+    starts = ~space
+    starts[1:] &= space[:-1]
+    # Tokens starting before each newline, minus those before the previous one
+    return np.diff(np.searchsorted(np.flatnonzero(starts), np.flatnonzero(buf == 10)), prepend=0)
+
+
+def _parse_label_texts(texts):
+    """
+    Parses label file contents into one (N, 5) array plus the row count and
+    malformed line count of each file. If every line of every file has five
+    tokens the files are converted with a single NumPy call; otherwise each
+    file is parsed on its own, so one broken file does not shift the rows
+    of the others.
+    """
+    # Terminate the last line of every file so lines never run into the next file.
+    texts = [t if not t or t.endswith(b"\n") else t + b"\n" for t in texts]
+    expected = np.array([t.count(b"\n") for t in texts], dtype=np.int64)
+    data = b"".join(texts)
+    if (_tokens_per_line(data) == 5).all():
+        try:
+            values = np.array(data.split(), dtype=np.float64)
+            return values.reshape(-1, 5), expected, np.zeros(len(texts), dtype=np.int64)
+        except ValueError:
+            pass
+    # Blank or broken lines somewhere: parse file by file.
+    parsed = [_parse_label_text(t.decode("utf-8", "replace")) for t in texts]
+    chunks = [rows for rows, _ in parsed if len(rows)]
+    rows = np.concatenate(chunks) if chunks else np.zeros((0, 5))
+    return (rows, np.array([len(r) for r, _ in parsed], dtype=np.int64),
+            np.array([bad for _, bad in parsed], dtype=np.int64))
+
+
+def load_box_table(image_paths, store, image_sizes=None, max_workers=None, label_dir=None):
+    """
+    Collects the boxes of all images into a BoxTable. Images present in the
+    annotation store use its (possibly unsaved) boxes, normalised with the
+    image size; the label files of all other images are read in a thread
+    pool and parsed in bulk.
+    """
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+    snapshots = [store.snapshot(p) for p in image_paths]
+    file_images = [i for i, boxes in enumerate(snapshots) if boxes is None]
+    texts = _read_label_files([label_path_for_image(image_paths[i], label_dir) for i in file_images], max_workers)
+
+    has_labels = np.array([boxes is not None for boxes in snapshots], dtype=bool)
+    present = [i for i, text in zip(file_images, texts) if text is not None]
+    has_labels[present] = True
+    file_rows, file_counts, file_bad = _parse_label_texts([t for t in texts if t is not None])
+    malformed = {i: int(bad) for i, bad in zip(present, file_bad.tolist()) if bad}
+
+    # Boxes from the store, normalised to the same representation.
+    store_images, store_rows, missing_size = [], [], []
+    for i, boxes in enumerate(snapshots):
+        if boxes is None or not len(boxes):
+            continue
+        size = image_sizes.get(image_paths[i]) if image_sizes is not None else None
+        if size is None:
+            missing_size.append(i)
+            continue
+        xyxy = boxes.xyxy.astype(np.float64)
+        w, h = size
+        store_images.append(np.full(len(boxes), i, dtype=np.int64))
+        store_rows.append(np.column_stack([
+            boxes.class_ids.astype(np.float64),
+            (xyxy[:, 0] + xyxy[:, 2]) / 2 / w,
+            (xyxy[:, 1] + xyxy[:, 3]) / 2 / h,
+            (xyxy[:, 2] - xyxy[:, 0]) / w,
+            (xyxy[:, 3] - xyxy[:, 1]) / h,
+        ]))
+
+    image_index = np.concatenate([np.repeat(np.array(present, dtype=np.int64), file_counts)] + store_images)
+    rows = np.concatenate([file_rows] + store_rows) if store_rows else file_rows
+    return BoxTable(image_index, rows[:, 0].astype(np.int64), rows[:, 1:5], has_labels, malformed, missing_size)
+
+
+def _percentiles(values):
+    if not len(values):
+        return {}
+    return {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def _examples(image_paths, indices):
+    indices = np.unique(indices)
+    return {"count": int(len(indices)), "examples": [image_paths[i] for i in indices[:MAX_LISTED].tolist()]}
+
+
+def compute_report(image_paths, table, class_names):
+    """Computes the statistics and validation report of a BoxTable as a JSON-serialisable dict."""
+    n_images = len(image_paths)
+    nc = len(class_names)
+    cls = table.class_ids
+    xc, yc, w, h = table.xywh.T if len(table) else (np.zeros(0),) * 4
+
+    boxes_per_image = np.bincount(table.image_index, minlength=n_images)
+    known = (cls >= 0) & (cls < nc)
+    boxes_per_class = np.bincount(cls[known], minlength=nc)
+    # Unique (image, class) pairs give the number of images containing each class.
+    pairs = np.unique(table.image_index[known] * max(nc, 1) + cls[known])
+    images_per_class = np.bincount(pairs % max(nc, 1), minlength=nc) if nc else np.zeros(0, np.int64)
+
+    finite = np.isfinite(table.xywh).all(axis=1) if len(table) else np.zeros(0, bool)
+    degenerate = finite & ((w < MIN_BOX_SIDE) | (h < MIN_BOX_SIDE))
+    out_of_bounds = finite & ~degenerate & (
+        (xc - w / 2 < -BOUNDS_TOLERANCE) | (yc - h / 2 < -BOUNDS_TOLERANCE) |
+        (xc + w / 2 > 1 + BOUNDS_TOLERANCE) | (yc + h / 2 > 1 + BOUNDS_TOLERANCE))
+    valid = finite & ~degenerate
+
+    # Exact duplicates: same image, class and coordinates.
+    duplicates = np.zeros(len(table), dtype=bool)
+    if len(table):
+        # Sort by a hash of all key columns, then confirm equal neighbours column by column.
+        coords = np.nan_to_num(np.round(table.xywh * 1e6)).astype(np.int64)
+        keys = np.column_stack([table.image_index, cls, coords])
+        primes = np.array([1000003, 998244353, 1000000007, 1000000009, 2147483647, 4294967291], dtype=np.int64)
+        order = np.argsort((keys * primes).sum(axis=1), kind="stable")
+        same = (keys[order[1:]] == keys[order[:-1]]).all(axis=1)
+        duplicates[order[1:][same]] = True
+
+    size = np.sqrt(np.clip(w[valid] * h[valid], 0, None))
+    aspect = w[valid] / h[valid]
+    size_hist = np.histogram(size, bins=np.array(SIZE_BINS))[0]
+
+    return {
+        "images": n_images,
+        "boxes": int(len(table)),
+        "labeled_images": int((boxes_per_image > 0).sum()),
+        "boxes_per_image": _percentiles(boxes_per_image),
+        "classes": [
+            {"id": i, "name": name, "boxes": int(boxes_per_class[i]), "images": int(images_per_class[i])}
+            for i, name in enumerate(class_names)
+        ],
+        "box_size": {
+            "relative_size": _percentiles(size),
+            "width": _percentiles(w[valid]),
+            "height": _percentiles(h[valid]),
+            "aspect_ratio": _percentiles(aspect),
+            "size_histogram": [
+                {"min": SIZE_BINS[i], "max": SIZE_BINS[i + 1] if np.isfinite(SIZE_BINS[i + 1]) else None,
+                 "boxes": int(size_hist[i])}
+                for i in range(len(SIZE_BINS) - 1)
+            ],
+        },
+        "issues": {
+            "images_without_boxes": _examples(image_paths, np.flatnonzero(boxes_per_image == 0)),
+            "images_without_label_file": _examples(image_paths, np.flatnonzero(~table.has_labels)),
+            "unknown_class": _examples(image_paths, table.image_index[~known]),
+            "non_finite": _examples(image_paths, table.image_index[~finite]),
+            "degenerate_boxes": _examples(image_paths, table.image_index[degenerate]),
+            "out_of_bounds_boxes": _examples(image_paths, table.image_index[out_of_bounds]),
+            "duplicate_boxes": _examples(image_paths, table.image_index[duplicates]),
+            "malformed_label_lines": _examples(image_paths, np.array(sorted(table.malformed), dtype=np.int64)),
+            "unreadable_image_size": _examples(image_paths, np.array(table.missing_size, dtype=np.int64)),
+        },
+        "box_issue_counts": {
+            "unknown_class": int((~known).sum()),
+            "non_finite": int((~finite).sum()),
+            "degenerate": int(degenerate.sum()),
+            "out_of_bounds": int(out_of_bounds.sum()),
+            "duplicate": int(duplicates.sum()),
+            "malformed_lines": int(sum(table.malformed.values())),
+        },
+    }
+
+
+def validate_dataset(image_paths, store, class_names, image_sizes=None, max_workers=None, label_dir=None):
+    """Loads all boxes and returns the report dict (with the time taken in "elapsed")."""
+    start = time.perf_counter()
+    image_paths = list(image_paths)
+    table = load_box_table(image_paths, store, image_sizes, max_workers, label_dir)
+    report = compute_report(image_paths, table, list(class_names))
+    report["elapsed"] = time.perf_counter() - start
+    return report
+
+
+def write_report(report, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def format_report(report):
+    """Human-readable summary of a report for the training console."""
+    lines = [
+        f"{report['images']} images, {report['boxes']} boxes, {report['labeled_images']} images with boxes "
+        f"({report['elapsed']:.2f} s)",
+        "Boxes per class:",
+    ]
+    for c in report["classes"]:
+        lines.append(f"  {c['name']}: {c['boxes']} boxes in {c['images']} images")
+    size = report["box_size"]["relative_size"]
+    if size:
+        lines.append(f"Relative box size: median {size['p50']:.3f}, 5% {size['p5']:.3f}, 95% {size['p95']:.3f}")
+    for name, issue in report["issues"].items():
+        if issue["count"]:
+            lines.append(f"{name.replace('_', ' ').capitalize()}: {issue['count']} images")
+    return "\n".join(lines)
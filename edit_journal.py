@@ -0,0 +1,177 @@
+# edit_journal.py
+import os
+import json
+import threading
+
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from annotation_store import write_yolo_labels, label_path_for_image
+
+JOURNAL_PATH = "annotation_journal.jsonl"
+
+
+class EditJournal:
+    """
+    Append-only JSON-lines log of annotation edits. Each record holds the
+    full box list of one image after an edit, so the newest record of an
+    image is its current state. A {"classes": [...]} line precedes records
+    whenever the class list they refer to changes.
+
+    compact() rotates the live file out of the way, writes the newest state
+    of each image to its YOLO label file and deletes the rotated file. If the
+    application dies before that, replay() returns the unsaved state.
+    """
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self.compacting_path = path + ".compacting"
+        self.lock = threading.Lock()          # Guards appends and rotation
+        self.compact_lock = threading.Lock()  # One compaction (or full save) at a time
+        self._file = None
+        self._classes = None  # Class list the live file's records currently refer to
+        self._seq = 0
+
+    # ---------------- WRITING -----------------
+
+    def append(self, image_path, boxes, class_names, image_size):
+        """Records the current boxes of an image and returns the record's sequence number."""
+        xyxy = np.round(boxes.xyxy.astype(np.float64), 2)
+        rows = np.column_stack([xyxy, boxes.class_ids]).tolist() if len(boxes) else []
+        with self.lock:
+            self._seq += 1
+            self._write({
+                "seq": self._seq,
+                "image": image_path,
+                "size": [image_size[0], image_size[1]],
+                "boxes": rows,
+            }, list(class_names))
+            return self._seq
+
+    def _write(self, record, class_names):
+        if self._file is None:
+            self._file = open(self.path, "a")
+        if class_names != self._classes:
+            self._file.write(json.dumps({"classes": class_names}) + "\n")
+            self._classes = class_names
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._classes = None
+
+    def discard(self):
+        """Drops all journaled edits (after everything has been saved another way)."""
+        with self.compact_lock, self.lock:
+            self._close()
+            for path in (self.path, self.compacting_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+    # ---------------- READING -----------------
+
+    @staticmethod
+    def _read_latest(path, latest):
+        """Adds the newest record per image from a journal file to `latest`."""
+        classes = []
+        try:
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Partially written last line after a crash
+                    if "classes" in record:
+                        classes = record["classes"]
+                    elif "image" in record:
+                        record["classes"] = classes
+                        latest[record["image"]] = record
+        except FileNotFoundError:
+            pass
+        return latest
+
+    def replay(self):
+        """
+        Returns {image_path: record} with the newest unsaved state of every
+        journaled image. Each record has "size", "boxes" ([x1, y1, x2, y2,
+        class_id] rows) and "classes" (names for the class ids).
+        """
+        latest = {}
+        self._read_latest(self.compacting_path, latest)
+        self._read_latest(self.path, latest)
+        if latest:
+            with self.lock:
+                self._seq = max(self._seq, max(r.get("seq", 0) for r in latest.values()))
+        return latest
+
+    # ---------------- COMPACTION -----------------
+
+    def compact(self):
+        """
+        Writes the journaled state to the label files. Returns
+        ({image_path: seq} of written records, [(image_path, error)]).
+        """
+        with self.compact_lock:
+            with self.lock:
+                if os.path.exists(self.path) and not os.path.exists(self.compacting_path):
+                    self._close()
+                    os.replace(self.path, self.compacting_path)
+            if not os.path.exists(self.compacting_path):
+                return {}, []
+
+            latest = self._read_latest(self.compacting_path, {})
+            written, errors, failed = {}, [], []
+            for image_path, record in latest.items():
+                rows = np.array(record["boxes"], dtype=np.float64).reshape(-1, 5)
+                width, height = record["size"]
+                try:
+                    write_yolo_labels(label_path_for_image(image_path), rows[:, :4],
+                                      rows[:, 4].astype(np.int16), width, height)
+                    written[image_path] = record["seq"]
+                except OSError as e:
+                    errors.append((image_path, str(e)))
+                    failed.append(record)
+
+            # Keep edits that could not be written in the live journal.
+            with self.lock:
+                for record in failed:
+                    self._write({k: v for k, v in record.items() if k != "classes"}, record["classes"])
+            os.remove(self.compacting_path)
+            return written, errors
+
+
+class JournalCompactor(QThread):
+    """Periodically compacts an EditJournal into the label files off the GUI thread."""
+    compacted = pyqtSignal(dict)   # {image_path: seq} written to disk
+    failed = pyqtSignal(list)      # [(image_path, error)]
+
+    def __init__(self, journal, interval=5.0, parent=None):
+        super().__init__(parent)
+        self.journal = journal
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            self._compact()
+        self._compact()  # Final flush on shutdown
+
+    def _compact(self):
+        try:
+            written, errors = self.journal.compact()
+        except OSError as e:
+            written, errors = {}, [(self.journal.path, str(e))]
+        if written:
+            self.compacted.emit(written)
+        if errors:
+            self.failed.emit(errors)
+
+    def stop(self):
+        self._stop.set()
+        self.wait()
@@ -0,0 +1,149 @@
+# export_pipeline.py
+import os
+import time
+from collections import Counter
+
+import yaml
+
+from dataset_split import split_dataset
+from dataset_shards import ShardPacker, SHARD_DIRNAME, SHARD_INDEX_FILENAME
+from near_duplicates import find_near_duplicates
+from resize_cache import ResizedDatasetBuilder
+
+TRAIN_CONFIG_FILENAME = "train_config.yaml"
+
+
+class ExportResult:
+    """What an export run produced."""
+    def __init__(self):
+        self.split_counts = Counter()  # split -> images
+        self.duplicate_groups = 0
+        self.stats = None              # ExportStats
+        self.resize_stats = None       # ResizeStats, if pre-resizing
+        self.data_yaml = "data.yaml"   # Relative to the export directory
+        self.shards = None             # Shard index relative to the export directory, if packed
+
+    @property
+    def cancelled(self):
+        return self.stats is None or self.stats.cancelled
+
+    @property
+    def errors(self):
+        """Per-image errors of the export and resize steps."""
+        errors = list(self.stats.errors) if self.stats is not None else []
+        if self.resize_stats is not None:
+            errors.extend(self.resize_stats.errors)
+        return errors
+
+
+class StageProgress:
+    """
+    Turns per-item progress of the pipeline stages into calls of
+    callback(stage, done, total, bytes, ETA in seconds or -1), at most every
+    interval seconds plus once when a stage completes.
+    """
+    def __init__(self, callback, interval=0.1):
+        self.callback = callback
+        self.interval = interval
+        self._stage = None
+        self._stage_start = 0.0
+        self._last = 0.0
+
+    def __call__(self, stage, done, total, bytes_done=0):
+        now = time.perf_counter()
+        if stage != self._stage:
+            self._stage, self._stage_start = stage, now
+        if done < total and now - self._last < self.interval:
+            return
+        self._last = now
+        elapsed = now - self._stage_start
+        eta = elapsed * (total - done) / done if done and elapsed > 0 else -1.0
+        self.callback(stage, done, total, float(bytes_done), eta)
+
+
+def run_export(exporter, image_paths, store, ratios, seed=0, incremental=True, verify=False,
+               dedup_distance=None, hash_cache=None, resize_size=None, shard_bytes=None,
+               progress=None, cancel=None):
+    """
+    Runs the export pipeline: near-duplicate grouping (unless dedup_distance
+    is None), splitting, exporting, data.yaml, pre-resizing (resize_size) and
+    shard packing (shard_bytes). progress, if given, is called as
+    progress(stage, done, total, bytes). cancel, an optional threading.Event,
+    stops the export at the next image or before the next stage.
+
+    Later stages are skipped when the export has per-image errors. Returns
+    an ExportResult; train_config.yaml is left to the caller.
+    """
+    result = ExportResult()
+    report = progress or (lambda *args: None)
+    is_cancelled = lambda: cancel is not None and cancel.is_set()
+    exporter.make_dirs()
+
+    # Split image paths into train, valid, and test sets. The split is
+    # seeded and stratified by class; assignments are kept in splits.json
+    # so images keep their split when new ones are added.
+    groups = None
+    if dedup_distance is not None:
+        groups = find_near_duplicates(image_paths, dedup_distance, cache=hash_cache,
+                                      progress=lambda done, total: report("Hashing", done, total))
+        result.duplicate_groups = len(groups)
+    if is_cancelled():
+        return result
+    splits = split_dataset(image_paths, store, ratios, seed=seed, export_dir=exporter.export_dir,
+                           groups=groups, label_dir=exporter.source_label_dir)
+    result.split_counts = Counter(splits.values())
+    if is_cancelled():
+        return result
+
+    # Copy (or link) images and labels to the respective directories
+    result.stats = exporter.export(
+        sorted(splits.items()), store, incremental=incremental, verify=verify, cancel=cancel,
+        progress=lambda done, total, bytes_done: report("Exporting", done, total, bytes_done))
+    if result.stats.cancelled or result.stats.errors:
+        return result
+    exporter.write_data_yaml()
+
+    # Letterboxed copies at the training image size
+    if resize_size is not None and not is_cancelled():
+        builder = ResizedDatasetBuilder(exporter, resize_size)
+        result.resize_stats = builder.build(progress=lambda done, total: report("Resizing", done, total))
+        if result.resize_stats.errors:
+            return result
+        result.data_yaml = os.path.basename(builder.data_yaml_path)
+
+    # Pack tar shards for sequential reads during training
+    if shard_bytes is not None and not is_cancelled():
+        report("Packing shards", 0, 1)
+        ShardPacker(exporter, shard_bytes).pack()
+        result.shards = f"{SHARD_DIRNAME}/{SHARD_INDEX_FILENAME}"
+    if is_cancelled():
+        result.stats.cancelled = True
+    return result
+
+
+def write_train_config(export_dir, result, model_weights, epochs, imgsz, batch_size, lr0, run_name, save_best,
+                       warm_start=None):
+    """
+    Writes train_config.yaml for train_script.py next to the exported
+    dataset and returns its path. warm_start, relative to the export
+    directory, names weights to fine-tune from instead of model_weights
+    when they exist (e.g. the best.pt of the previous run).
+    """
+    train_config_path = os.path.join(export_dir, TRAIN_CONFIG_FILENAME)
+    train_config_content = {
+        'model_weights': model_weights,
+        'data_yaml': os.path.join(".", result.data_yaml).replace("\\", "/"),  # Relative path
+        'epochs': epochs,
+        'imgsz': imgsz,
+        'batch_size': batch_size,
+        'lr0': lr0,
+        'run_name': run_name,
+        'save_best': save_best
+    }
+    if warm_start:
+        train_config_content['warm_start'] = warm_start
+    if result.shards:
+        train_config_content['shards'] = result.shards  # Relative to the export directory
+    with open(train_config_path, 'w') as outfile:
+        yaml.dump(train_config_content, outfile, default_flow_style=False)
+    return train_config_path
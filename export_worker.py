@@ -0,0 +1,44 @@
+# export_worker.py
+import threading
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from export_pipeline import run_export, StageProgress
+
+PROGRESS_INTERVAL = 0.1  # Seconds between progress signals; per-image signals would flood the GUI thread
+
+
+class ExportThread(QThread):
+    """
+    Runs the export pipeline (export_pipeline.run_export) off the GUI thread.
+
+    Progress is reported per stage with the bytes written and an ETA,
+    throttled to PROGRESS_INTERVAL. cancel() stops at the next image (the
+    exporter checkpoints its manifest, so the next export resumes there) or,
+    in the other stages, before the next stage starts.
+    """
+    progress = pyqtSignal(str, int, int, float, float)  # stage, done, total, bytes, ETA in seconds (-1 if unknown)
+    exported = pyqtSignal(object)                       # ExportResult
+    failed = pyqtSignal(str)
+
+    def __init__(self, exporter, image_paths, store, ratios, parent=None, **options):
+        super().__init__(parent)
+        self.exporter = exporter
+        self.image_paths = list(image_paths)
+        self.store = store
+        self.ratios = ratios
+        self.options = options  # Keyword arguments of run_export
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        try:
+            result = run_export(self.exporter, self.image_paths, self.store, self.ratios,
+                                progress=StageProgress(self.progress.emit, PROGRESS_INTERVAL),
+                                cancel=self._cancel, **self.options)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.exported.emit(result)
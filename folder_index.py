@@ -0,0 +1,232 @@
+# folder_index.py
+import os
+import re
+import json
+import heapq
+import hashlib
+
+from PyQt5.QtCore import QObject, QThread, QTimer, QFileSystemWatcher, QStandardPaths, pyqtSignal
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tiff', '.bmp')
+INDEX_FILENAME = ".image_index.json"  # Suffix of the index files in the index directory
+INDEX_VERSION = 1
+
+_digits = re.compile(r'(\d+)')
+
+
+def natural_sort_key(name):
+    """Sort key that orders img2.png before img10.png; ties are broken by the raw name."""
+    parts = _digits.split(name.lower())
+    return tuple((0, int(p), "") if p.isdigit() else (1, 0, p) for p in parts), name
+
+
+def scan_image_names(folder_path, progress=None, batch_size=5000, stop=None):
+    """
+    Streams the folder with os.scandir and returns the sorted image file names.
+    Returns None if stop() becomes true before the scan is done.
+    """
+    names = []
+    with os.scandir(folder_path) as entries:
+        for i, entry in enumerate(entries):
+            if stop and i % batch_size == 0 and stop():
+                return None
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                names.append(entry.name)
+                if progress and len(names) % batch_size == 0:
+                    progress(len(names))
+    names.sort(key=natural_sort_key)
+    return names
+
+
+def default_index_dir():
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "AnalyticModelGenerator", "folder_index")
+
+
+def index_path_for_folder(folder_path, index_dir=None):
+    """
+    Where the index of folder_path is stored. It is kept outside the folder:
+    writing it inside would make the folder watcher trigger another rescan.
+    """
+    digest = hashlib.sha1(os.path.abspath(folder_path).encode("utf-8")).hexdigest()
+    return os.path.join(index_dir or default_index_dir(), digest + INDEX_FILENAME)
+
+
+def load_index(folder_path, index_dir=None):
+    """Returns the persisted sorted names for folder_path, or None if there is no usable index."""
+    try:
+        with open(index_path_for_folder(folder_path, index_dir), "r") as f:
+            data = json.load(f)
+        if data.get("version") == INDEX_VERSION and data.get("folder") == os.path.abspath(folder_path):
+            return data["names"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def save_index(folder_path, names, index_dir=None):
+    """Writes the index atomically to the index directory. Write errors are silently skipped."""
+    index_path = index_path_for_folder(folder_path, index_dir)
+    tmp_path = index_path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump({"version": INDEX_VERSION, "folder": os.path.abspath(folder_path), "names": names}, f)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        pass
+
+
+class _ScanThread(QThread):
+    """Runs scan_image_names off the GUI thread."""
+    progress = pyqtSignal(int, int)         # generation, images found so far
+    scanned = pyqtSignal(int, object)       # generation, sorted names
+    failed = pyqtSignal(int, str)           # generation, error message
+
+    def __init__(self, folder_path, generation, parent=None):
+        super().__init__(parent)
+        self.folder_path = folder_path
+        self.generation = generation
+
+    def run(self):
+        try:
+            names = scan_image_names(
+                self.folder_path,
+                progress=lambda count: self.progress.emit(self.generation, count),
+                stop=self.isInterruptionRequested
+            )
+        except OSError as e:
+            self.failed.emit(self.generation, str(e))
+            return
+        if names is None:
+            return  # Stopped by FolderIndexer.stop()
+        self.scanned.emit(self.generation, names)
+
+
+class FolderIndexer(QObject):
+    """
+    Keeps a sorted list of the image names in a folder up to date.
+
+    Opening a folder first publishes the persisted index (if any) so the GUI
+    can show images immediately, then rescans in a background thread and
+    publishes only the differences. A QFileSystemWatcher triggers further
+    (debounced) rescans whenever files are added to or removed from the folder.
+    """
+    index_ready = pyqtSignal(str, list)            # folder, all sorted names
+    entries_changed = pyqtSignal(str, list, list)  # folder, added names, removed names
+    scan_progress = pyqtSignal(int)                # images found so far
+    scan_failed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.folder_path = None
+        self.names = []
+        self._published = False
+        self._generation = 0
+        self._threads = set()
+        self._rescan_pending = False
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._schedule_rescan)
+
+        # Capture rigs write files in bursts; coalesce them into one rescan.
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(500)
+        self.rescan_timer.timeout.connect(self._start_scan)
+
+    def open(self, folder_path):
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        self.rescan_timer.stop()
+        self._generation += 1
+        self.folder_path = folder_path
+        self.names = []
+        self._published = False
+
+        cached = load_index(folder_path)
+        if cached is not None:
+            self.names = cached
+            self._published = True
+            self.index_ready.emit(folder_path, list(self.names))
+
+        self.watcher.addPath(folder_path)
+        self._start_scan()
+
+    def stop(self):
+        """Stops watching the folder and waits for running scans to end (called on application exit)."""
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        self.rescan_timer.stop()
+        self._generation += 1  # Results of scans still running are dropped
+        self._rescan_pending = False
+        self.folder_path = None
+        for thread in list(self._threads):
+            thread.requestInterruption()
+        for thread in list(self._threads):
+            thread.wait()
+
+    def _schedule_rescan(self, path):
+        if path == self.folder_path:
+            self.rescan_timer.start()
+
+    def _start_scan(self):
+        if self.folder_path is None:
+            return
+        if any(t.generation == self._generation for t in self._threads):
+            # A scan of this folder is already running; rescan once it is done.
+            self._rescan_pending = True
+            return
+        thread = _ScanThread(self.folder_path, self._generation, self)
+        thread.progress.connect(self._on_progress)
+        thread.scanned.connect(self._on_scanned)
+        thread.failed.connect(self._on_failed)
+        thread.finished.connect(lambda t=thread: self._on_thread_finished(t))
+        self._threads.add(thread)
+        thread.start()
+
+    def _on_thread_finished(self, thread):
+        self._threads.discard(thread)
+        thread.deleteLater()
+        if self._rescan_pending and thread.generation == self._generation:
+            self._rescan_pending = False
+            self._start_scan()
+
+    def _on_progress(self, generation, count):
+        # Only report progress while nothing has been published for this folder yet.
+        if generation == self._generation and not self._published:
+            self.scan_progress.emit(count)
+
+    def _on_failed(self, generation, message):
+        if generation == self._generation:
+            self.scan_failed.emit(message)
+
+    def _on_scanned(self, generation, names):
+        if generation != self._generation:
+            return  # Result for a folder that is no longer open
+        if not self._published:
+            self.names = names
+            self._published = True
+            save_index(self.folder_path, self.names)
+            self.index_ready.emit(self.folder_path, list(self.names))
+            return
+
+        current = set(self.names)
+        scanned = set(names)
+        added = [n for n in names if n not in current]
+        removed = [n for n in self.names if n not in scanned]
+        if not added and not removed:
+            return
+        self.names = names
+        save_index(self.folder_path, self.names)
+        self.entries_changed.emit(self.folder_path, added, removed)
+
+
+def merge_sorted_paths(paths, added_paths, removed_paths):
+    """Applies an add/remove delta to a naturally sorted list of paths in O(n)."""
+    removed = set(removed_paths)
+    kept = (p for p in paths if p not in removed)
+    key = lambda p: natural_sort_key(os.path.basename(p))
+    return list(heapq.merge(kept, sorted(added_paths, key=key), key=key))
@@ -0,0 +1,222 @@
+# image_cache.py
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtCore import QRunnable, QThreadPool
+from PyQt5.QtGui import QImage, QImageReader
+
+
+class ImageCache:
+    """Thread-safe LRU cache of decoded QImages, bounded by total size in bytes."""
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()  # path -> QImage, least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, path, count=True):
+        """
+        Returns the cached image for path (marking it most recently used) or
+        None. With count=False the lookup is left out of the hit/miss
+        counters, for callers that count it themselves with record().
+        """
+        with self._lock:
+            image = self._images.get(path)
+            if image is None:
+                if count:
+                    self.misses += 1
+                return None
+            self._images.move_to_end(path)
+            if count:
+                self.hits += 1
+            return image
+
+    def record(self, hit):
+        """Counts one lookup as a hit or a miss."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def __contains__(self, path):
+        with self._lock:
+            return path in self._images
+
+    def put(self, path, image):
+        """Adds an image, evicting least recently used entries until it fits."""
+        size = image.sizeInBytes()
+        if size > self.max_bytes:
+            return  # Would evict everything else and still not fit
+        with self._lock:
+            old = self._images.pop(path, None)
+            if old is not None:
+                self.current_bytes -= old.sizeInBytes()
+            self._images[path] = image
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self.current_bytes -= evicted.sizeInBytes()
+
+    def discard(self, path):
+        with self._lock:
+            old = self._images.pop(path, None)
+            if old is not None:
+                self.current_bytes -= old.sizeInBytes()
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.current_bytes = 0
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Returns hit/miss counters and memory usage, used to tune the prefetch window."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._images),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class _DecodeTask(QRunnable):
+    """
+    Decodes a single image on a worker thread and stores it in the cache. The
+    image is also kept in the task for a caller waiting on done.
+    """
+    def __init__(self, prefetcher, path):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.path = path
+        self.image = None
+        self.done = threading.Event()
+        self.started = False
+        self.cancelled = False
+
+    def run(self):
+        with self.prefetcher._lock:
+            if self.cancelled:
+                return
+            self.started = True
+        try:
+            # QImage (unlike QPixmap) is safe to create outside the GUI thread.
+            image = QImage(self.path)
+            if not image.isNull():
+                self.image = image
+                self.prefetcher.cache.put(self.path, image)
+        finally:
+            with self.prefetcher._lock:
+                if self.prefetcher._pending.get(self.path) is self:
+                    del self.prefetcher._pending[self.path]
+            self.done.set()
+
+
+class ImagePrefetcher:
+    """
+    Decodes the images around the current index in a thread pool so that
+    navigating to them can be served from the ImageCache.
+    """
+    def __init__(self, cache, window=2, max_threads=2):
+        self.cache = cache
+        self.window = window  # Number of images to prefetch on each side
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self._pending = {}  # path -> _DecodeTask
+        self._lock = threading.Lock()
+
+    def load(self, path):
+        """
+        Returns the decoded image for path; called from the GUI thread when an
+        image is shown. Served from the cache when possible, waits for a
+        prefetch of the same path that is already decoding, and otherwise
+        decodes synchronously (taking back a prefetch that has not started,
+        which may be queued behind other work on the pool). Returns a null
+        QImage if the file cannot be read. Counts one cache lookup: a hit if
+        the image came from the cache or a prefetch, a miss if it had to be
+        decoded here.
+        """
+        image = self.cache.get(path, count=False)
+        if image is None:
+            with self._lock:
+                task = self._pending.get(path)
+                if task is not None and not task.started:
+                    self._cancel(path, task)
+                    task = None
+            if task is not None:
+                task.done.wait()
+                image = task.image
+        self.cache.record(image is not None)
+        if image is not None:
+            return image
+        return self.decode(path)
+
+    def decode(self, path):
+        """
+        Returns the image for path from the cache, or decodes (and caches) it.
+        Safe to call from any thread and not counted in the cache stats.
+        """
+        image = self.cache.get(path, count=False)
+        if image is not None:
+            return image
+        image = QImage(path)
+        if not image.isNull():
+            self.cache.put(path, image)
+        return image
+
+    def prefetch(self, image_paths, index):
+        """Queues decoding of the images within `window` of index, nearest first."""
+        self.cancel_pending()
+        for offset in range(1, self.window + 1):
+            for neighbour in (index + offset, index - offset):
+                if 0 <= neighbour < len(image_paths):
+                    self._submit(image_paths[neighbour])
+
+    def _submit(self, path):
+        if path in self.cache or not self._fits_cache(path):
+            return
+        with self._lock:
+            if path in self._pending:
+                return
+            task = _DecodeTask(self, path)
+            self._pending[path] = task
+        self.pool.start(task)
+
+    def _fits_cache(self, path):
+        """False if the decoded image would be too large for the cache (a prefetch would be wasted)."""
+        size = QImageReader(path).size()
+        if not size.isValid():
+            return True  # Unknown until decoded
+        return size.width() * size.height() * 4 <= self.cache.max_bytes  # 32-bit pixels, as most images decode to
+
+    def cancel_pending(self):
+        """
+        Drops queued decodes that have not started yet (e.g. after a jump).
+        Other tasks on the pool (e.g. image pyramids) are left queued.
+        """
+        with self._lock:
+            for path, task in list(self._pending.items()):
+                if not task.started:
+                    self._cancel(path, task)
+
+    def _cancel(self, path, task):
+        """Drops a task that has not started; called with self._lock held."""
+        task.cancelled = True
+        task.done.set()
+        del self._pending[path]
+        self.pool.tryTake(task)
+
+    def clear(self):
+        self.cancel_pending()
+        self.cache.clear()
+        self.cache.reset_stats()
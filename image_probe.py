@@ -0,0 +1,207 @@
+# image_probe.py
+import os
+import json
+import struct
+import threading
+
+import cv2
+
+DIMS_FILENAME = ".image_dims.json"
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, ...); C4, C8 and CC are not frames.
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _png_size(f, head):
+    if head[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", head[16:24])
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)  # Skip to the next marker
+        while byte == b"\xff":
+            byte = f.read(1)  # Markers may be padded with 0xFF
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD9, 0xDA):
+            return None  # End of image / start of scan reached without a frame header
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue  # Markers without a length field
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker in _JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">HH", data[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _bmp_size(f, head):
+    header_size = struct.unpack("<I", head[14:18])[0]
+    if header_size == 12:  # OS/2 BITMAPCOREHEADER
+        width, height = struct.unpack("<HH", head[18:22])
+    else:
+        width, height = struct.unpack("<ii", head[18:26])
+    return abs(width), abs(height)  # Negative height means top-down rows
+
+
+def _tiff_size(f, head):
+    endian = "<" if head[:2] == b"II" else ">"
+    if struct.unpack(endian + "H", head[2:4])[0] != 42:
+        return None  # BigTIFF or not a TIFF
+    ifd_offset = struct.unpack(endian + "I", head[4:8])[0]
+    f.seek(ifd_offset)
+    count_bytes = f.read(2)
+    if len(count_bytes) < 2:
+        return None
+    count = struct.unpack(endian + "H", count_bytes)[0]
+    entries = f.read(count * 12)
+    width = height = None
+    for i in range(count):
+        tag, typ = struct.unpack(endian + "HH", entries[i * 12:i * 12 + 4])
+        if tag not in (256, 257):
+            continue
+        if typ == 3:    # SHORT
+            value = struct.unpack(endian + "H", entries[i * 12 + 8:i * 12 + 10])[0]
+        elif typ == 4:  # LONG
+            value = struct.unpack(endian + "I", entries[i * 12 + 8:i * 12 + 12])[0]
+        else:
+            return None
+        if tag == 256:
+            width = value
+        else:
+            height = value
+    if width is None or height is None:
+        return None
+    return width, height
+
+
+def probe_header(image_path):
+    """
+    Returns (width, height) parsed from the PNG/JPEG/BMP/TIFF header without
+    decoding pixels, or None when the format is not recognised. The stored
+    dimensions are returned; EXIF orientation is not applied, matching how
+    the annotation tab displays (and therefore labels) the image.
+    """
+    try:
+        with open(image_path, "rb") as f:
+            head = f.read(32)
+            if head[:8] == b"\x89PNG\r\n\x1a\n":
+                return _png_size(f, head)
+            if head[:2] == b"\xff\xd8":
+                return _jpeg_size(f)
+            if head[:2] == b"BM" and len(head) >= 26:
+                return _bmp_size(f, head)
+            if head[:4] in (b"II*\x00", b"MM\x00*"):
+                return _tiff_size(f, head)
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def probe_image_size(image_path):
+    """Returns (width, height) from the header, decoding the image only if the header cannot be parsed."""
+    size = probe_header(image_path)
+    if size is not None:
+        return size
+    img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return None
+    height, width = img.shape[:2]
+    return width, height
+
+
+class ImageSizeIndex:
+    """
+    Thread-safe cache of image dimensions. Sizes of displayed images are
+    recorded directly; everything else is filled lazily by header probes so
+    labels are always normalised with the dimensions of their own image.
+
+    With persistent=True probed sizes are also stored in a .image_dims.json
+    sidecar in each image folder, keyed by file name and validated against
+    mtime and size, so later runs only need a stat per image.
+    """
+    def __init__(self, persistent=True):
+        self.persistent = persistent
+        self._sizes = {}          # image path -> (width, height)
+        self._folders = {}        # folder -> {name: [mtime_ns, size, width, height]}
+        self._dirty_folders = set()
+        self._lock = threading.Lock()
+
+    def set(self, image_path, width, height):
+        with self._lock:
+            self._sizes[image_path] = (width, height)
+
+    def _sidecar(self, folder):
+        entries = self._folders.get(folder)
+        if entries is None:
+            try:
+                with open(os.path.join(folder, DIMS_FILENAME), "r") as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                entries = {}
+            self._folders[folder] = entries
+        return entries
+
+    def get(self, image_path):
+        with self._lock:
+            size = self._sizes.get(image_path)
+        if size is not None:
+            return size
+
+        if self.persistent:
+            try:
+                st = os.stat(image_path)
+            except OSError:
+                return None
+            folder, name = os.path.split(image_path)
+            with self._lock:
+                entry = self._sidecar(folder).get(name)
+            if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                size = (entry[2], entry[3])
+                with self._lock:
+                    self._sizes[image_path] = size
+                return size
+
+        size = probe_image_size(image_path)
+        if size is None:
+            return None
+        with self._lock:
+            self._sizes[image_path] = size
+            if self.persistent:
+                self._sidecar(folder)[name] = [st.st_mtime_ns, st.st_size, size[0], size[1]]
+                self._dirty_folders.add(folder)
+        return size
+
+    def discard(self, image_path):
+        with self._lock:
+            self._sizes.pop(image_path, None)
+
+    def clear(self):
+        with self._lock:
+            self._sizes.clear()
+
+    def save(self):
+        """Writes the sidecars of folders with newly probed images. Read-only folders are skipped."""
+        with self._lock:
+            dirty = {folder: dict(self._folders[folder]) for folder in self._dirty_folders}
+            self._dirty_folders.clear()
+        for folder, entries in dirty.items():
+            path = os.path.join(folder, DIMS_FILENAME)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass
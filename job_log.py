@@ -0,0 +1,152 @@
+# job_log.py
+import os
+import re
+import mmap
+from bisect import bisect_right
+from collections import deque
+
+LOG_MAX_LINES = 5000   # Lines of a job's output kept in memory (and shown in the console)
+LOG_INDEX_STEP = 1024  # Lines between entries of the byte offset index of the log file
+
+
+def collapse_line(text):
+    """What a terminal shows for text with carriage returns: the last segment that was written."""
+    if "\r" not in text:
+        return text
+    segments = [segment for segment in text.split("\r") if segment]
+    return segments[-1] if segments else ""
+
+
+class JobLog:
+    """
+    Console output of a training job. Carriage-return progress updates are
+    collapsed into the line they end up as, the last max_lines lines are kept
+    in memory and every line is appended to a log file, which read_lines()
+    and find() seek into through a sparse line offset index.
+    """
+    def __init__(self, path, max_lines=LOG_MAX_LINES):
+        self.path = path
+        self.lines = deque(maxlen=max_lines)  # Last complete lines
+        self.current = ""      # Unterminated last line, e.g. a progress bar being redrawn
+        self.line_count = 0    # Complete lines in the log file
+        self._offsets = [0]    # Byte offset of every LOG_INDEX_STEP-th line
+        self._size = 0
+        self._file = None
+        self._pending_cr = False  # The last chunk ended in \r: the next text overwrites the current line
+        self._loaded = False
+
+    @property
+    def first_line(self):
+        """Line number of self.lines[0]."""
+        return self.line_count - len(self.lines)
+
+    def load(self):
+        """Indexes an existing log file (e.g. of a job from an earlier session) and keeps its last lines."""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Cut off by a crash; appended lines start after it
+                    self.lines.append(line[:-1].decode(errors="replace"))
+                    self._size += len(line)
+                    self.line_count += 1
+                    if self.line_count % LOG_INDEX_STEP == 0:
+                        self._offsets.append(self._size)
+        except OSError:
+            pass
+
+    def append(self, text):
+        """Adds console output; complete lines are written to the log file."""
+        self.load()
+        text = text.replace("\r\n", "\n")
+        if self._pending_cr and text:
+            text = "\r" + text
+        self._pending_cr = text.endswith("\r")
+        parts = (self.current + text).split("\n")
+        self.current = collapse_line(parts.pop())
+        if parts:
+            self._write([collapse_line(part) for part in parts])
+
+    def close(self):
+        """Ends the unterminated last line and closes the log file."""
+        if self.current:
+            self._write([self.current])
+            self.current = ""
+        self._pending_cr = False
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, lines):
+        if self._file is None:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = open(self.path, "ab")
+                # Continue after the last complete line of an earlier run
+                self._file.truncate(self._size)
+            except OSError as e:
+                print(f"Error opening the job log {self.path}: {e}")
+        for line in lines:
+            self.lines.append(line)
+            data = line.encode() + b"\n"
+            if self._file is not None:
+                self._file.write(data)
+            self._size += len(data)
+            self.line_count += 1
+            if self.line_count % LOG_INDEX_STEP == 0:
+                self._offsets.append(self._size)
+        if self._file is not None:
+            self._file.flush()
+
+    # ---------------- LOG FILE -----------------
+
+    def read_lines(self, start, count):
+        """Returns up to count lines of the log file from line number start."""
+        self.load()
+        start = max(0, min(start, self.line_count))
+        count = min(count, self.line_count - start)
+        if count <= 0:
+            return []
+        if start >= self.first_line:
+            return list(self.lines)[start - self.first_line:start - self.first_line + count]
+        lines = []
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[start // LOG_INDEX_STEP])
+            for _ in range(start % LOG_INDEX_STEP):
+                f.readline()
+            for _ in range(count):
+                lines.append(f.readline().rstrip(b"\n").decode(errors="replace"))
+        return lines
+
+    def find(self, text, start_line=0):
+        """
+        Line number of the first line from start_line on that contains text
+        (case-insensitive), or -1. Searches the whole log file, not only the
+        lines kept in memory.
+        """
+        self.load()
+        if not text or start_line >= self.line_count:
+            return -1
+        pattern = re.compile(re.escape(text.encode()), re.IGNORECASE)
+        try:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                start = self._line_offset(data, max(0, start_line))
+                match = pattern.search(data, start, self._size)
+                if match is None:
+                    return -1
+                return self._line_number(data, match.start())
+        except (OSError, ValueError):  # ValueError: mmap of an empty file
+            return -1
+
+    def _line_offset(self, data, line):
+        offset = self._offsets[line // LOG_INDEX_STEP]
+        for _ in range(line % LOG_INDEX_STEP):
+            offset = data.find(b"\n", offset) + 1
+        return offset
+
+    def _line_number(self, data, offset):
+        block = bisect_right(self._offsets, offset) - 1
+        return block * LOG_INDEX_STEP + data[self._offsets[block]:offset].count(b"\n")
@@ -0,0 +1,148 @@
+# log_view.py
+from PyQt5.QtWidgets import QWidget, QPlainTextEdit, QLineEdit, QPushButton, QLabel, QHBoxLayout, QVBoxLayout
+from PyQt5.QtGui import QTextCursor, QFontDatabase
+from PyQt5.QtCore import QTimer
+
+from job_log import LOG_MAX_LINES
+
+FLUSH_INTERVAL_MS = 200  # Output arriving in between is shown in one update
+CONTEXT_LINES = 200      # Lines shown before a search hit that is no longer in memory
+
+
+class LogView(QWidget):
+    """
+    Console of a JobLog. The view follows the end of the log with at most
+    LOG_MAX_LINES lines and catches up on new output every
+    FLUSH_INTERVAL_MS. Searching covers the whole log file. Hits older than
+    the lines kept in memory are shown by loading the lines around them.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.log = None
+        self.following = True  # Showing the end of the log, not an older part of the log file
+        self._shown_count = 0   # log.line_count at the last flush
+        self._search_line = -1  # Line number of the last search hit
+        self._window_start = 0  # First line number shown while not following
+
+        self.text_edit = QPlainTextEdit(self)
+        self.text_edit.setReadOnly(True)
+        self.text_edit.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.text_edit.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.text_edit.setMaximumBlockCount(LOG_MAX_LINES + 1)  # +1: the unterminated last line
+        self.search_edit = QLineEdit(self)
+        self.search_edit.setPlaceholderText("Search the log...")
+        self.search_edit.returnPressed.connect(self.find_next)
+        self.find_button = QPushButton("Find Next", self)
+        self.find_button.clicked.connect(self.find_next)
+        self.follow_button = QPushButton("Back to End", self)
+        self.follow_button.clicked.connect(self.follow)
+        self.follow_button.setEnabled(False)
+        self.position_label = QLabel("", self)
+
+        search_layout = QHBoxLayout()
+        search_layout.addWidget(self.search_edit)
+        search_layout.addWidget(self.find_button)
+        search_layout.addWidget(self.follow_button)
+        search_layout.addWidget(self.position_label)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.text_edit)
+        layout.addLayout(search_layout)
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def set_log(self, log):
+        """Shows the end of log (a JobLog, or None to clear the view)."""
+        self.log = log
+        self._search_line = -1
+        if log is not None:
+            log.load()
+        self.follow()
+
+    def log_updated(self):
+        """Schedules showing new output of the log; called for every chunk of output."""
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def follow(self):
+        """Shows the end of the log and keeps following new output."""
+        self.following = True
+        self.follow_button.setEnabled(False)
+        self.flush_timer.stop()
+        lines = list(self.log.lines) + [self.log.current] if self.log is not None else []
+        self.text_edit.setPlainText("\n".join(lines))
+        self._shown_count = self.log.line_count if self.log is not None else 0
+        self.text_edit.moveCursor(QTextCursor.End)
+        self._update_position()
+
+    def flush(self):
+        """Appends the lines completed since the last flush and redraws the unterminated last line."""
+        self.flush_timer.stop()
+        if self.log is None:
+            return
+        if not self.following:
+            self._update_position()
+            return
+        new_count = self.log.line_count - self._shown_count
+        if new_count > len(self.log.lines):
+            self.follow()  # More new lines than are kept: redraw everything
+            return
+        scroll_bar = self.text_edit.verticalScrollBar()
+        at_end = scroll_bar.value() == scroll_bar.maximum()
+        new_lines = list(self.log.lines)[len(self.log.lines) - new_count:] if new_count else []
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.movePosition(QTextCursor.StartOfBlock, QTextCursor.KeepAnchor)
+        cursor.insertText("\n".join(new_lines + [self.log.current]))
+        self._shown_count = self.log.line_count
+        if at_end:
+            scroll_bar.setValue(scroll_bar.maximum())
+        self._update_position()
+
+    def find_next(self):
+        """Selects the next line containing the search text, wrapping around at the end of the log."""
+        text = self.search_edit.text()
+        if self.log is None or not text:
+            return
+        self.flush()
+        line = self.log.find(text, self._search_line + 1)
+        if line < 0 and self._search_line >= 0:
+            line = self.log.find(text, 0)
+        if line < 0:
+            self.position_label.setText("Not found")
+            return
+        self._search_line = line
+        if line >= self.log.first_line:
+            if not self.following:
+                self.follow()
+            self._select_line(line - self.log.first_line)
+        else:
+            self._show_window(max(0, line - CONTEXT_LINES))
+            self._select_line(line - self._window_start)
+        self._update_position()
+
+    def _show_window(self, start):
+        """Stops following and shows LOG_MAX_LINES lines of the log file from line start."""
+        self.following = False
+        self.follow_button.setEnabled(True)
+        self._window_start = start
+        self.text_edit.setPlainText("\n".join(self.log.read_lines(start, LOG_MAX_LINES)))
+
+    def _select_line(self, block_number):
+        block = self.text_edit.document().findBlockByNumber(block_number)
+        cursor = QTextCursor(block)
+        cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+        self.text_edit.setTextCursor(cursor)
+        self.text_edit.centerCursor()
+
+    def _update_position(self):
+        if self.log is None:
+            self.position_label.setText("")
+        elif self.following:
+            self.position_label.setText(f"{self.log.line_count} lines")
+        else:
+            end = min(self._window_start + LOG_MAX_LINES, self.log.line_count)
+            self.position_label.setText(f"Lines {self._window_start + 1}-{end} of {self.log.line_count}")
@@ -21,11 +21,28 @@ class MainWindow(QMainWindow):
         self.tab_widget.addTab(self.training_tab, "Training")
         self.tab_widget.addTab(self.settings_tab, "Settings")
 
+        # Hand the annotation data to the training tab whenever it is opened
+        self.tab_widget.currentChanged.connect(self.sync_training_tab)
+
         central_widget = QWidget()
         layout = QVBoxLayout(central_widget)
         layout.addWidget(self.tab_widget)
         self.setCentralWidget(central_widget)
 
+    def sync_training_tab(self, index):
+        if self.tab_widget.widget(index) is not self.training_tab:
+            return
+        self.training_tab.set_image_paths(list(self.annotation_tab.image_paths))
+        self.training_tab.set_classes(self.annotation_tab.classes)
+        self.training_tab.set_annotation_store(self.annotation_tab.annotation_store)
+        self.training_tab.set_image_sizes(self.annotation_tab.image_sizes)
+        self.training_tab.set_exporting(self.training_tab.is_exporting())
+
+    def closeEvent(self, event):
+        self.training_tab.shutdown()    # Stop a running export at a resumable point
+        self.annotation_tab.shutdown()  # Write any journaled edits to the label files
+        super().closeEvent(event)
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     window = MainWindow()
@@ -0,0 +1,83 @@
+# metric_chart.py
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtGui import QPainter, QPen, QColor, QPolygonF, QFontMetrics
+from PyQt5.QtCore import Qt, QPointF, QRectF
+
+SERIES_COLORS = ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f")
+
+
+class MetricChart(QWidget):
+    """Line chart of a few per-epoch series, drawn with QPainter."""
+    def __init__(self, title, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.series = []  # (label, [x], [y])
+        self.setMinimumHeight(160)
+
+    def set_series(self, series):
+        """Replaces the plotted series with [(label, [x], [y])]; series without points are skipped."""
+        self.series = [(label, xs, ys) for label, xs, ys in series if xs]
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), self.palette().base())
+        metrics = QFontMetrics(painter.font())
+        line_height = metrics.height()
+        painter.setPen(self.palette().text().color())
+        painter.drawText(QRectF(0, 2, self.width(), line_height), Qt.AlignHCenter, self.title)
+        if not self.series:
+            painter.drawText(QRectF(self.rect()), Qt.AlignCenter, "No data yet")
+            return
+
+        xs = [x for _, series_xs, _ in self.series for x in series_xs]
+        ys = [y for _, _, series_ys in self.series for y in series_ys]
+        x_min, x_max = min(xs), max(xs)
+        y_min, y_max = min(ys), max(ys)
+        if x_max == x_min:
+            x_max = x_min + 1
+        if y_max == y_min:
+            y_max = y_min + 1
+        y_pad = (y_max - y_min) * 0.05
+        y_min, y_max = y_min - y_pad, y_max + y_pad
+
+        ticks = [y_min + (y_max - y_min) * i / 4 for i in range(5)]
+        left = max(metrics.horizontalAdvance(f"{y:.3g}") for y in ticks) + 8
+        plot = QRectF(left, line_height + 6, self.width() - left - 10, self.height() - 2 * line_height - 14)
+        if plot.width() <= 0 or plot.height() <= 0:
+            return
+
+        def to_point(x, y):
+            return QPointF(plot.left() + (x - x_min) / (x_max - x_min) * plot.width(),
+                           plot.bottom() - (y - y_min) / (y_max - y_min) * plot.height())
+
+        # Grid and axis labels
+        grid_pen = QPen(self.palette().mid().color(), 1, Qt.DotLine)
+        for y in ticks:
+            point = to_point(x_min, y)
+            painter.setPen(grid_pen)
+            painter.drawLine(QPointF(plot.left(), point.y()), QPointF(plot.right(), point.y()))
+            painter.setPen(self.palette().text().color())
+            painter.drawText(QRectF(0, point.y() - line_height / 2, left - 4, line_height),
+                             Qt.AlignRight | Qt.AlignVCenter, f"{y:.3g}")
+        painter.drawText(QRectF(plot.left(), plot.bottom() + 2, plot.width(), line_height),
+                         Qt.AlignLeft, f"{x_min:g}")
+        painter.drawText(QRectF(plot.left(), plot.bottom() + 2, plot.width(), line_height),
+                         Qt.AlignRight, f"epoch {x_max:g}")
+        painter.drawRect(plot)
+
+        # Series and legend
+        legend_y = plot.top() + 4
+        for i, (label, series_xs, series_ys) in enumerate(self.series):
+            color = QColor(SERIES_COLORS[i % len(SERIES_COLORS)])
+            painter.setPen(QPen(color, 2))
+            points = [to_point(x, y) for x, y in zip(series_xs, series_ys)]
+            if len(points) == 1:
+                painter.drawEllipse(points[0], 2, 2)
+            else:
+                painter.drawPolyline(QPolygonF(points))
+            text = f"{label}: {series_ys[-1]:.4g}"
+            width = metrics.horizontalAdvance(text)
+            painter.drawText(QRectF(plot.right() - width - 6, legend_y, width + 4, line_height), Qt.AlignRight, text)
+            legend_y += line_height
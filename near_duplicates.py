@@ -0,0 +1,223 @@
+# near_duplicates.py
+import os
+import json
+import itertools
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+HASHES_FILENAME = ".image_hashes.json"
+DEFAULT_MAX_DISTANCE = 6  # Differing bits (of 64) for two images to count as near-duplicates
+MAX_DISTANCE = 11         # Larger radii make the multi-index search enumerate too many variants
+CHUNKS = 4                # 16-bit substrings per hash for multi-index hashing
+
+
+def dhash(image_path):
+    """
+    64-bit difference hash: the image is shrunk to 9 x 8 grey pixels and
+    each bit says whether a pixel is brighter than its right neighbour.
+    Returns an int, or None if the image cannot be read.
+    """
+    flags = cv2.IMREAD_GRAYSCALE | cv2.IMREAD_IGNORE_ORIENTATION
+    if image_path.lower().endswith((".jpg", ".jpeg")):
+        flags = cv2.IMREAD_REDUCED_GRAYSCALE_8 | cv2.IMREAD_IGNORE_ORIENTATION  # Cheap 1/8 scale decode
+    img = cv2.imread(image_path, flags)
+    if img is None:
+        return None
+    small = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+    value = 0
+    for bit in (small[:, 1:] > small[:, :-1]).flatten().tolist():
+        value = (value << 1) | bit
+    return value
+
+
+def _dhash_chunk(paths):
+    """Process pool worker."""
+    cv2.setNumThreads(1)
+    return [dhash(p) for p in paths]
+
+
+def _popcount(values):
+    """Number of set bits of each uint64."""
+    if hasattr(np, "bitwise_count"):  # NumPy 2
+        return np.bitwise_count(values)
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class PerceptualHashCache:
+    """
+    dHashes of images, stored in a .image_hashes.json sidecar per image
+    folder and validated against mtime and size like ImageSizeIndex, so only
+    new or modified images are decoded again.
+    """
+    def __init__(self):
+        self._folders = {}  # folder -> {name: [mtime_ns, size, hash as hex]}
+        self._dirty_folders = set()
+        self._lock = threading.Lock()
+
+    def _sidecar(self, folder):
+        entries = self._folders.get(folder)
+        if entries is None:
+            try:
+                with open(os.path.join(folder, HASHES_FILENAME), "r") as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                entries = {}
+            self._folders[folder] = entries
+        return entries
+
+    def hashes(self, image_paths, max_workers=None, progress=None):
+        """
+        Returns the hash of every image (None if unreadable), computing missing
+        ones in a process pool. progress, if given, is called as
+        progress(done, total) while hashing.
+        """
+        result = [None] * len(image_paths)
+        todo, stats = [], {}
+        with self._lock:
+            for i, path in enumerate(image_paths):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                stats[i] = st
+                folder, name = os.path.split(path)
+                entry = self._sidecar(folder).get(name)
+                if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                    result[i] = int(entry[2], 16)
+                else:
+                    todo.append(i)
+
+        if todo:
+            chunk_size = 64  # Amortises process pool overhead per image
+            chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+            done = 0
+            with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as pool:
+                for chunk, hashes in zip(chunks, pool.map(_dhash_chunk, [[image_paths[i] for i in c] for c in chunks])):
+                    with self._lock:
+                        for i, h in zip(chunk, hashes):
+                            result[i] = h
+                            if h is not None:
+                                folder, name = os.path.split(image_paths[i])
+                                st = stats[i]
+                                self._sidecar(folder)[name] = [st.st_mtime_ns, st.st_size, f"{h:016x}"]
+                                self._dirty_folders.add(folder)
+                    done += len(chunk)
+                    if progress:
+                        progress(done, len(todo))
+        return result
+
+    def save(self):
+        """Writes the sidecars of folders with newly hashed images. Read-only folders are skipped."""
+        with self._lock:
+            dirty = {folder: dict(self._folders[folder]) for folder in self._dirty_folders}
+            self._dirty_folders.clear()
+        for folder, entries in dirty.items():
+            path = os.path.join(folder, HASHES_FILENAME)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass
+
+
+def _close_pairs(values, max_distance, block_size=65536):
+    """
+    Multi-index hashing: returns index arrays (i, j), i < j, of all pairs of
+    64-bit hashes at most max_distance bits apart.
+
+    The hashes are cut into CHUNKS 16-bit substrings. If two hashes differ
+    in at most max_distance bits, one of their substrings differs in at
+    most max_distance // CHUNKS bits (pigeonhole), so candidates are found
+    by looking up every substring and its few variants within that radius in
+    a sorted table; only those candidates are compared in full.
+    """
+    n = len(values)
+    radius = max_distance // CHUNKS
+    masks = [sum(1 << b for b in bits) for k in range(radius + 1) for bits in itertools.combinations(range(16), k)]
+    found_i, found_j = [], []
+    for c in range(CHUNKS):
+        chunk = ((values >> np.uint64(16 * c)) & np.uint64(0xFFFF)).astype(np.int64)
+        order = np.argsort(chunk, kind="stable")
+        sorted_chunk = chunk[order]
+        for start in range(0, n, block_size):
+            query = np.arange(start, min(n, start + block_size))
+            for mask in masks:
+                keys = chunk[query] ^ mask
+                lo = np.searchsorted(sorted_chunk, keys, "left")
+                counts = np.searchsorted(sorted_chunk, keys, "right") - lo
+                total = int(counts.sum())
+                if not total:
+                    continue
+                # Expand each query into its bucket of candidates.
+                qi = np.repeat(query, counts)
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                cj = order[np.repeat(lo, counts) + offsets]
+                keep = qi < cj
+                qi, cj = qi[keep], cj[keep]
+                keep = _popcount(values[qi] ^ values[cj]) <= max_distance
+                found_i.append(qi[keep])
+                found_j.append(cj[keep])
+    if not found_i:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    # The same pair can be found through several chunks.
+    pairs = np.unique(np.concatenate(found_i) * n + np.concatenate(found_j))
+    return pairs // n, pairs % n
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:  # Path compression
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+
+def group_near_duplicates(hashes, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Groups items whose 64-bit hashes are within max_distance bits,
+    transitively (union-find over the close pairs). Identical hashes are
+    merged first, so only distinct values are searched. Returns a list of
+    index lists with at least two items each.
+    """
+    by_hash = {}
+    for i, h in enumerate(hashes):
+        if h is not None:
+            by_hash.setdefault(h, []).append(i)
+    distinct = list(by_hash)
+    uf = _UnionFind(len(distinct))
+    if max_distance > 0 and len(distinct) > 1:
+        pairs_i, pairs_j = _close_pairs(np.array(distinct, dtype=np.uint64), max_distance)
+        for i, j in zip(pairs_i.tolist(), pairs_j.tolist()):
+            uf.union(i, j)
+
+    groups = {}
+    for j, h in enumerate(distinct):
+        groups.setdefault(uf.find(j), []).extend(by_hash[h])
+    return [sorted(g) for g in groups.values() if len(g) > 1]
+
+
+def find_near_duplicates(image_paths, max_distance=DEFAULT_MAX_DISTANCE, cache=None, max_workers=None, progress=None):
+    """Returns groups (lists of image paths) of near-identical images, hashing with the given cache."""
+    cache = cache if cache is not None else PerceptualHashCache()
+    image_paths = list(image_paths)
+    hashes = cache.hashes(image_paths, max_workers=max_workers, progress=progress)
+    cache.save()
+    return [[image_paths[i] for i in group] for group in group_near_duplicates(hashes, max_distance)]
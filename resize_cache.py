@@ -0,0 +1,241 @@
+# resize_cache.py
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+import yaml
+
+from dataset_export import SPLITS
+from image_probe import probe_header
+
+RESIZE_MANIFEST_FILENAME = "resize_manifest.json"
+RESIZE_MANIFEST_VERSION = 1
+LETTERBOX_COLOR = (114, 114, 114)  # Padding colour used by YOLOv8
+
+# JPEG can be decoded directly at 1/2, 1/4 or 1/8 scale, which is far cheaper than a full decode.
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def letterbox_params(width, height, size):
+    """Returns (scale, resized width, resized height, pad x, pad y) to fit an image into a size x size square."""
+    scale = min(size / width, size / height)
+    new_w = max(1, int(round(width * scale)))
+    new_h = max(1, int(round(height * scale)))
+    return scale, new_w, new_h, (size - new_w) // 2, (size - new_h) // 2
+
+
+def letterbox(img, size, color=LETTERBOX_COLOR, dims=None):
+    """
+    Resizes img to fit a size x size square, keeping the aspect ratio, and
+    pads the rest. dims, the (width, height) of the original when img was
+    decoded at reduced size, makes the geometry match letterbox_labels().
+    """
+    height, width = img.shape[:2]
+    _, new_w, new_h, pad_x, pad_y = letterbox_params(*(dims or (width, height)), size)
+    if (new_w, new_h) != (width, height):
+        interpolation = cv2.INTER_AREA if new_w < width else cv2.INTER_LINEAR
+        img = cv2.resize(img, (new_w, new_h), interpolation=interpolation)
+    canvas = np.full((size, size, 3), color, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = img
+    return canvas
+
+
+def letterbox_labels(label_text, width, height, size):
+    """Maps YOLO labels of a width x height image onto its size x size letterboxed version."""
+    scale, new_w, new_h, pad_x, pad_y = letterbox_params(width, height, size)
+    lines = []
+    for line in label_text.splitlines():
+        parts = line.split()
+        if len(parts) < 5:
+            continue
+        class_id = parts[0]
+        xc, yc, w, h = (float(v) for v in parts[1:5])
+        lines.append(f"{class_id} {(xc * new_w + pad_x) / size:.6f} {(yc * new_h + pad_y) / size:.6f} "
+                     f"{w * new_w / size:.6f} {h * new_h / size:.6f}")
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def _read_for_size(image_path, size):
+    """
+    Decodes an image, using JPEG reduced decoding when the result is still at
+    least `size`. EXIF orientation is ignored, like in the annotation tab.
+    """
+    dims = probe_header(image_path)
+    if dims is not None and image_path.lower().endswith((".jpg", ".jpeg")):
+        for factor, flag in _REDUCED_FLAGS:
+            if max(dims) // factor >= size:
+                img = cv2.imread(image_path, flag | cv2.IMREAD_IGNORE_ORIENTATION)
+                if img is not None:
+                    return img, dims
+                break
+    img = cv2.imread(image_path, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+    if img is None:
+        return None, None
+    return img, (img.shape[1], img.shape[0])
+
+
+def _resize_one(image_path, dest_path, size, jpeg_quality):
+    """Process pool worker: writes the letterboxed image and returns the original (width, height)."""
+    cv2.setNumThreads(1)  # Parallelism comes from the pool
+    img, dims = _read_for_size(image_path, size)
+    if img is None:
+        raise ValueError(f"Could not read image: {image_path}")
+    params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality] if dest_path.lower().endswith((".jpg", ".jpeg")) else []
+    tmp_path = dest_path + ".tmp" + os.path.splitext(dest_path)[1]
+    if not cv2.imwrite(tmp_path, letterbox(img, size, dims=dims), params):
+        raise OSError(f"Could not write image: {dest_path}")
+    os.replace(tmp_path, dest_path)
+    return dims
+
+
+class ResizeStats:
+    def __init__(self):
+        self.resized = 0
+        self.reused = 0
+        self.removed = 0
+        self.elapsed = 0.0
+        self.errors = []  # (image path, error message)
+
+    def summary(self):
+        rate = self.resized / self.elapsed if self.elapsed else 0.0
+        return (f"{self.resized} images resized in {self.elapsed:.1f} s ({rate:.1f} images/s), "
+                f"{self.reused} reused, {self.removed} removed")
+
+
+class ResizedDatasetBuilder:
+    """
+    Writes letterboxed copies of an exported dataset at a fixed training
+    image size under <export_dir>/imgsz<size>, with the labels mapped onto
+    the letterboxed images, plus data_imgsz<size>.yaml pointing at them.
+    Training then decodes small images instead of the full-resolution
+    originals every epoch.
+
+    Images are resized in a process pool (decoding and resizing are CPU
+    bound). Each size has its own directory and manifest keyed by the source
+    content hash, so only new or changed images are resized again.
+    """
+    def __init__(self, exporter, size, max_workers=None, jpeg_quality=95):
+        self.exporter = exporter
+        self.size = size
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.jpeg_quality = jpeg_quality
+        self.root = os.path.join(exporter.export_dir, f"imgsz{size}")
+        self.manifest_path = os.path.join(self.root, RESIZE_MANIFEST_FILENAME)
+        self.data_yaml_path = os.path.join(exporter.export_dir, f"data_imgsz{size}.yaml")
+
+    def image_dir(self, split):
+        return os.path.join(self.root, split, "images")
+
+    def label_dir(self, split):
+        return os.path.join(self.root, split, "labels")
+
+    def dest_paths(self, image_path, split):
+        filename = os.path.basename(image_path)
+        return (os.path.join(self.image_dir(split), filename),
+                os.path.join(self.label_dir(split), os.path.splitext(filename)[0] + ".txt"))
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != RESIZE_MANIFEST_VERSION:
+            return {}
+        return manifest["entries"]
+
+    def _save_manifest(self, entries):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": RESIZE_MANIFEST_VERSION, "size": self.size, "entries": entries}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _write_label(self, image_path, split, dims):
+        _, source_label = self.exporter.dest_paths(image_path, split)
+        _, dest_label = self.dest_paths(image_path, split)
+        if os.path.exists(source_label):
+            with open(source_label, "r") as f:
+                text = f.read()
+            with open(dest_label, "w") as f:
+                f.write(letterbox_labels(text, dims[0], dims[1], self.size))
+        elif os.path.lexists(dest_label):
+            os.remove(dest_label)
+
+    def build(self, progress=None):
+        """
+        Brings the resized copy in line with the export manifest. progress,
+        if given, is called as progress(done, total). Returns ResizeStats.
+        """
+        stats = ResizeStats()
+        start = time.perf_counter()
+        export_manifest = self.exporter.load_manifest()
+        if export_manifest is None:
+            raise ValueError(f"No export manifest in {self.exporter.export_dir}; export the dataset first.")
+        for split in SPLITS:
+            os.makedirs(self.image_dir(split), exist_ok=True)
+            os.makedirs(self.label_dir(split), exist_ok=True)
+
+        source_entries = export_manifest["entries"]
+        old_entries = self._load_manifest()
+        entries, jobs = {}, []
+        for path, old in old_entries.items():
+            if path not in source_entries or source_entries[path]["split"] != old["split"]:
+                for dest in self.dest_paths(path, old["split"]):
+                    if os.path.lexists(dest):
+                        os.remove(dest)
+                stats.removed += path not in source_entries
+        for path, source in source_entries.items():
+            old = old_entries.get(path)
+            if (old is not None and old["hash"] == source["hash"] and old["split"] == source["split"]
+                    and os.path.exists(self.dest_paths(path, old["split"])[0])):
+                entries[path] = old
+                if old["label_hash"] != source["label_hash"]:
+                    self._write_label(path, source["split"], old["dims"])
+                    entries[path] = dict(old, label_hash=source["label_hash"])
+                stats.reused += 1
+            else:
+                jobs.append((path, source))
+
+        total, done = len(source_entries), stats.reused
+        if progress:
+            progress(done, total)
+        if jobs:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = {pool.submit(_resize_one, path, self.dest_paths(path, source["split"])[0],
+                                       self.size, self.jpeg_quality): (path, source)
+                           for path, source in jobs}
+                for future in as_completed(futures):
+                    path, source = futures[future]
+                    done += 1
+                    try:
+                        dims = list(future.result())
+                        self._write_label(path, source["split"], dims)
+                    except Exception as e:
+                        stats.errors.append((path, str(e)))
+                    else:
+                        entries[path] = {"hash": source["hash"], "split": source["split"],
+                                         "label_hash": source["label_hash"], "dims": dims}
+                        stats.resized += 1
+                    if progress:
+                        progress(done, total)
+
+        self._save_manifest(entries)
+        self.write_data_yaml()
+        stats.elapsed = time.perf_counter() - start
+        return stats
+
+    def write_data_yaml(self):
+        export_dir = self.exporter.export_dir
+        data_yaml_content = {
+            'train': os.path.relpath(self.image_dir("train"), export_dir).replace("\\", "/"),
+            'val': os.path.relpath(self.image_dir("valid"), export_dir).replace("\\", "/"),
+            'test': os.path.relpath(self.image_dir("test"), export_dir).replace("\\", "/"),
+            'nc': len(self.exporter.class_names),
+            'names': self.exporter.class_names
+        }
+        with open(self.data_yaml_path, 'w') as outfile:
+            yaml.dump(data_yaml_content, outfile, default_flow_style=False)
+        return self.data_yaml_path
@@ -0,0 +1,183 @@
+# spatial_index.py
+import math
+import itertools
+from collections import defaultdict
+
+import numpy as np
+
+MAX_CELLS_PER_BOX = 64  # Larger boxes are kept in the overflow set instead of the grid
+
+
+class GridIndex:
+    """
+    Uniform-grid spatial index over axis-aligned boxes keyed by box id.
+
+    Each box is registered in every cell it overlaps. With the cell size
+    chosen close to the typical box size a box touches only a few cells, so
+    point and region queries only look at the boxes near the query instead
+    of scanning the whole image.
+
+    A box that would cover more than max_cells_per_box cells (e.g. one box
+    spanning a whole image of small boxes) is kept in an overflow set
+    instead, which every query checks directly. Inserting, moving and
+    removing such a box therefore stays cheap.
+    """
+    def __init__(self, cell_size=64.0, max_cells_per_box=MAX_CELLS_PER_BOX):
+        self.cell_size = float(cell_size)
+        self.max_cells_per_box = max_cells_per_box
+        self._cells = defaultdict(set)  # (cx, cy) -> box ids
+        self._boxes = {}                # box id -> (x1, y1, x2, y2)
+        self._overflow = set()          # ids of boxes too large for the grid
+
+    @classmethod
+    def from_boxes(cls, box_ids, xyxy):
+        """Builds an index with a cell size derived from the median box size."""
+        xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        cell_size = 64.0
+        if len(xyxy):
+            sides = np.maximum(xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1])
+            cell_size = max(8.0, float(np.median(sides)) * 2)
+        index = cls(cell_size)
+        for box_id, box in zip(np.asarray(box_ids).tolist(), xyxy.tolist()):
+            index.insert(box_id, *box)
+        return index
+
+    def __len__(self):
+        return len(self._boxes)
+
+    def __contains__(self, box_id):
+        return box_id in self._boxes
+
+    def _cell_range(self, x1, y1, x2, y2):
+        cs = self.cell_size
+        return (int(math.floor(x1 / cs)), int(math.floor(y1 / cs)),
+                int(math.floor(x2 / cs)), int(math.floor(y2 / cs)))
+
+    def insert(self, box_id, x1, y1, x2, y2):
+        if box_id in self._boxes:
+            self.remove(box_id)
+        self._boxes[box_id] = (x1, y1, x2, y2)
+        cx1, cy1, cx2, cy2 = self._cell_range(x1, y1, x2, y2)
+        if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > self.max_cells_per_box:
+            self._overflow.add(box_id)
+            return
+        for cy in range(cy1, cy2 + 1):
+            for cx in range(cx1, cx2 + 1):
+                self._cells[(cx, cy)].add(box_id)
+
+    def remove(self, box_id):
+        box = self._boxes.pop(box_id, None)
+        if box is None:
+            return
+        if box_id in self._overflow:
+            self._overflow.discard(box_id)
+            return
+        cx1, cy1, cx2, cy2 = self._cell_range(*box)
+        for cy in range(cy1, cy2 + 1):
+            for cx in range(cx1, cx2 + 1):
+                cell = self._cells.get((cx, cy))
+                if cell is not None:
+                    cell.discard(box_id)
+                    if not cell:
+                        del self._cells[(cx, cy)]
+
+    update = insert
+
+    def box(self, box_id):
+        return self._boxes[box_id]
+
+    def query_point(self, x, y):
+        """Returns the ids of the boxes containing (x, y)."""
+        cs = self.cell_size
+        cell = self._cells.get((int(math.floor(x / cs)), int(math.floor(y / cs))), ())
+        result = []
+        for box_id in itertools.chain(cell, self._overflow):
+            x1, y1, x2, y2 = self._boxes[box_id]
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                result.append(box_id)
+        return result
+
+    def query_rect(self, x1, y1, x2, y2, contained=False):
+        """
+        Returns the ids of the boxes intersecting the rect, or only those lying
+        completely inside it when contained=True.
+        """
+        candidates = set(self._overflow)
+        cx1, cy1, cx2, cy2 = self._cell_range(x1, y1, x2, y2)
+        if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > len(self._cells):
+            # Huge region: walking the occupied cells is cheaper than the empty ones
+            for (cx, cy), cell in self._cells.items():
+                if cx1 <= cx <= cx2 and cy1 <= cy <= cy2:
+                    candidates |= cell
+        else:
+            for cy in range(cy1, cy2 + 1):
+                for cx in range(cx1, cx2 + 1):
+                    cell = self._cells.get((cx, cy))
+                    if cell:
+                        candidates |= cell
+        result = []
+        for box_id in candidates:
+            bx1, by1, bx2, by2 = self._boxes[box_id]
+            if contained:
+                if bx1 >= x1 and by1 >= y1 and bx2 <= x2 and by2 <= y2:
+                    result.append(box_id)
+            elif bx1 <= x2 and bx2 >= x1 and by1 <= y2 and by2 >= y1:
+                result.append(box_id)
+        return result
+
+    def nearest(self, x, y, max_distance=None):
+        """
+        Returns (box_id, distance) of the box closest to (x, y), where the
+        distance is 0 inside a box, or None if nothing is within max_distance.
+        Searches rings of cells outwards from the point's cell.
+        """
+        if not self._boxes:
+            return None
+        cs = self.cell_size
+        px, py = int(math.floor(x / cs)), int(math.floor(y / cs))
+        if max_distance is not None:
+            max_ring = int(math.ceil(max_distance / cs)) + 1
+        elif self._cells:
+            xs = [c[0] for c in self._cells]
+            ys = [c[1] for c in self._cells]
+            max_ring = max(abs(px - min(xs)), abs(px - max(xs)), abs(py - min(ys)), abs(py - max(ys))) + 1
+        else:
+            max_ring = -1  # Only overflow boxes
+
+        best_id, best_dist = None, math.inf
+        for box_id in self._overflow:
+            dist = self._distance(box_id, x, y)
+            if dist < best_dist:
+                best_id, best_dist = box_id, dist
+        seen = set()
+        for ring in range(max_ring + 1):
+            # Every box not yet seen is at least (ring - 1) cells away.
+            if best_id is not None and (ring - 1) * cs > best_dist:
+                break
+            for cx in range(px - ring, px + ring + 1):
+                for cy in (range(py - ring, py + ring + 1) if abs(cx - px) == ring else (py - ring, py + ring)):
+                    for box_id in self._cells.get((cx, cy), ()):
+                        if box_id in seen:
+                            continue
+                        seen.add(box_id)
+                        dist = self._distance(box_id, x, y)
+                        if dist < best_dist:
+                            best_id, best_dist = box_id, dist
+        if best_id is None or (max_distance is not None and best_dist > max_distance):
+            return None
+        return best_id, best_dist
+
+    def _distance(self, box_id, x, y):
+        x1, y1, x2, y2 = self._boxes[box_id]
+        return math.hypot(max(x1 - x, 0.0, x - x2), max(y1 - y, 0.0, y - y2))
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x1, y1, x2, y2) boxes."""
+    iw = min(a[2], b[2]) - max(a[0], b[0])
+    ih = min(a[3], b[3]) - max(a[1], b[1])
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
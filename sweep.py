@@ -0,0 +1,452 @@
+# sweep.py
+"""
+Hyperparameter sweeps over a train_config.yaml:
+
+    python sweep.py --config EXPORT_DIR/train_config.yaml --param lr0=log:0.0001:0.01 \\
+        --param imgsz=480,640 --method asha --trials 16 --cpus 16 --threads-per-trial 4
+
+Every trial is a copy of the config with the swept keys changed, trained by
+train_script.py through a training queue (runs/detect/<sweep>_trial<n>).
+Trials run in parallel within the CPU budget; with ASHA (or --early-stop)
+trials whose validation metric falls behind at a rung epoch are stopped.
+The ranked results are written to sweeps/<sweep>/sweep_results.csv in the
+export directory.
+"""
+import os
+import sys
+import csv
+import math
+import random
+import signal
+import argparse
+import itertools
+
+import yaml
+from PyQt5.QtCore import QObject, QCoreApplication, QTimer, pyqtSignal
+
+from training_queue import TrainingQueue, available_cpus, DONE, CANCELLED
+
+SWEEP_METHODS = ("grid", "random", "asha")
+SWEEPS_DIRNAME = "sweeps"
+RESULTS_FILENAME = "sweep_results.csv"
+DEFAULT_METRIC = "fitness"  # 0.1 * mAP50 + 0.9 * mAP50-95, what ultralytics picks best.pt by
+
+PENDING, RUNNING, STOPPED, FINISHED, FAILED, TRIAL_CANCELLED = (
+    "pending", "running", "stopped", "finished", "failed", "cancelled")
+
+
+class SweepParam:
+    """Values of one train_config.yaml key: a list of choices or a (log-)uniform range."""
+    def __init__(self, name, choices=None, low=None, high=None, log=False, points=None):
+        self.name = name
+        self.choices = choices
+        self.low, self.high = low, high
+        self.log = log
+        self.points = points  # Grid points of a range
+        self.integer = isinstance(low, int) and isinstance(high, int)
+
+    def grid_values(self):
+        if self.choices is not None:
+            return list(self.choices)
+        if not self.points:
+            raise ValueError(f"{self.name}: a range needs a number of points for a grid search "
+                             f"(e.g. {self.name}={'log:' if self.log else ''}{self.low}:{self.high}:4)")
+        if self.points == 1:
+            return [self._value(0.0)]
+        return list(dict.fromkeys(self._value(i / (self.points - 1)) for i in range(self.points)))
+
+    def sample(self, rng):
+        if self.choices is not None:
+            return rng.choice(self.choices)
+        return self._value(rng.random())
+
+    def _value(self, fraction):
+        if self.log:
+            value = math.exp(math.log(self.low) + fraction * (math.log(self.high) - math.log(self.low)))
+        else:
+            value = self.low + fraction * (self.high - self.low)
+        return int(round(value)) if self.integer else float(f"{value:.6g}")
+
+
+def parse_value(text):
+    """A number if text is one (including 1e-3, which YAML reads as a string), else the YAML value."""
+    text = text.strip()
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return yaml.safe_load(text)
+
+
+def parse_param(spec):
+    """
+    Parses NAME=VALUES, where VALUES are comma-separated choices
+    (imgsz=480,640 or model_weights=yolov8n.pt,yolov8s.pt) or a range
+    [log:]LOW:HIGH[:POINTS] (lr0=log:0.0001:0.01). Integer bounds give
+    integer values. Raises ValueError for malformed specs.
+    """
+    name, sep, values = spec.partition("=")
+    name = name.strip()
+    if not sep or not name or not values:
+        raise ValueError(f"Expected NAME=VALUES, got {spec!r}")
+    log = values.startswith("log:")
+    parts = [parse_value(part) for part in (values[4:] if log else values).split(":")]
+    if len(parts) in (2, 3) and all(isinstance(p, (int, float)) and not isinstance(p, bool) for p in parts):
+        low, high = parts[0], parts[1]
+        points = parts[2] if len(parts) == 3 else None
+        if low > high or (points is not None and (not isinstance(points, int) or points < 1)):
+            raise ValueError(f"{name}: expected LOW:HIGH[:POINTS] with LOW <= HIGH, got {values!r}")
+        if log and low <= 0:
+            raise ValueError(f"{name}: a log range must be positive")
+        return SweepParam(name, low=low, high=high, log=log, points=points)
+    if log:
+        raise ValueError(f"{name}: expected log:LOW:HIGH[:POINTS], got {values!r}")
+    return SweepParam(name, choices=[parse_value(choice) for choice in values.split(",")])
+
+
+def generate_trials(params, method, trials=10, seed=0):
+    """Returns the swept values of every trial as dicts: all combinations for "grid", else trials samples."""
+    if method == "grid":
+        names = [p.name for p in params]
+        return [dict(zip(names, values)) for values in itertools.product(*(p.grid_values() for p in params))]
+    rng = random.Random(seed)
+    return [{p.name: p.sample(rng) for p in params} for _ in range(trials)]
+
+
+class AshaStopper:
+    """
+    Asynchronous successive halving as a stopping rule. Rungs are at
+    min_epochs * eta**k epochs. A trial that reaches a rung keeps training
+    only if its metric there is among the best 1/eta of the trials that
+    have reached that rung so far; the first trials at a rung always do.
+    """
+    def __init__(self, max_epochs, min_epochs=5, eta=3, maximize=True):
+        self.eta = eta
+        self.maximize = maximize
+        self.rungs = []
+        rung = max(1, min_epochs)
+        while rung < max_epochs:
+            self.rungs.append(rung)
+            rung *= eta
+        self.recorded = {rung: {} for rung in self.rungs}  # rung -> trial -> metric
+
+    def report(self, trial, curve):
+        """Records a trial's metric curve ({epoch: value}) at the rungs it passed. Returns True to stop it."""
+        for rung in self.rungs:
+            if rung not in curve:
+                continue  # Not reached yet (or not validated at that epoch)
+            recorded = self.recorded[rung]
+            if trial in recorded:
+                continue
+            value = curve[rung]
+            recorded[trial] = value
+            values = sorted(recorded.values(), reverse=self.maximize)
+            cutoff = values[max(1, len(values) // self.eta) - 1]
+            if (value < cutoff) if self.maximize else (value > cutoff):
+                return True
+        return False
+
+
+class SweepTrial:
+    """One configuration of a sweep and how it did."""
+    def __init__(self, number, params, config_path):
+        self.number = number
+        self.params = params          # Swept key -> value
+        self.config_path = config_path
+        self.status = PENDING
+        self.job_id = None
+        self.run_dir = None           # runs/detect/<run name>
+        self.best = None              # Best metric value so far
+        self.best_epoch = None
+        self.epochs = 0               # Epochs completed
+
+
+class Sweep(QObject):
+    """
+    Runs the trials of a sweep in a TrainingQueue, at most max_parallel at
+    a time, each with a budget of threads CPU threads. The metric curve of
+    every trial is read from its progress events; with a stopper, trials
+    it rejects are cancelled. The ranked results are rewritten after every
+    finished trial.
+    """
+    trial_changed = pyqtSignal(int)   # Trial number
+    trial_finished = pyqtSignal(int)  # Trial number; its training process has exited
+    finished = pyqtSignal()
+
+    def __init__(self, sweep_dir, trials, queue, metric=DEFAULT_METRIC, maximize=True, stopper=None,
+                 max_parallel=1, threads=0, pin_cpus=False, extra_args=(), parent=None):
+        super().__init__(parent)
+        self.sweep_dir = sweep_dir
+        self.trials = trials
+        self.queue = queue
+        self.metric = metric
+        self.maximize = maximize
+        self.stopper = stopper
+        self.max_parallel = max(1, max_parallel)
+        self.threads = threads
+        self.pin_cpus = pin_cpus
+        self.extra_args = list(extra_args)
+        self.cancelled = False
+        self._by_job = {}  # Queue job id -> trial
+        self._metric_missing = False
+        queue.job_progress.connect(self._job_progress)
+        queue.job_changed.connect(self._job_changed)
+
+    @property
+    def results_path(self):
+        return os.path.join(self.sweep_dir, RESULTS_FILENAME)
+
+    @property
+    def is_finished(self):
+        return all(trial.status not in (PENDING, RUNNING) for trial in self.trials)
+
+    def start(self):
+        self._submit()
+        self._check_finished()
+
+    def cancel(self):
+        """Cancels pending trials and stops running ones."""
+        self.cancelled = True
+        for trial in self.trials:
+            if trial.status == PENDING:
+                trial.status = TRIAL_CANCELLED
+                self.trial_changed.emit(trial.number)
+            elif trial.status == RUNNING:
+                self.queue.cancel(trial.job_id)
+        self._check_finished()
+
+    def ranked(self):
+        """Trials from best to worst metric; trials without a value last."""
+        scored = [t for t in self.trials if t.best is not None]
+        unscored = [t for t in self.trials if t.best is None]
+        return sorted(scored, key=lambda t: t.best, reverse=self.maximize) + unscored
+
+    def write_results(self):
+        names = list(dict.fromkeys(name for trial in self.trials for name in trial.params))
+        tmp_path = self.results_path + ".tmp"
+        with open(tmp_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["rank", "trial", "status", self.metric, "best_epoch", "epochs"] + names + ["run_dir"])
+            for rank, trial in enumerate(self.ranked(), 1):
+                writer.writerow([rank, trial.number, trial.status,
+                                 "" if trial.best is None else trial.best,
+                                 "" if trial.best_epoch is None else trial.best_epoch, trial.epochs]
+                                + [trial.params.get(name, "") for name in names] + [trial.run_dir or ""])
+        os.replace(tmp_path, self.results_path)
+
+    def _submit(self):
+        running = sum(1 for trial in self.trials if trial.status == RUNNING)
+        for trial in self.trials:
+            if running >= self.max_parallel or self.cancelled:
+                return
+            if trial.status != PENDING:
+                continue
+            try:
+                job = self.queue.add(trial.config_path, threads=self.threads, pin_cpus=self.pin_cpus,
+                                     extra_args=self.extra_args)
+            except OSError as e:
+                print(f"Error queueing trial {trial.number}: {e}")
+                trial.status = FAILED
+                self.trial_changed.emit(trial.number)
+                continue
+            trial.job_id = job.id
+            trial.status = RUNNING
+            self._by_job[job.id] = trial
+            running += 1
+            self.trial_changed.emit(trial.number)
+
+    def _job_progress(self, job_id):
+        trial = self._by_job.get(job_id)
+        if trial is None:
+            return
+        progress = self.queue.jobs[job_id].progress
+        trial.run_dir = progress.save_dir
+        trial.epochs = progress.epoch
+        curve = progress.series.get(self.metric, {})
+        if progress.epoch and not curve and not self._metric_missing:
+            self._metric_missing = True
+            print(f"No {self.metric} in the progress events of trial {trial.number}; "
+                  f"available: {', '.join(sorted(progress.series))}")
+        if curve:
+            pick = max if self.maximize else min
+            trial.best_epoch = pick(curve, key=lambda epoch: (curve[epoch], -epoch) if self.maximize
+                                    else (curve[epoch], epoch))
+            trial.best = curve[trial.best_epoch]
+        if trial.status == RUNNING and self.stopper is not None and self.stopper.report(trial.number, curve):
+            trial.status = STOPPED
+            self.queue.cancel(job_id)
+        self.trial_changed.emit(trial.number)
+
+    def _job_changed(self, job_id):
+        trial = self._by_job.get(job_id)
+        job = self.queue.jobs.get(job_id)
+        if trial is None or job is None or not job.is_finished or job.process is not None:
+            return  # Still running, or not yet released by the queue
+        del self._by_job[job_id]
+        if trial.status == RUNNING:
+            trial.status = {DONE: FINISHED, CANCELLED: TRIAL_CANCELLED}.get(job.status, FAILED)
+        self.trial_changed.emit(trial.number)
+        self.trial_finished.emit(trial.number)
+        self.write_results()
+        self._submit()
+        self._check_finished()
+
+    def _check_finished(self):
+        if self.is_finished and not self._by_job:
+            self.write_results()
+            self.finished.emit()
+
+
+def create_sweep_dir(export_dir, name=None):
+    """Creates sweeps/<name> (default: the next free sweep<n>) in the export directory."""
+    sweeps_dir = os.path.join(export_dir, SWEEPS_DIRNAME)
+    if name is None:
+        number = 1
+        while os.path.exists(os.path.join(sweeps_dir, f"sweep{number}")):
+            number += 1
+        name = f"sweep{number}"
+    sweep_dir = os.path.join(sweeps_dir, name)
+    os.makedirs(sweep_dir)  # Raises FileExistsError for a name that is taken
+    return name, sweep_dir
+
+
+def write_trial_configs(config_path, trial_params, sweep_dir, name):
+    """
+    Writes trial<n>.yaml for every trial: the config with the swept keys
+    changed, run name <sweep>_trial<n>, data paths made absolute and
+    save_best off (trials would overwrite each other's best.pt). Returns
+    the SweepTrials.
+    """
+    with open(config_path, "r") as f:
+        base_config = yaml.safe_load(f)
+    export_dir = os.path.dirname(os.path.abspath(config_path))
+    trials = []
+    for number, params in enumerate(trial_params, 1):
+        config = dict(base_config)
+        config.update(params)
+        config["run_name"] = f"{name}_trial{number}"
+        config["save_best"] = False
+        for key in ("data_yaml", "shards", "warm_start"):
+            if config.get(key):
+                config[key] = os.path.normpath(os.path.join(export_dir, config[key])).replace("\\", "/")
+        trial_path = os.path.join(sweep_dir, f"trial{number}.yaml")
+        with open(trial_path, "w") as f:
+            yaml.dump(config, f, default_flow_style=False)
+        trials.append(SweepTrial(number, params, trial_path))
+    return trials
+
+
+def format_results(sweep):
+    """The ranked trials as a text table."""
+    names = list(dict.fromkeys(name for trial in sweep.trials for name in trial.params))
+    rows = [["#", "trial", "status", sweep.metric, "epoch"] + names]
+    for rank, trial in enumerate(sweep.ranked(), 1):
+        rows.append([str(rank), str(trial.number), trial.status,
+                     "-" if trial.best is None else f"{trial.best:.4f}",
+                     "-" if trial.best_epoch is None else f"{trial.best_epoch}/{trial.epochs}"]
+                    + [str(trial.params.get(name, "")) for name in names])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep train_config.yaml hyperparameters with train_script.py")
+    parser.add_argument("--config", required=True, help="train_config.yaml of an exported dataset")
+    parser.add_argument("--param", action="append", required=True, metavar="NAME=VALUES",
+                        help="Config key to sweep: choices (imgsz=480,640) or a range ([log:]LOW:HIGH[:POINTS], "
+                             "e.g. lr0=log:0.0001:0.01). Repeat for more keys.")
+    parser.add_argument("--method", choices=SWEEP_METHODS, default="random",
+                        help="grid: all combinations, random: --trials samples, asha: random with early stopping")
+    parser.add_argument("--trials", type=int, default=10, help="Trials of a random or ASHA sweep")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random samples")
+    parser.add_argument("--name", default=None, help="Sweep name (default: sweep<n>)")
+
+    metric = parser.add_argument_group("metric and early stopping")
+    metric.add_argument("--metric", default=DEFAULT_METRIC,
+                        help="Per-epoch metric trials are ranked by, e.g. fitness, 'metrics/mAP50(B)'")
+    metric.add_argument("--minimize", action="store_true", help="Lower metric values are better (losses)")
+    metric.add_argument("--early-stop", action="store_true", help="Stop poor trials of a grid or random sweep early, as ASHA does")
+    metric.add_argument("--min-epochs", type=int, default=5, help="First rung: epochs before a trial can be stopped")
+    metric.add_argument("--eta", type=int, default=3, help="Rungs are --min-epochs * eta**k epochs; 1/eta of the trials pass a rung")
+
+    budget = parser.add_argument_group("CPU budget")
+    budget.add_argument("--cpus", type=int, default=len(available_cpus()), help="CPU threads for the whole sweep (default: all)")
+    budget.add_argument("--threads-per-trial", type=int, default=None, help="Thread budget of a trial (default: --cpus / --parallel)")
+    budget.add_argument("--parallel", type=int, default=None, help="Trials at a time (default: --cpus / --threads-per-trial, else 1)")
+    budget.add_argument("--pin", action="store_true", help="Pin every trial to dedicated CPUs")
+    budget.add_argument("--from-shards", action="store_true", help="Train from the export's tar shards")
+
+    args = parser.parse_args(argv)
+    try:
+        args.params = [parse_param(spec) for spec in args.param]
+    except ValueError as e:
+        parser.error(str(e))
+    if args.eta < 2:
+        parser.error("--eta must be at least 2")
+    if args.threads_per_trial:
+        parallel = max(1, args.cpus // args.threads_per_trial)
+        args.parallel = min(args.parallel, parallel) if args.parallel else parallel
+    else:
+        args.parallel = args.parallel or 1
+        args.threads_per_trial = max(1, args.cpus // args.parallel)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        trial_params = generate_trials(args.params, args.method, args.trials, args.seed)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    with open(args.config, "r") as f:
+        max_epochs = max([(yaml.safe_load(f) or {}).get("epochs", 0)] + [p.get("epochs", 0) for p in trial_params])
+    name, sweep_dir = create_sweep_dir(os.path.dirname(os.path.abspath(args.config)), args.name)
+    trials = write_trial_configs(args.config, trial_params, sweep_dir, name)
+    print(f"Sweep {name}: {len(trials)} trials, {args.parallel} at a time with {args.threads_per_trial} threads each "
+          f"({sweep_dir})", flush=True)
+
+    app = QCoreApplication(sys.argv[:1])
+    queue = TrainingQueue(path=os.path.join(sweep_dir, "sweep_queue.json"), max_concurrent=args.parallel)
+    stopper = None
+    if args.method == "asha" or args.early_stop:
+        stopper = AshaStopper(max_epochs, args.min_epochs, args.eta, maximize=not args.minimize)
+        print(f"Early stopping at epochs {stopper.rungs}", flush=True)
+    sweep = Sweep(sweep_dir, trials, queue, metric=args.metric, maximize=not args.minimize, stopper=stopper,
+                  max_parallel=args.parallel, threads=args.threads_per_trial, pin_cpus=args.pin,
+                  extra_args=["--from-shards"] if args.from_shards else [])
+
+    def trial_finished(number):
+        trial = sweep.trials[number - 1]
+        value = "-" if trial.best is None else f"{trial.best:.4f}"
+        print(f"Trial {number} {trial.status} after {trial.epochs} epochs: {args.metric} {value} {trial.params}", flush=True)
+
+    # Ctrl-C cancels the sweep; a second Ctrl-C aborts.
+    def interrupt(signum, frame):
+        print("Cancelling the sweep, press Ctrl-C again to abort...", file=sys.stderr, flush=True)
+        sweep.cancel()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    sweep.trial_finished.connect(trial_finished)
+    sweep.finished.connect(app.quit)
+    previous_handler = signal.signal(signal.SIGINT, interrupt)
+    signal_timer = QTimer()
+    signal_timer.timeout.connect(lambda: None)  # Lets Python handle Ctrl-C while Qt waits for events
+    signal_timer.start(200)
+    QTimer.singleShot(0, sweep.start)
+    try:
+        app.exec_()
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        queue.shutdown()
+
+    print(format_results(sweep))
+    print(f"Results written to {sweep.results_path}")
+    if sweep.cancelled:
+        return 130
+    return 0 if any(trial.status in (FINISHED, STOPPED) for trial in trials) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+# thumbnail_cache.py
+import os
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtWidgets import QListView, QAbstractItemView
+from PyQt5.QtGui import QImage, QImageReader, QPixmap, QColor
+from PyQt5.QtCore import (
+    Qt, QSize, QPoint, QObject, QRunnable, QThreadPool, QStandardPaths,
+    QAbstractListModel, QModelIndex, pyqtSignal
+)
+
+THUMBNAIL_SIZE = 128
+THUMBNAIL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+PRUNE_TARGET = 0.9  # Pruning deletes thumbnails until the cache is below this fraction of max_bytes
+
+
+def default_thumbnail_dir():
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "AnalyticModelGenerator", "thumbnails")
+
+
+class ThumbnailCache:
+    """
+    Content-addressed on-disk thumbnail store. The key is a hash of the
+    image path, mtime, file size and thumbnail size, so an edited image gets
+    a new thumbnail and stale entries are simply never looked up again.
+
+    The store is kept below max_bytes by deleting the least recently used
+    thumbnails; a hit updates the file's mtime to mark it as used.
+    """
+    def __init__(self, cache_dir=None, size=THUMBNAIL_SIZE, max_bytes=THUMBNAIL_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir or default_thumbnail_dir()
+        self.size = size
+        self.max_bytes = max_bytes
+        self.total_bytes = None  # Measured by prune(), then kept up to date by load()
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def cache_path(self, image_path):
+        st = os.stat(image_path)
+        key = f"{os.path.abspath(image_path)}|{st.st_mtime_ns}|{st.st_size}|{self.size}"
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + ".jpg")
+
+    def load(self, image_path):
+        """Returns the thumbnail QImage, generating and storing it on a cache miss."""
+        try:
+            thumb_path = self.cache_path(image_path)
+        except OSError:
+            return QImage()
+        if os.path.exists(thumb_path):
+            image = QImage(thumb_path)
+            if not image.isNull():
+                try:
+                    os.utime(thumb_path)
+                except OSError:
+                    pass
+                return image
+
+        image = self.generate(image_path)
+        if not image.isNull():
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            tmp_path = thumb_path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+            if image.save(tmp_path, "JPG", 85):
+                try:
+                    size = os.path.getsize(tmp_path)
+                    os.replace(tmp_path, thumb_path)
+                except OSError:
+                    return image
+                self._added(size)
+        return image
+
+    def _added(self, size):
+        with self._lock:
+            if self.total_bytes is None:
+                return  # Not measured yet; the pending prune() will count it
+            self.total_bytes += size
+            over = self.total_bytes > self.max_bytes
+        if over:
+            self.prune()
+
+    def prune(self):
+        """
+        Measures the store and, if it exceeds max_bytes, deletes the least
+        recently used thumbnails until it is below PRUNE_TARGET * max_bytes.
+        Does nothing if another thread is already pruning.
+        """
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            entries = []
+            total = 0
+            try:
+                with os.scandir(self.cache_dir) as subdirs:
+                    for subdir in subdirs:
+                        if not subdir.is_dir():
+                            continue
+                        with os.scandir(subdir.path) as files:
+                            for entry in files:
+                                if entry.name.endswith(".jpg"):
+                                    st = entry.stat()
+                                    entries.append((st.st_mtime, st.st_size, entry.path))
+                                    total += st.st_size
+            except OSError:
+                pass
+            if total > self.max_bytes:
+                entries.sort()
+                target = self.max_bytes * PRUNE_TARGET
+                for _, size, path in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                        total -= size
+                    except OSError:
+                        pass
+            with self._lock:
+                self.total_bytes = total
+        finally:
+            self._prune_lock.release()
+
+    def generate(self, image_path):
+        """Decodes a downscaled image. For JPEGs the reader decodes directly at reduced size."""
+        reader = QImageReader(image_path)
+        reader.setAutoTransform(True)
+        full = reader.size()
+        if full.isValid():
+            reader.setScaledSize(full.scaled(self.size, self.size, Qt.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            return image
+        if image.width() > self.size or image.height() > self.size:
+            image = image.scaled(self.size, self.size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        return image
+
+
+class _ThumbnailSignals(QObject):
+    loaded = pyqtSignal(str, QImage)
+
+
+class _ThumbnailTask(QRunnable):
+    def __init__(self, model, path):
+        super().__init__()
+        self.cache = model.cache
+        self.path = path
+        self.signals = model.signals
+        self.lock = model._lock
+        self.started = False
+        self.cancelled = False
+
+    def run(self):
+        with self.lock:
+            if self.cancelled:
+                return
+            self.started = True
+        self.signals.loaded.emit(self.path, self.cache.load(self.path))
+
+
+class _PruneTask(QRunnable):
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+
+    def run(self):
+        self.cache.prune()
+
+
+class ThumbnailModel(QAbstractListModel):
+    """
+    List model over image paths whose decorations are loaded lazily: data() is
+    only called for visible rows, and a miss queues a worker task and returns
+    a placeholder until the thumbnail arrives. Requests still queued for
+    rows that scrolled out of view are dropped by drop_requests_outside().
+    """
+    def __init__(self, cache, max_pixmaps=1000, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.paths = []
+        self._rows = {}
+        self._pixmaps = OrderedDict()  # path -> QPixmap, in-memory LRU
+        self._max_pixmaps = max_pixmaps
+        self._requested = {}  # path -> queued or running _ThumbnailTask
+        self._lock = threading.Lock()
+        self._priority = itertools.count()
+
+        self.placeholder = QPixmap(cache.size, cache.size)
+        self.placeholder.fill(QColor(60, 60, 60))
+
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(1, QThreadPool.globalInstance().maxThreadCount() - 1))
+        self.signals = _ThumbnailSignals()
+        self.signals.loaded.connect(self._on_loaded)
+        self.pool.start(_PruneTask(cache), -1)  # Behind any thumbnail request
+
+    def set_paths(self, paths):
+        """
+        Shows paths. If they are the current paths with some added and some
+        removed (e.g. files created in or deleted from the open folder), only
+        the changed rows are inserted and removed, keeping the view's scroll
+        position, selection and loaded thumbnails.
+        """
+        paths = list(paths)
+        old = set(self.paths)
+        new = set(paths)
+        if [p for p in self.paths if p in new] != [p for p in paths if p in old] or not old & new:
+            self._reset(paths)
+            return
+
+        # Runs of consecutive removed rows, applied from the end so earlier rows keep their numbers
+        removed_runs = self._runs([i for i, p in enumerate(self.paths) if p not in new])
+        for first, last in reversed(removed_runs):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for path in self.paths[first:last + 1]:
+                self._pixmaps.pop(path, None)
+            del self.paths[first:last + 1]
+            self.endRemoveRows()
+        # Runs of added rows in the new order, applied from the start
+        for first, last in self._runs([i for i, p in enumerate(paths) if p not in old]):
+            self.beginInsertRows(QModelIndex(), first, last)
+            self.paths[first:first] = paths[first:last + 1]
+            self.endInsertRows()
+        self._rows = {p: i for i, p in enumerate(self.paths)}
+
+    def _reset(self, paths):
+        self.beginResetModel()
+        self._cancel_requests(list(self._requested))
+        self.paths = paths
+        self._rows = {p: i for i, p in enumerate(self.paths)}
+        self.endResetModel()
+
+    @staticmethod
+    def _runs(rows):
+        """Groups ascending row numbers into (first, last) runs of consecutive rows."""
+        runs = []
+        for row in rows:
+            if runs and runs[-1][1] == row - 1:
+                runs[-1][1] = row
+            else:
+                runs.append([row, row])
+        return runs
+
+    def drop_requests_outside(self, first, last):
+        """Drops the queued thumbnail requests for rows outside first..last."""
+        self._cancel_requests([
+            path for path in self._requested
+            if not first <= self._rows.get(path, -1) <= last
+        ])
+
+    def _cancel_requests(self, paths):
+        with self._lock:
+            for path in paths:
+                task = self._requested[path]
+                if not task.started:
+                    task.cancelled = True
+                    del self._requested[path]
+                    self.pool.tryTake(task)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self.paths[index.row()]
+        if role == Qt.DecorationRole:
+            pixmap = self._pixmaps.get(path)
+            if pixmap is not None:
+                self._pixmaps.move_to_end(path)
+                return pixmap
+            if path not in self._requested:
+                task = _ThumbnailTask(self, path)
+                self._requested[path] = task
+                # Newest requests first: rows that just scrolled into view win.
+                self.pool.start(task, next(self._priority))
+            return self.placeholder
+        if role in (Qt.ToolTipRole, Qt.DisplayRole):
+            return os.path.basename(path)
+        return None
+
+    def _on_loaded(self, path, image):
+        self._requested.pop(path, None)
+        row = self._rows.get(path)
+        if row is None or image.isNull():
+            return
+        self._pixmaps[path] = QPixmap.fromImage(image)
+        while len(self._pixmaps) > self._max_pixmaps:
+            self._pixmaps.popitem(last=False)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class ThumbnailStrip(QListView):
+    """Horizontal, virtualized filmstrip of image thumbnails."""
+    image_activated = pyqtSignal(int)
+
+    def __init__(self, cache=None, parent=None):
+        super().__init__(parent)
+        self.thumbnail_model = ThumbnailModel(cache or ThumbnailCache(), parent=self)
+        self.setModel(self.thumbnail_model)
+
+        size = self.thumbnail_model.cache.size
+        self.setViewMode(QListView.IconMode)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(False)
+        self.setMovement(QListView.Static)
+        self.setIconSize(QSize(size, size))
+        self.setGridSize(QSize(size + 8, size + 8))
+        # Uniform sizes + batched layout keep 100k rows cheap to lay out.
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(500)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setFixedHeight(size + 8 + self.horizontalScrollBar().sizeHint().height() + 4)
+
+        self.clicked.connect(lambda index: self.image_activated.emit(index.row()))
+        self.horizontalScrollBar().valueChanged.connect(self._drop_offscreen_requests)
+
+    def _drop_offscreen_requests(self):
+        """Keeps only the thumbnail requests for the visible rows and one screen on each side."""
+        grid = self.gridSize()
+        y = grid.height() // 2
+        first = self.indexAt(QPoint(grid.width() // 2, y))
+        last = self.indexAt(QPoint(self.viewport().width() - grid.width() // 2, y))
+        if not first.isValid():
+            return
+        last_row = last.row() if last.isValid() else first.row()
+        visible = last_row - first.row() + 1
+        self.thumbnail_model.drop_requests_outside(first.row() - visible, last_row + visible)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._drop_offscreen_requests()
+
+    def set_paths(self, paths):
+        self.thumbnail_model.set_paths(paths)
+
+    def set_current_row(self, row):
+        if 0 <= row < self.thumbnail_model.rowCount():
+            index = self.thumbnail_model.index(row)
+            self.setCurrentIndex(index)
+            self.scrollTo(index, QAbstractItemView.PositionAtCenter)
@@ -0,0 +1,318 @@
+# tiled_image_item.py
+import math
+import itertools
+
+from PyQt5.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+from PyQt5.QtGui import QImage, QImageReader, QImageIOHandler, QPixmap, QPixmapCache, QPainter
+from PyQt5.QtCore import Qt, QRect, QRectF, QSize, QObject, QRunnable, QThreadPool, pyqtSignal
+
+# Images with more pixels than this are drawn with TiledImageItem instead of a
+# single QGraphicsPixmapItem.
+TILED_RENDERING_MIN_PIXELS = 4096 * 4096
+
+_item_ids = itertools.count()
+
+
+def can_read_regions(image_path):
+    """True if a region of the file can be decoded without decoding the whole image (e.g. JPEG)."""
+    return QImageReader(image_path).supportsOption(QImageIOHandler.ClipRect)
+
+
+class _LevelLoader(QObject):
+    """Receives the results of the worker tasks in the GUI thread and hands them to the item."""
+    levels_ready = pyqtSignal(object)        # {level: QImage}
+    source_ready = pyqtSignal(object)        # Level 0 QImage
+    tiles_ready = pyqtSignal(object)         # {(tx, ty): QImage} of level 0
+
+    def __init__(self, item):
+        super().__init__()
+        self.item = item
+        self.levels_ready.connect(self._levels_ready)
+        self.source_ready.connect(self._source_ready)
+        self.tiles_ready.connect(self._tiles_ready)
+
+    def _levels_ready(self, levels):
+        if self.item is not None:
+            self.item._set_levels(levels)
+
+    def _source_ready(self, image):
+        if self.item is not None:
+            self.item._set_source(image)
+
+    def _tiles_ready(self, tiles):
+        if self.item is not None:
+            self.item._set_tiles(tiles)
+
+
+class _BuildLevelsTask(QRunnable):
+    """
+    Builds pyramid levels 1..max_level, each by halving the previous one.
+    Without an image the file is read here: when it can be read in regions
+    only downscaled decodes are made, otherwise the whole image is decoded
+    and handed to the item as level 0.
+    """
+    def __init__(self, path, image, sizes, streamed, loader):
+        super().__init__()
+        self.path = path
+        self.image = image
+        self.sizes = sizes  # Size of every level
+        self.streamed = streamed
+        self.loader = loader
+
+    def _read(self, size=None):
+        reader = QImageReader(self.path)
+        if size is not None:
+            reader.setScaledSize(size)
+        image = reader.read()
+        if image.isNull():
+            print(f"Error reading {self.path}: {reader.errorString()}")
+        return image
+
+    def run(self):
+        max_level = len(self.sizes) - 1
+        image, self.image = self.image, None
+        first = 1
+        if image is None and self.streamed:
+            # Quick look first; e.g. JPEG decodes straight to a fraction of its size
+            preview = self._read(self.sizes[max_level])
+            if preview.isNull():
+                return
+            self.loader.levels_ready.emit({max_level: preview})
+            if max_level == 1:
+                return
+            image = self._read(self.sizes[1])
+            first = 2
+            levels = {1: image}
+        else:
+            if image is None:
+                image = self._read()
+                if image.isNull():
+                    return
+                self.loader.source_ready.emit(image)
+            levels = {}
+        for level in range(first, max_level + 1):
+            size = self.sizes[level]
+            image = image.scaled(size.width(), size.height(), Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            levels[level] = image
+        self.loader.levels_ready.emit(levels)
+
+
+class _LoadTilesTask(QRunnable):
+    """Decodes the region of the file covering some level 0 tiles and splits it into tiles."""
+    def __init__(self, path, tiles, tile_size, width, height, loader):
+        super().__init__()
+        self.path = path
+        self.tiles = tiles
+        self.tile_size = tile_size
+        self.width = width
+        self.height = height
+        self.loader = loader
+
+    def run(self):
+        ts = self.tile_size
+        first_tx = min(tx for tx, _ in self.tiles)
+        first_ty = min(ty for _, ty in self.tiles)
+        region = QRect(first_tx * ts, first_ty * ts,
+                       (max(tx for tx, _ in self.tiles) - first_tx + 1) * ts,
+                       (max(ty for _, ty in self.tiles) - first_ty + 1) * ts
+                       ).intersected(QRect(0, 0, self.width, self.height))
+        reader = QImageReader(self.path)
+        reader.setClipRect(region)
+        image = reader.read()
+        tiles = {}
+        if not image.isNull():
+            for tx, ty in self.tiles:
+                tiles[(tx, ty)] = image.copy(tx * ts - region.x(), ty * ts - region.y(),
+                                             min(ts, self.width - tx * ts), min(ts, self.height - ty * ts))
+        self.loader.tiles_ready.emit(tiles)
+
+
+class TiledImageItem(QGraphicsItem):
+    """
+    Draws a large image as a pyramid of downsampled levels split into tiles.
+
+    Level 0 is the source image and each following level halves its size. At
+    paint time the level matching the view's zoom is chosen and only the tiles
+    intersecting the exposed rect are converted to QPixmaps (cached in
+    QPixmapCache), so repaint cost depends on the viewport size rather than
+    on the size of the source image.
+
+    The levels are built on pool, each from the previous one, and drawn once
+    they are ready. When the file can be decoded in regions (JPEG) the full
+    image is never held: the levels come from downscaled decodes and the
+    level 0 tiles in view are decoded from the file in the background while
+    the next level is drawn in their place. Other formats are decoded whole
+    (unless image is given) and level 0 is kept while the item lives.
+    """
+    def __init__(self, image_path, size, tile_size=512, parent=None, pool=None, image=None):
+        super().__init__(parent)
+        self.image_path = image_path
+        self.tile_size = tile_size
+        self._width = size.width()
+        self._height = size.height()
+        self._key_prefix = f"tiled{next(_item_ids)}"
+        self._pool = pool or QThreadPool.globalInstance()
+        self._loader = _LevelLoader(self)
+        self._streamed = can_read_regions(image_path)
+        self._levels = {}
+        self._loading_tiles = False
+        self._tiles_failed = False  # The file could not be read in regions after all
+
+        # Smallest level is the first one that fits in a single tile.
+        longest_side = max(self._width, self._height, 1)
+        self.max_level = max(0, math.ceil(math.log2(longest_side / tile_size)))
+        sizes = [QSize(self._level_width(level), self._level_height(level)) for level in range(self.max_level + 1)]
+
+        if image is not None and not self._streamed:
+            self._levels[0] = image
+        if self.max_level == 0:
+            self._streamed = False
+            if image is None:
+                image = QImage(image_path)
+            self._levels[0] = image
+        else:
+            if image is not None:
+                # Preview until the smooth levels are built; sampling only touches the preview's pixels.
+                self._levels[self.max_level] = image.scaled(sizes[-1], Qt.IgnoreAspectRatio, Qt.FastTransformation)
+            self._pool.start(_BuildLevelsTask(image_path, image, sizes, self._streamed, self._loader),
+                             1)  # Ahead of prefetches
+
+        # Needed so option.exposedRect is filled in paint().
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def boundingRect(self):
+        return QRectF(0, 0, self._width, self._height)
+
+    def level_for_zoom(self, lod):
+        """Returns the coarsest pyramid level that still has >= 1 source pixel per screen pixel."""
+        if lod <= 0 or lod >= 1:
+            return 0
+        return min(self.max_level, int(math.floor(math.log2(1.0 / lod))))
+
+    def _level_width(self, level):
+        return max(1, self._width // 2 ** level)
+
+    def _level_height(self, level):
+        return max(1, self._height // 2 ** level)
+
+    def _available_level(self, level):
+        """The built level closest to level that is not finer than it, else the finest one built, or None."""
+        coarser = [l for l in self._levels if l >= level]
+        if coarser:
+            return min(coarser)
+        return min(self._levels) if self._levels else None
+
+    def _set_levels(self, levels):
+        if self.max_level in levels:
+            self._remove_tiles(self.max_level)  # Tiles of the preview
+        self._levels.update(levels)
+        self.update()
+
+    def _set_source(self, image):
+        self._levels[0] = image
+        if self.max_level not in self._levels:
+            self._levels[self.max_level] = image.scaled(
+                self._level_width(self.max_level), self._level_height(self.max_level),
+                Qt.IgnoreAspectRatio, Qt.FastTransformation)
+        self.update()
+
+    def _set_tiles(self, tiles):
+        self._loading_tiles = False
+        if not tiles:
+            self._tiles_failed = True  # Keep drawing the next level instead of retrying on every paint
+        for (tx, ty), image in tiles.items():
+            QPixmapCache.insert(self._tile_key(0, tx, ty), QPixmap.fromImage(image))
+        self.update()  # Draws them, and requests the tiles still missing if the view moved
+
+    def _tile_key(self, level, tx, ty):
+        return f"{self._key_prefix}:{level}:{tx}:{ty}"
+
+    def _tile_pixmap(self, level, tx, ty):
+        key = self._tile_key(level, tx, ty)
+        pixmap = QPixmapCache.find(key)
+        if pixmap is None or pixmap.isNull():
+            image = self._levels[level]
+            ts = self.tile_size
+            pixmap = QPixmap.fromImage(image.copy(tx * ts, ty * ts, ts, ts))
+            QPixmapCache.insert(key, pixmap)
+        return pixmap
+
+    def _tile_range(self, exposed, level):
+        """(first_tx, first_ty, last_tx, last_ty) of the tiles of level intersecting exposed."""
+        extent = self.tile_size * 2 ** level  # Size of one tile in item (full-resolution) coordinates
+        return (max(0, int(exposed.left() // extent)),
+                max(0, int(exposed.top() // extent)),
+                min(int(math.ceil(self._level_width(level) / self.tile_size)) - 1, int(exposed.right() // extent)),
+                min(int(math.ceil(self._level_height(level) / self.tile_size)) - 1, int(exposed.bottom() // extent)))
+
+    def _draw_tile(self, painter, level, tx, ty, pixmap):
+        # Map the tile back to full-resolution coordinates; the last row/column
+        # of a level may be clipped so use the pixmap's real size.
+        scale = 2 ** level
+        extent = self.tile_size * scale
+        target = QRectF(tx * extent, ty * extent, pixmap.width() * scale, pixmap.height() * scale)
+        painter.drawPixmap(target, pixmap, QRectF(pixmap.rect()))
+
+    def _draw_level(self, painter, exposed, level):
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, level > 0)
+        first_tx, first_ty, last_tx, last_ty = self._tile_range(exposed, level)
+        for ty in range(first_ty, last_ty + 1):
+            for tx in range(first_tx, last_tx + 1):
+                self._draw_tile(painter, level, tx, ty, self._tile_pixmap(level, tx, ty))
+
+    def _draw_streamed_level0(self, painter, exposed):
+        """Draws the decoded level 0 tiles in view over the next level and requests the missing ones."""
+        first_tx, first_ty, last_tx, last_ty = self._tile_range(exposed, 0)
+        present, missing = [], []
+        for ty in range(first_ty, last_ty + 1):
+            for tx in range(first_tx, last_tx + 1):
+                pixmap = QPixmapCache.find(self._tile_key(0, tx, ty))
+                if pixmap is None or pixmap.isNull():
+                    missing.append((tx, ty))
+                else:
+                    present.append((tx, ty, pixmap))
+        if missing:
+            fallback = self._available_level(1)
+            if fallback is not None:
+                self._draw_level(painter, exposed, fallback)
+            if not self._loading_tiles and not self._tiles_failed:
+                self._loading_tiles = True
+                self._pool.start(_LoadTilesTask(self.image_path, missing, self.tile_size,
+                                                self._width, self._height, self._loader), 2)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, False)
+        for tx, ty, pixmap in present:
+            self._draw_tile(painter, 0, tx, ty, pixmap)
+
+    def paint(self, painter, option, widget=None):
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        wanted = self.level_for_zoom(lod)
+        if wanted == 0 and self._streamed:
+            self._draw_streamed_level0(painter, exposed)
+            return
+        level = self._available_level(wanted)
+        if level is not None:
+            self._draw_level(painter, exposed, level)
+
+    def _remove_tiles(self, level):
+        cols = int(math.ceil(self._level_width(level) / self.tile_size))
+        rows = int(math.ceil(self._level_height(level) / self.tile_size))
+        for ty in range(rows):
+            for tx in range(cols):
+                # Keys are only removed if present; missing ones are ignored by Qt.
+                QPixmapCache.remove(self._tile_key(level, tx, ty))
+
+    def release(self):
+        """Frees the pyramid levels and tiles (called when the image is replaced)."""
+        for level in range(self.max_level + 1):
+            self._remove_tiles(level)
+        self._loader.item = None  # Results of tasks still running are dropped
+        self._levels = {}
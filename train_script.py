@@ -1,10 +1,19 @@
 import os
+import re
+import time
+import pickle
 import shutil
+import zipfile
+import tempfile
 import torch
 import yaml
 from ultralytics import YOLO
 import argparse
 
+# Keys of train_config.yaml read by this script; other keys are passed to model.train (e.g. from a sweep)
+CONFIG_KEYS = ("model_weights", "data_yaml", "epochs", "imgsz", "batch_size", "lr0", "run_name", "save_best", "shards",
+               "warm_start")
+
 def get_incremented_run_name(base_name):
     """
     Generates an incremented run name (e.g., runs, runs2, runs3, etc.)
@@ -17,10 +26,198 @@ def get_incremented_run_name(base_name):
         counter += 1
     return run_name
 
-def main(config_path):
+class _Placeholder:
+    """Stands in for every object of a checkpoint other than plain Python containers and values."""
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        pass
+
+
+class _CheckpointUnpickler(pickle.Unpickler):
+    """Unpickles a torch checkpoint's data.pkl without reading tensor data or importing the model's classes."""
+    def find_class(self, module, name):
+        if module in ("builtins", "collections"):
+            return super().find_class(module, name)
+        return _Placeholder
+
+    def persistent_load(self, pid):
+        return None  # Tensor storages stay in the archive
+
+
+def read_checkpoint_header(checkpoint_path):
+    """
+    The top-level dict of a checkpoint with models, tensors and the optimizer
+    state replaced by placeholders, so reading e.g. its epoch does not load
+    the whole checkpoint. Checkpoints in torch's legacy (non-zip) format are
+    loaded in full.
+    """
+    if not zipfile.is_zipfile(checkpoint_path):
+        return torch.load(checkpoint_path, map_location="cpu", weights_only=False)
+    with zipfile.ZipFile(checkpoint_path) as archive:
+        name = next(n for n in archive.namelist() if n.endswith("data.pkl"))
+        with archive.open(name) as f:
+            return _CheckpointUnpickler(f).load()
+
+def checkpoint_finished(checkpoint_path):
+    """True if the run of a last.pt trained to the end (ultralytics then strips the optimizer and sets epoch -1)."""
+    checkpoint = read_checkpoint_header(checkpoint_path)
+    return checkpoint.get("epoch", -1) < 0 or checkpoint.get("optimizer") is None
+
+def find_last_checkpoint(base_name):
+    """
+    Returns the most recently written last.pt of an unfinished run named
+    base_name, or numbered from it by get_incremented_run_name, or None.
+    """
+    runs_dir = os.path.join("runs", "detect")
+    if not os.path.isdir(runs_dir):
+        return None
+    run_name_pattern = re.compile(re.escape(base_name) + r"\d*")
+    candidates = []
+    for name in os.listdir(runs_dir):
+        checkpoint_path = os.path.join(runs_dir, name, "weights", "last.pt")
+        if run_name_pattern.fullmatch(name) and os.path.exists(checkpoint_path):
+            candidates.append(checkpoint_path)
+    for checkpoint_path in sorted(candidates, key=os.path.getmtime, reverse=True):
+        if not checkpoint_finished(checkpoint_path):
+            return checkpoint_path
+    return None
+
+def resolve_checkpoint(path):
+    """last.pt given as the file, a run directory or its weights directory."""
+    for candidate in (path, os.path.join(path, "weights", "last.pt"), os.path.join(path, "last.pt")):
+        if os.path.isfile(candidate):
+            return candidate
+    raise FileNotFoundError(f"No last.pt at {path}")
+
+def unpack_shards(config, config_path, scratch_dir):
+    """
+    Streams the tar shards listed in the config to a local scratch directory
+    and returns the data.yaml written there, so training reads from local
+    disk instead of opening every file on the export directory.
+    """
+    from dataset_shards import ShardReader  # Lives next to this script
+
+    index_path = os.path.join(os.path.dirname(config_path), config["shards"])
+    reader = ShardReader(index_path)
+    print(f"Unpacking {len(reader)} samples from {index_path} to {scratch_dir}", flush=True)
+
+    def progress(done, total):
+        if done % 1000 == 0 or done == total:
+            print(f"  unpacked {done}/{total}", flush=True)
+
+    return reader.unpack(scratch_dir, progress=progress)
+
+def limit_cpus(threads=None, cpus=None):
+    """Applies the CPU budget of a queued job: pins the process to cpus and caps torch's thread pools."""
+    if cpus:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+            print(f"Pinned to CPUs {sorted(cpus)}", flush=True)
+        else:
+            print("CPU pinning is not supported on this platform", flush=True)
+    if threads:
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(threads)
+        print(f"Limited to {threads} threads", flush=True)
+
+def memory_mb():
+    """GPU memory reserved by torch, or the peak resident memory of this process on CPU."""
+    if torch.cuda.is_available():
+        return torch.cuda.memory_reserved() / (1024 * 1024)
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+    except ImportError:
+        return None
+
+def attach_event_callbacks(model, events):
+    """
+    Registers ultralytics callbacks that write train_start, batch, epoch and
+    train_end events (losses, validation metrics, images/s, memory) to an
+    EventWriter.
+    """
+    from training_events import BATCH_EVENT_INTERVAL  # Lives next to this script
+
+    state = {"last_batch_event": 0.0, "epoch_start": None, "batch": 0, "epoch_ended": False}
+
+    def scalar(value):
+        return float(value.item() if hasattr(value, "item") else value)
+
+    def losses(trainer):
+        if trainer.tloss is None:
+            return {}
+        return {k: scalar(v) for k, v in trainer.label_loss_items(trainer.tloss, prefix="train").items()}
+
+    def on_train_start(trainer):
+        events.emit("train_start", epochs=trainer.epochs, start_epoch=trainer.start_epoch,
+                    batches=len(trainer.train_loader), batch_size=trainer.batch_size,
+                    imgsz=trainer.args.imgsz, save_dir=str(trainer.save_dir))
+
+    def on_train_epoch_start(trainer):
+        state["epoch_start"] = time.time()
+        state["batch"] = 0  # The batch index is not exposed to callbacks
+        state["epoch_ended"] = False
+
+    def on_train_batch_end(trainer):
+        state["batch"] += 1
+        now = time.time()
+        if now - state["last_batch_event"] < BATCH_EVENT_INTERVAL:
+            return
+        state["last_batch_event"] = now
+        elapsed = now - state["epoch_start"]
+        events.emit("batch", epoch=trainer.epoch + 1, batch=state["batch"], batches=len(trainer.train_loader),
+                    losses=losses(trainer), batch_time=elapsed / state["batch"],
+                    images_per_s=state["batch"] * trainer.batch_size / elapsed if elapsed > 0 else None,
+                    memory_mb=memory_mb())
+
+    def on_train_epoch_end(trainer):
+        state["epoch_ended"] = True
+
+    def on_fit_epoch_end(trainer):
+        if not state["epoch_ended"]:
+            return  # Final validation of best.pt after training, not an epoch
+        state["epoch_ended"] = False
+        epoch_time = time.time() - state["epoch_start"]
+        images = len(trainer.train_loader) * trainer.batch_size
+        events.emit("epoch", epoch=trainer.epoch + 1, epochs=trainer.epochs, losses=losses(trainer),
+                    metrics={k: scalar(v) for k, v in (trainer.metrics or {}).items()},
+                    fitness=scalar(trainer.fitness) if trainer.fitness is not None else None,
+                    lr={k: scalar(v) for k, v in getattr(trainer, "lr", {}).items()},
+                    epoch_time=epoch_time, images_per_s=images / epoch_time if epoch_time > 0 else None,
+                    memory_mb=memory_mb())
+
+    def on_train_end(trainer):
+        events.emit("train_end", save_dir=str(trainer.save_dir), best=str(trainer.best))
+
+    for name, callback in (("on_train_start", on_train_start), ("on_train_epoch_start", on_train_epoch_start),
+                           ("on_train_batch_end", on_train_batch_end), ("on_train_epoch_end", on_train_epoch_end),
+                           ("on_fit_epoch_end", on_fit_epoch_end), ("on_train_end", on_train_end)):
+        model.add_callback(name, callback)
+
+def main(config_path, from_shards=False, scratch_dir=None, threads=None, cpus=None, events_path=None,
+         resume=None, warm_start=None):
+    """
+    Trains with the settings of config_path. resume=True continues the
+    latest unfinished run of the config's run name (resume may also be a
+    last.pt or run directory), keeping its run directory and optimizer
+    state. warm_start (default: the config's warm_start, relative to the
+    config) starts a new run from earlier weights, e.g. a previous best.pt.
+    """
     print("train_script.py: Starting up...", flush=True)
+    events = None
+    if events_path:
+        from training_events import EventWriter  # Lives next to this script
+        events = EventWriter(events_path)
+    temp_scratch_dir = None  # Removed again after training
 
     try:
+        limit_cpus(threads, cpus)
+
         # --- GPU/CPU CHECK ---
         device = "cuda" if torch.cuda.is_available() else "cpu"
         print(f"Using device: {device}", flush=True)
@@ -33,18 +230,50 @@ def main(config_path):
         with open(config_path, "r") as f:
             config = yaml.safe_load(f)
 
-        # --- Step 2: Adjust run_name if it already exists ---
+        # --- Step 2: Resume an interrupted run, or adjust run_name if it already exists ---
         base_run_name = config["run_name"]
-        config["run_name"] = get_incremented_run_name(base_run_name)
-        print(f"Adjusted run_name to: {config['run_name']}", flush=True)
+        resume_path = None
+        if resume:
+            resume_path = find_last_checkpoint(base_run_name) if resume is True else resolve_checkpoint(resume)
+            if resume_path is None:
+                print(f"No unfinished run of {base_run_name} to resume; starting a new run.", flush=True)
+            elif checkpoint_finished(resume_path):
+                raise ValueError(f"The run of {resume_path} has finished; nothing to resume")
+        if resume_path:
+            # runs/detect/<run name>/weights/last.pt
+            config["run_name"] = os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(resume_path))))
+            print(f"Resuming run {config['run_name']} from: {resume_path}", flush=True)
+        else:
+            config["run_name"] = get_incremented_run_name(base_run_name)
+            print(f"Adjusted run_name to: {config['run_name']}", flush=True)
 
         # --- Step 3: Load the YOLOv8 model ---
         model_weights = config["model_weights"]
+        warm_start = warm_start or config.get("warm_start")
+        if resume_path:
+            model_weights = resume_path
+        elif warm_start:
+            warm_start_path = os.path.join(os.path.dirname(config_path), warm_start)
+            if os.path.exists(warm_start_path):
+                model_weights = warm_start_path
+                print(f"Warm start: fine-tuning from {warm_start_path}", flush=True)
+            else:
+                print(f"Warm start weights {warm_start_path} not found; training from {model_weights}.", flush=True)
         print(f"Loading model weights from: {model_weights}", flush=True)
         model = YOLO(model_weights)
+        if events is not None:
+            attach_event_callbacks(model, events)
 
         # --- Step 4: Validate data.yaml path ---
         data_yaml_path = os.path.join(os.path.dirname(config_path), config["data_yaml"])
+        if from_shards:
+            if config.get("shards"):
+                if scratch_dir is None:
+                    # A resumed run falls back to the new data.yaml once this one is gone
+                    scratch_dir = temp_scratch_dir = tempfile.mkdtemp(prefix="yolo_shards_")
+                data_yaml_path = unpack_shards(config, config_path, scratch_dir)
+            else:
+                print("No shards in the config (export with 'Pack into tar shards'); using the export directory.", flush=True)
         print(f"Looking for data.yaml at: {data_yaml_path}", flush=True)
         if not os.path.exists(data_yaml_path):
             raise FileNotFoundError(f"data.yaml not found at {data_yaml_path}")
@@ -56,8 +285,17 @@ def main(config_path):
         print(f"  batch    = {config['batch_size']}", flush=True)
         print(f"  lr0      = {config['lr0']}", flush=True)
         print(f"  run_name = {config['run_name']}", flush=True)
+        train_args = {k: v for k, v in config.items() if k not in CONFIG_KEYS}
+        for key, value in train_args.items():
+            print(f"  {key} = {value}", flush=True)
         print("", flush=True)
 
+        if threads:
+            train_args["workers"] = threads  # Data loader processes stay within the budget too
+        if resume_path:
+            # Continues with the checkpoint's settings and optimizer state; of the
+            # overrides only imgsz and batch (e.g. smaller after running out of memory) apply.
+            train_args["resume"] = True
         model.train(
             data=data_yaml_path,
             epochs=config["epochs"],
@@ -65,7 +303,8 @@ def main(config_path):
             batch=config["batch_size"],
             lr0=config["lr0"],
             name=config["run_name"],
-            device=device
+            device=device,
+            **train_args
         )
 
         # --- Step 6: Optionally copy best.pt after training ---
@@ -85,11 +324,30 @@ def main(config_path):
     except Exception as e:
         # Print errors so they appear in your PyQt console
         print(f"train_script.py: ERROR: {e}", flush=True)
+        if events is not None:
+            events.emit("error", message=str(e))
         raise
+    finally:
+        if temp_scratch_dir is not None:
+            shutil.rmtree(temp_scratch_dir, ignore_errors=True)
+        if events is not None:
+            events.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="YOLOv8 Training Script")
     parser.add_argument("--config", type=str, required=True, help="Path to train_config.yaml")
+    parser.add_argument("--from-shards", action="store_true", help="Unpack the dataset's tar shards to local scratch space and train from there")
+    parser.add_argument("--scratch-dir", type=str, default=None, help="Where to unpack the shards (default: a temporary directory removed after training)")
+    parser.add_argument("--threads", type=int, default=None, help="CPU thread budget of this run")
+    parser.add_argument("--cpus", type=str, default=None, help="Comma-separated CPUs to pin this run to")
+    parser.add_argument("--events", type=str, default=None, help="Append JSON-lines progress events (epochs, batches, losses, metrics) to this file")
+    parser.add_argument("--resume", nargs="?", const=True, default=None, metavar="LAST_PT",
+                        help="Continue the latest unfinished run of the config's run name, or the run of LAST_PT (last.pt or its run directory)")
+    parser.add_argument("--warm-start", type=str, default=None, metavar="WEIGHTS",
+                        help="Start a new run from these weights (e.g. a previous best.pt) instead of model_weights")
     args = parser.parse_args()
 
-    main(args.config)
+    cpus = [int(c) for c in args.cpus.split(",")] if args.cpus else None
+    main(args.config, from_shards=args.from_shards, scratch_dir=args.scratch_dir, threads=args.threads, cpus=cpus,
+         events_path=args.events, resume=args.resume,
+         warm_start=os.path.abspath(args.warm_start) if args.warm_start else None)
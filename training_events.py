@@ -0,0 +1,160 @@
+# training_events.py
+import os
+import json
+import time
+
+EVENTS_VERSION = 1
+BATCH_EVENT_INTERVAL = 1.0  # Seconds between batch events; every batch would flood the stream
+
+
+class EventWriter:
+    """
+    Appends training events to a JSON-lines file, one object per line with
+    at least "event" and "time". The file is flushed after every event so a
+    reader can follow it while training runs.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a")
+        self.emit("stream_start", version=EVENTS_VERSION, pid=os.getpid())
+
+    def emit(self, event, **fields):
+        record = {"event": event, "time": time.time()}
+        record.update(fields)
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class EventReader:
+    """Returns the events appended to a JSON-lines file since the last read(), keeping incomplete lines for later."""
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self._partial = b""
+
+    def read(self):
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return []
+        self.offset += len(data)
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()  # Empty unless the writer is mid-line
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+        return events
+
+
+class TrainingProgress:
+    """
+    Folds training events into per-epoch metric series and the current
+    batch position, from which the ETA is estimated.
+    """
+    def __init__(self):
+        self.epochs = None        # Planned epochs
+        self.batches = None       # Batches per epoch
+        self.epoch = 0            # Last completed epoch
+        self.batch = None         # (epoch, batch) of the last batch event
+        self.images_per_s = None
+        self.memory_mb = None
+        self.save_dir = None      # runs/detect/<run name> of the run
+        self.series = {}          # metric name -> {epoch: value}
+        self.epoch_times = {}     # epoch -> seconds
+        self.batch_time = None    # Seconds per batch in the current epoch
+        self.state = "waiting"    # waiting, training, finished, failed
+        self.message = None
+
+    def update(self, events):
+        for event in events:
+            kind = event.get("event")
+            if kind == "train_start":
+                self.epochs = event.get("epochs")
+                self.batches = event.get("batches")
+                self.save_dir = event.get("save_dir")
+                self.state = "training"
+            elif kind == "batch":
+                self.batch = (event["epoch"], event["batch"])
+                self.batches = event.get("batches", self.batches)
+                self.images_per_s = event.get("images_per_s")
+                self.memory_mb = event.get("memory_mb")
+                self.batch_time = event.get("batch_time")
+            elif kind == "epoch":
+                epoch = event["epoch"]
+                self.epoch = max(self.epoch, epoch)
+                self.epochs = event.get("epochs", self.epochs)
+                for name, value in event.get("losses", {}).items():
+                    self.series.setdefault(name, {})[epoch] = value
+                for name, value in event.get("metrics", {}).items():
+                    self.series.setdefault(name, {})[epoch] = value
+                if event.get("fitness") is not None:
+                    self.series.setdefault("fitness", {})[epoch] = event["fitness"]  # What best.pt is chosen by
+                if event.get("epoch_time") is not None:
+                    self.epoch_times[epoch] = event["epoch_time"]
+                self.images_per_s = event.get("images_per_s", self.images_per_s)
+                self.memory_mb = event.get("memory_mb", self.memory_mb)
+            elif kind == "train_end":
+                self.state = "finished"
+            elif kind == "error":
+                self.state = "failed"
+                self.message = event.get("message")
+
+    def curve(self, name):
+        """Returns ([epochs], [values]) of a metric."""
+        points = sorted(self.series.get(name, {}).items())
+        return [e for e, _ in points], [v for _, v in points]
+
+    def eta(self):
+        """Estimated seconds until training ends, or None before the first estimate."""
+        if self.state != "training" or not self.epochs:
+            return None
+        # Mean of the recent epochs follows changes in speed (e.g. after warmup).
+        recent = [self.epoch_times[e] for e in sorted(self.epoch_times)[-5:]]
+        epoch_time = sum(recent) / len(recent) if recent else None
+        if epoch_time is None and self.batch_time and self.batches:
+            epoch_time = self.batch_time * self.batches
+        if epoch_time is None:
+            return None
+        remaining = (self.epochs - self.epoch) * epoch_time
+        if self.batch is not None and self.batch[0] > self.epoch and self.batches:
+            # Part of the current epoch is already done.
+            remaining -= epoch_time * min(1.0, self.batch[1] / self.batches)
+        return max(0.0, remaining)
+
+    def status_text(self):
+        parts = []
+        if self.state == "waiting":
+            return "Waiting for training to start"
+        if self.epochs:
+            parts.append(f"Epoch {self.epoch}/{self.epochs}")
+        if self.state == "training" and self.batch is not None and self.batches and self.batch[0] > self.epoch:
+            parts.append(f"batch {self.batch[1]}/{self.batches}")
+        if self.images_per_s:
+            parts.append(f"{self.images_per_s:.1f} images/s")
+        if self.memory_mb:
+            parts.append(f"{self.memory_mb / 1024:.1f} GB")
+        eta = self.eta()
+        if eta is not None:
+            hours, rest = divmod(int(eta), 3600)
+            parts.append(f"ETA {hours}:{rest // 60:02d}:{rest % 60:02d}")
+        if self.state == "finished":
+            parts.append("finished")
+        elif self.state == "failed":
+            parts.append(f"failed: {self.message}")
+        return ", ".join(parts)
+
+
+def load_progress(path):
+    """Reads a whole event file into a TrainingProgress (e.g. to compare finished runs)."""
+    progress = TrainingProgress()
+    progress.update(EventReader(path).read())
+    return progress
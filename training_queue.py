@@ -0,0 +1,439 @@
+# training_queue.py
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import codecs
+
+import yaml
+from PyQt5.QtCore import QObject, QProcess, QProcessEnvironment, QTimer, pyqtSignal
+
+from training_events import EventReader, TrainingProgress
+from job_log import JobLog
+
+QUEUE_PATH = "training_queue.json"
+QUEUE_VERSION = 1
+
+QUEUED, HELD, RUNNING, PAUSED, DONE, FAILED, CANCELLED = (
+    "queued", "held", "running", "paused", "done", "failed", "cancelled")
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+KILL_TIMEOUT_MS = 10000  # After terminate(), kill a job that has not exited by then
+EVENTS_POLL_MS = 500     # How often the event files of running jobs are read
+
+# Thread pools of the numeric libraries honour these; set for jobs with a thread budget.
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+def available_cpus():
+    """CPUs this process may run on (all of them where affinity is not supported)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def can_pause():
+    return hasattr(signal, "SIGSTOP")
+
+
+# Runs the job's command in a new session, so the training process and its
+# data loader workers form a process group that can be paused as a whole.
+_NEW_SESSION = "import os, sys; os.setsid(); os.execv(sys.executable, [sys.executable] + sys.argv[1:])"
+
+
+class TrainingJob:
+    """One queued training run: a snapshot of a train_config.yaml plus scheduling settings."""
+    FIELDS = ("id", "name", "config_path", "events_path", "log_path", "priority", "threads", "pin_cpus", "extra_args",
+              "status", "exit_code", "created", "started", "finished")
+
+    def __init__(self, id, name, config_path, priority=0, threads=0, pin_cpus=False, extra_args=()):
+        self.id = id
+        self.name = name
+        self.config_path = config_path
+        # Progress events of train_script.py, kept after the job is removed for comparing runs
+        self.events_path = os.path.join(os.path.dirname(config_path), f"train_events.job{id}.jsonl")
+        self.log_path = os.path.join(os.path.dirname(config_path), f"train_log.job{id}.log")  # Full console output
+        self.priority = priority      # Higher runs first; ties run in queue order
+        self.threads = threads        # CPU thread budget, 0 for no limit
+        self.pin_cpus = pin_cpus      # Pin to `threads` CPUs not used by other pinned jobs
+        self.extra_args = list(extra_args)
+        self.status = QUEUED
+        self.exit_code = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        # Not persisted
+        self.process = None
+        self.pgid = None  # Process group of the running job, see _NEW_SESSION
+        self.cpus = []
+        self.decoder = None
+        self.progress = TrainingProgress()
+        self._events = None
+        self._log = None
+
+    @property
+    def log(self):
+        """The job's console output (JobLog)."""
+        if self._log is None:
+            self._log = JobLog(self.log_path)
+        return self._log
+
+    def read_events(self):
+        """Folds newly written events into self.progress. Returns True if there were any."""
+        if self._events is None:
+            self._events = EventReader(self.events_path)
+        events = self._events.read()
+        self.progress.update(events)
+        return bool(events)
+
+    def resume_checkpoint(self):
+        """last.pt of the run an earlier attempt of this job left unfinished, or None."""
+        self.read_events()
+        if self.progress.save_dir is None or self.progress.state == "finished":
+            return None
+        checkpoint_path = os.path.join(self.progress.save_dir, "weights", "last.pt")
+        return checkpoint_path if os.path.exists(checkpoint_path) else None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data["id"], data["name"], data["config_path"])
+        for name in cls.FIELDS:
+            if name in data:
+                setattr(job, name, data[name])
+        return job
+
+    @property
+    def is_finished(self):
+        return self.status in FINISHED_STATES
+
+
+class TrainingQueue(QObject):
+    """
+    Persistent queue of training jobs run by a pool of QProcess workers.
+
+    At most max_concurrent jobs run at a time; free slots go to the queued
+    job with the highest priority. A job's thread budget caps the thread
+    pools of the training process; with pin_cpus it is also pinned to that
+    many CPUs that no other pinned job uses, and waits until enough are free
+    while lower-priority jobs that fit are started.
+    Running jobs can be paused (SIGSTOP, POSIX only) and cancelled; queued
+    jobs can be held back. The queue is saved to training_queue.json, and
+    jobs that were running when the application quit are queued again.
+    """
+    job_added = pyqtSignal(int)
+    job_changed = pyqtSignal(int)          # Status or settings of a job changed
+    job_removed = pyqtSignal(int)
+    job_output = pyqtSignal(int)           # New console output in job.log
+    job_progress = pyqtSignal(int)         # New progress events were read into job.progress
+
+    def __init__(self, path=QUEUE_PATH, max_concurrent=1, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.max_concurrent = max_concurrent
+        self.jobs = {}      # id -> TrainingJob, in queue order
+        self.next_id = 1
+        self.script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "train_script.py")
+        self.events_timer = QTimer(self)
+        self.events_timer.setInterval(EVENTS_POLL_MS)
+        self.events_timer.timeout.connect(self._poll_events)
+        self.load()
+
+    # ---------------- PERSISTENCE -----------------
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != QUEUE_VERSION:
+            return
+        self.next_id = data.get("next_id", 1)
+        self.max_concurrent = data.get("max_concurrent", self.max_concurrent)
+        for item in data.get("jobs", []):
+            job = TrainingJob.from_dict(item)
+            if job.status in (RUNNING, PAUSED):
+                job.status = QUEUED  # Interrupted by the application exiting
+            self.jobs[job.id] = job
+        self.next_id = max([self.next_id] + [job_id + 1 for job_id in self.jobs])
+
+    def save(self):
+        data = {
+            "version": QUEUE_VERSION,
+            "next_id": self.next_id,
+            "max_concurrent": self.max_concurrent,
+            "jobs": [job.to_dict() for job in self.jobs.values()],
+        }
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving the training queue: {e}")
+
+    # ---------------- QUEUE -----------------
+
+    def add(self, config_path, priority=0, threads=0, pin_cpus=False, extra_args=()):
+        """
+        Queues a training run. The config is copied next to the original
+        (train_config.job<id>.yaml), so exporting again with other settings
+        does not change jobs that are already queued. Returns the job.
+
+        Ids only grow, and ids whose files already exist next to the config
+        (left by jobs of a lost or other queue file) are skipped, so the
+        events and logs of earlier jobs are never overwritten.
+        """
+        export_dir = os.path.dirname(config_path)
+        job_id = self.next_id
+        while any(os.path.exists(os.path.join(export_dir, name.format(job_id)))
+                  for name in ("train_config.job{}.yaml", "train_events.job{}.jsonl", "train_log.job{}.log")):
+            job_id += 1
+        self.next_id = job_id + 1
+        snapshot_path = os.path.join(os.path.dirname(config_path), f"train_config.job{job_id}.yaml")
+        shutil.copy2(config_path, snapshot_path)
+        with open(snapshot_path, "r") as f:
+            run_name = (yaml.safe_load(f) or {}).get("run_name", "")
+        name = f"{run_name} ({os.path.basename(os.path.dirname(os.path.abspath(config_path)))})"
+        job = TrainingJob(job_id, name, snapshot_path, priority, threads, pin_cpus, extra_args)
+        self.jobs[job_id] = job
+        self.save()
+        self.job_added.emit(job_id)
+        self.schedule()
+        return job
+
+    def set_max_concurrent(self, value):
+        self.max_concurrent = max(1, value)
+        self.save()
+        self.schedule()
+
+    def set_priority(self, job_id, priority):
+        job = self.jobs[job_id]
+        job.priority = priority
+        self.save()
+        self.job_changed.emit(job_id)
+        self.schedule()
+
+    def hold(self, job_id):
+        """Keeps a queued job from starting."""
+        job = self.jobs[job_id]
+        if job.status == QUEUED:
+            self._set_status(job, HELD)
+
+    def release(self, job_id):
+        job = self.jobs[job_id]
+        if job.status == HELD:
+            self._set_status(job, QUEUED)
+            self.schedule()
+
+    def pause(self, job_id):
+        """Stops a running job's process until resume(); its slot stays taken."""
+        job = self.jobs[job_id]
+        if job.status == RUNNING and can_pause():
+            self._signal(job, signal.SIGSTOP)
+            self._set_status(job, PAUSED)
+
+    def resume(self, job_id):
+        job = self.jobs[job_id]
+        if job.status == PAUSED:
+            self._signal(job, signal.SIGCONT)
+            self._set_status(job, RUNNING)
+
+    def cancel(self, job_id):
+        job = self.jobs[job_id]
+        if job.status in (QUEUED, HELD):
+            job.finished = time.time()
+            self._set_status(job, CANCELLED)
+        elif job.status in (RUNNING, PAUSED):
+            job.status = CANCELLED  # Reported as such when the process exits
+            if can_pause():
+                self._signal(job, signal.SIGCONT)  # A stopped process cannot exit
+            self._terminate(job)
+            kill_timer = QTimer(job.process)  # Deleted with the process if it exits in time
+            kill_timer.setSingleShot(True)
+            kill_timer.timeout.connect(lambda: self._kill(job))
+            kill_timer.start(KILL_TIMEOUT_MS)
+            self.job_changed.emit(job_id)
+
+    def retry(self, job_id):
+        """Queues a failed or cancelled job again; it resumes its run from the last checkpoint."""
+        job = self.jobs[job_id]
+        if job.status in (FAILED, CANCELLED):
+            job.exit_code = None
+            self._set_status(job, QUEUED)
+            self.schedule()
+
+    def remove_finished(self):
+        for job_id in [j.id for j in self.jobs.values() if j.is_finished]:
+            job = self.jobs.pop(job_id)
+            if os.path.basename(job.config_path).startswith("train_config.job") and os.path.exists(job.config_path):
+                os.remove(job.config_path)
+            self.job_removed.emit(job_id)
+        self.save()
+
+    def running_jobs(self):
+        return [j for j in self.jobs.values() if j.status in (RUNNING, PAUSED) or j.process is not None]
+
+    def shutdown(self):
+        """Kills running jobs; they are queued again the next time the queue is loaded."""
+        for job in self.running_jobs():
+            if job.process is not None:
+                job.process.finished.disconnect()
+                if can_pause():
+                    self._signal(job, signal.SIGCONT)
+                self._kill(job)
+                job.process.waitForFinished(3000)
+                job.pgid = None
+            job.log.close()
+        self.save()
+
+    def _signal_group(self, job, sig):
+        """
+        Sends sig to the job's process group (its data loader workers
+        included). Returns False if there is no such group, e.g. before the
+        new session is set up or where sessions are not supported.
+        """
+        if job.pgid is None:
+            return False
+        try:
+            os.killpg(job.pgid, sig)
+            return True
+        except OSError:
+            return False
+
+    def _signal(self, job, sig):
+        if not self._signal_group(job, sig):
+            os.kill(int(job.process.processId()), sig)
+
+    def _terminate(self, job):
+        if not self._signal_group(job, signal.SIGTERM):
+            job.process.terminate()
+
+    def _kill(self, job):
+        if job.process is None:
+            return
+        if job.pgid is None or not self._signal_group(job, signal.SIGKILL):
+            job.process.kill()
+
+    def _set_status(self, job, status):
+        job.status = status
+        self.save()
+        self.job_changed.emit(job.id)
+
+    # ---------------- SCHEDULING -----------------
+
+    def _free_cpus(self):
+        used = {cpu for job in self.running_jobs() for cpu in job.cpus}
+        return [cpu for cpu in available_cpus() if cpu not in used]
+
+    def schedule(self):
+        """Starts queued jobs while slots (and, for pinned jobs, CPUs) are free."""
+        order = {job_id: i for i, job_id in enumerate(self.jobs)}
+        queued = sorted((j for j in self.jobs.values() if j.status == QUEUED),
+                        key=lambda j: (-j.priority, order[j.id]))
+        for job in queued:
+            if len(self.running_jobs()) >= self.max_concurrent:
+                return
+            cpus = []
+            if job.pin_cpus and job.threads:
+                needed = min(job.threads, len(available_cpus()))
+                free = self._free_cpus()
+                if len(free) < needed:
+                    continue  # Waits for pinned jobs to finish; jobs that fit start meanwhile
+                cpus = free[:needed]
+            self._start(job, cpus)
+
+    def _start(self, job, cpus):
+        process = QProcess(self)
+        process.setProcessChannelMode(QProcess.MergedChannels)
+        env = QProcessEnvironment.systemEnvironment()
+        env.insert("PYTHONUNBUFFERED", "1")
+        if job.threads:
+            for name in THREAD_ENV_VARS:
+                env.insert(name, str(job.threads))
+        process.setProcessEnvironment(env)
+        process.readyReadStandardOutput.connect(lambda: self._read_output(job))
+        process.finished.connect(lambda exit_code, exit_status: self._finished(job, exit_code, exit_status))
+        process.errorOccurred.connect(lambda error: self._error(job, error))
+
+        arguments = ["-u", self.script_path, "--config", job.config_path, "--events", job.events_path] + job.extra_args
+        if job.threads:
+            arguments += ["--threads", str(job.threads)]
+        if cpus:
+            arguments += ["--cpus", ",".join(str(c) for c in cpus)]
+        # Interrupted or retried: continue the same run
+        resume_path = job.resume_checkpoint() if job.started is not None else None
+        if resume_path:
+            arguments += ["--resume", resume_path]
+        if hasattr(os, "setsid"):
+            arguments = ["-c", _NEW_SESSION] + arguments
+        job.process = process
+        job.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")  # Characters split across reads
+        job.cpus = cpus
+        job.exit_code = None
+        job.started = time.time()
+        job.finished = None
+        self._message(job, f"{'Resuming' if resume_path else 'Starting'} job {job.id}: {job.config_path}"
+                           f"{f' on CPUs {job.cpus}' if cpus else ''}")
+        self._set_status(job, RUNNING)
+        process.start(sys.executable, arguments)
+        if hasattr(os, "setsid") and process.processId():
+            job.pgid = int(process.processId())  # The bootstrap makes the process lead a group of its pid
+        self.events_timer.start()
+
+    def _append(self, job, text):
+        job.log.append(text)
+        self.job_output.emit(job.id)
+
+    def _message(self, job, text):
+        """Adds a line of the queue's own to the job's output, after any unterminated line of the job."""
+        self._append(job, ("\n" if job.log.current else "") + text + "\n")
+
+    def _read_output(self, job):
+        if job.process is not None:
+            self._append(job, job.decoder.decode(job.process.readAllStandardOutput().data()))
+
+    def _finished(self, job, exit_code, exit_status):
+        self._read_output(job)
+        if job.status != CANCELLED:
+            job.status = DONE if exit_status == QProcess.NormalExit and exit_code == 0 else FAILED
+        job.exit_code = exit_code
+        job.finished = time.time()
+        self._message(job, f"Job {job.id} {job.status} (exit code {exit_code})")
+        self._release(job)
+
+    def _error(self, job, error):
+        if error != QProcess.FailedToStart:
+            return  # Crashes are reported through finished
+        self._message(job, f"Job {job.id} failed to start: {job.process.errorString()}")
+        if job.status != CANCELLED:
+            job.status = FAILED
+        job.finished = time.time()
+        self._release(job)
+
+    def _poll_events(self):
+        running = [job for job in self.jobs.values() if job.process is not None]
+        for job in running:
+            if job.read_events():
+                self.job_progress.emit(job.id)
+        if not running:
+            self.events_timer.stop()
+
+    def _release(self, job):
+        if job.read_events():
+            self.job_progress.emit(job.id)
+        job.log.close()
+        # Workers that outlived the training process (e.g. ignoring SIGTERM) end with the job
+        if job.pgid is not None:
+            self._signal_group(job, signal.SIGKILL)
+            job.pgid = None
+        process, job.process, job.cpus = job.process, None, []
+        process.deleteLater()
+        self.save()
+        self.job_changed.emit(job.id)
+        self.schedule()
@@ -1,21 +1,30 @@
 # training_tab.py
 import os
-import sys
-import random
-import shutil
-import yaml
-from PyQt5.QtWidgets import (QWidget, QPushButton, QVBoxLayout, QLabel, QFormLayout,
+from PyQt5.QtWidgets import (QWidget, QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QFormLayout,
                              QSpinBox, QDoubleSpinBox, QLineEdit, QCheckBox, QTextEdit,
-                             QFileDialog, QComboBox, QMessageBox)
-from PyQt5.QtCore import QProcess
+                             QFileDialog, QComboBox, QMessageBox, QApplication, QProgressBar,
+                             QTableWidget, QTableWidgetItem, QAbstractItemView)
+from PyQt5.QtCore import Qt
+
+from annotation_store import AnnotationStore
+from dataset_export import DatasetExporter, MATERIALIZE_MODES
+from export_worker import ExportThread
+from export_pipeline import write_train_config, TRAIN_CONFIG_FILENAME
+from near_duplicates import PerceptualHashCache, DEFAULT_MAX_DISTANCE, MAX_DISTANCE
+from dataset_stats import validate_dataset, write_report, format_report, REPORT_FILENAME
+from image_probe import ImageSizeIndex
+from training_queue import TrainingQueue, available_cpus, can_pause, QUEUED, HELD, RUNNING, PAUSED, FAILED, CANCELLED
+from metric_chart import MetricChart
+from log_view import LogView
 
 class TrainingTab(QWidget):
     def __init__(self):
         super().__init__()
 
         # --- UI Elements ---
-        self.training_console = QTextEdit(self)
-        self.training_console.setReadOnly(True)
+        self.export_console = QTextEdit(self)  # Export and validation messages
+        self.export_console.setReadOnly(True)
+        self.export_console.setMaximumHeight(120)
 
         # Export Dataset Group
         self.export_dataset_group_layout = QFormLayout()
@@ -28,10 +37,59 @@ class TrainingTab(QWidget):
         self.test_percent_label = QLabel("Test %:", self)
         self.test_percent_spinbox = QSpinBox(self)
         self.test_percent_spinbox.setRange(0, 100); self.test_percent_spinbox.setValue(10)
+        self.split_seed_label = QLabel("Split Seed:", self)
+        self.split_seed_spinbox = QSpinBox(self)
+        self.split_seed_spinbox.setRange(0, 2**31 - 1); self.split_seed_spinbox.setValue(0)
+        self.split_seed_spinbox.setToolTip("Images keep their split across exports while the seed and percentages "
+                                           "stay the same. Changing either re-splits the whole dataset.")
+        self.dedup_checkbox = QCheckBox("Keep near-duplicates in one split", self)
+        self.dedup_checkbox.setChecked(True)
+        self.dedup_checkbox.setToolTip("Group near-identical images (e.g. consecutive video frames) by perceptual "
+                                       "hash so they never end up in both train and valid/test.")
+        self.dedup_distance_spinbox = QSpinBox(self)
+        self.dedup_distance_spinbox.setRange(0, MAX_DISTANCE); self.dedup_distance_spinbox.setValue(DEFAULT_MAX_DISTANCE)
+        self.dedup_distance_spinbox.setSuffix(" bits max. difference")
         self.export_dir_label = QLabel("Export Directory:", self)
         self.export_dir_edit = QLineEdit(self)
         self.export_dir_browse_button = QPushButton("Browse...", self)
         self.export_dir_browse_button.clicked.connect(self.browse_export_dir)
+        self.export_mode_label = QLabel("Image Files:", self)
+        self.export_mode_combo = QComboBox(self)
+        self.export_mode_combo.addItems(MATERIALIZE_MODES)  # copy, hardlink, reflink, symlink
+        self.export_mode_combo.setToolTip("How exported images refer to the originals. "
+                                          "Hardlinks/reflinks fall back to copies where unsupported.")
+        self.export_workers_label = QLabel("Export Threads:", self)
+        self.export_workers_spinbox = QSpinBox(self)
+        self.export_workers_spinbox.setRange(1, 128); self.export_workers_spinbox.setValue(min(32, (os.cpu_count() or 1) * 4))
+        self.incremental_export_checkbox = QCheckBox("Incremental (only changed files)", self)
+        self.incremental_export_checkbox.setChecked(True)
+        self.incremental_export_checkbox.setToolTip("Compare against export_manifest.json from the last export and "
+                                                    "only add, update or remove what changed.")
+        self.verify_export_checkbox = QCheckBox("Verify content hashes", self)
+        self.verify_export_checkbox.setToolTip("Re-hash all source images (and exported copies) instead of "
+                                               "trusting file size and modification time.")
+        self.pack_shards_checkbox = QCheckBox("Pack into tar shards", self)
+        self.pack_shards_checkbox.setToolTip("Also pack each split into large tar files. Training then streams the "
+                                             "shards to a local scratch directory instead of opening every image "
+                                             "on the (network) export directory.")
+        self.shard_size_spinbox = QSpinBox(self)
+        self.shard_size_spinbox.setRange(16, 4096); self.shard_size_spinbox.setValue(256)
+        self.shard_size_spinbox.setSuffix(" MB per shard")
+        self.preresize_checkbox = QCheckBox("Pre-resize to training Image Size", self)
+        self.preresize_checkbox.setToolTip("Also write letterboxed copies at the Image Size below (imgsz<size>/ in "
+                                           "the export directory) and train on them, so training does not decode "
+                                           "full-resolution images every epoch.")
+        self.export_progress_bar = QProgressBar(self)
+        self.export_progress_bar.setValue(0)
+        self.cancel_export_button = QPushButton("Cancel Export", self)
+        self.cancel_export_button.setToolTip("Stop the export. Exporting again resumes where it stopped.")
+        self.cancel_export_button.clicked.connect(self.cancel_export)
+        self.cancel_export_button.setEnabled(False)
+        self.validate_dataset_button = QPushButton("Validate Dataset", self)
+        self.validate_dataset_button.setToolTip(f"Class histogram, box sizes and label problems of the loaded images. "
+                                                f"Also written to {REPORT_FILENAME} in the export directory.")
+        self.validate_dataset_button.clicked.connect(self.validate_dataset)
+        self.validate_dataset_button.setEnabled(False)
         self.export_dataset_button = QPushButton("Export Dataset", self)
         self.export_dataset_button.clicked.connect(self.export_dataset)
         self.export_dataset_button.setEnabled(False) # Start Disabled
@@ -39,9 +97,17 @@ class TrainingTab(QWidget):
         self.export_dataset_group_layout.addRow(self.train_percent_label, self.train_percent_spinbox)
         self.export_dataset_group_layout.addRow(self.valid_percent_label, self.valid_percent_spinbox)
         self.export_dataset_group_layout.addRow(self.test_percent_label, self.test_percent_spinbox)
+        self.export_dataset_group_layout.addRow(self.split_seed_label, self.split_seed_spinbox)
+        self.export_dataset_group_layout.addRow(self.dedup_checkbox, self.dedup_distance_spinbox)
         self.export_dataset_group_layout.addRow(self.export_dir_label, self.export_dir_edit)
         self.export_dataset_group_layout.addRow(self.export_dir_browse_button)
-        self.export_dataset_group_layout.addRow(self.export_dataset_button)
+        self.export_dataset_group_layout.addRow(self.export_mode_label, self.export_mode_combo)
+        self.export_dataset_group_layout.addRow(self.export_workers_label, self.export_workers_spinbox)
+        self.export_dataset_group_layout.addRow(self.incremental_export_checkbox, self.verify_export_checkbox)
+        self.export_dataset_group_layout.addRow(self.pack_shards_checkbox, self.shard_size_spinbox)
+        self.export_dataset_group_layout.addRow(self.preresize_checkbox)
+        self.export_dataset_group_layout.addRow(self.validate_dataset_button, self.export_dataset_button)
+        self.export_dataset_group_layout.addRow(self.export_progress_bar, self.cancel_export_button)
 
 
         # Training Configuration Group
@@ -68,6 +134,10 @@ class TrainingTab(QWidget):
         self.run_name_edit.setText("train_run1")
         self.save_best_checkbox = QCheckBox("Save Best Model", self)
         self.save_best_checkbox.setChecked(True)
+        self.warm_start_checkbox = QCheckBox("Warm Start from Last best.pt", self)
+        self.warm_start_checkbox.setToolTip("Fine-tune from the best.pt that Save Best Model copied to the export "
+                                            "directory instead of the model weights, e.g. after adding images. "
+                                            "Fewer epochs are usually enough.")
 
         self.training_config_group_layout.addRow(self.model_weights_label, self.model_weights_combo)
         self.training_config_group_layout.addRow(self.epochs_label, self.epochs_spinbox)
@@ -76,24 +146,102 @@ class TrainingTab(QWidget):
         self.training_config_group_layout.addRow(self.lr0_label, self.lr0_doublespinbox)
         self.training_config_group_layout.addRow(self.run_name_label, self.run_name_edit)
         self.training_config_group_layout.addRow(self.save_best_checkbox, QLabel("")) # Empty label for alignment
-
-
-        self.start_training_button = QPushButton("Start Training", self)
+        self.training_config_group_layout.addRow(self.warm_start_checkbox, QLabel(""))
+
+
+        # Training Queue Group
+        self.training_queue = TrainingQueue(parent=self)
+        self.queue_group_layout = QFormLayout()
+        self.queue_group_layout.addRow(QLabel("<b>Training Queue</b>"), QLabel(""))
+        self.max_jobs_label = QLabel("Parallel Jobs:", self)
+        self.max_jobs_spinbox = QSpinBox(self)
+        self.max_jobs_spinbox.setRange(1, 64); self.max_jobs_spinbox.setValue(self.training_queue.max_concurrent)
+        self.max_jobs_spinbox.valueChanged.connect(self.training_queue.set_max_concurrent)
+        self.job_priority_label = QLabel("Priority:", self)
+        self.job_priority_spinbox = QSpinBox(self)
+        self.job_priority_spinbox.setRange(-100, 100); self.job_priority_spinbox.setValue(0)
+        self.job_priority_spinbox.setToolTip("Queued jobs with a higher priority start first.")
+        self.job_threads_label = QLabel("CPU Threads:", self)
+        self.job_threads_spinbox = QSpinBox(self)
+        self.job_threads_spinbox.setRange(0, len(available_cpus())); self.job_threads_spinbox.setValue(0)
+        self.job_threads_spinbox.setSpecialValueText("No limit")
+        self.job_threads_spinbox.setToolTip("Thread budget of the run (torch, OpenMP/BLAS and data loader workers).")
+        self.pin_cpus_checkbox = QCheckBox("Pin to dedicated CPUs", self)
+        self.pin_cpus_checkbox.setToolTip("Run on as many CPUs as threads, not shared with other pinned jobs. "
+                                          "The job waits until enough CPUs are free.")
+        self.queue_group_layout.addRow(self.max_jobs_label, self.max_jobs_spinbox)
+        self.queue_group_layout.addRow(self.job_priority_label, self.job_priority_spinbox)
+        self.queue_group_layout.addRow(self.job_threads_label, self.job_threads_spinbox)
+        self.queue_group_layout.addRow(self.pin_cpus_checkbox, QLabel(""))
+
+        self.start_training_button = QPushButton("Queue Training", self)
         self.start_training_button.clicked.connect(self.start_training)
         self.start_training_button.setEnabled(False) # Initially disabled
 
+        self.jobs_table = QTableWidget(0, 6, self)
+        self.jobs_table.setHorizontalHeaderLabels(["ID", "Run", "Status", "Priority", "CPU Budget", "Exit Code"])
+        self.jobs_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.jobs_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.jobs_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.jobs_table.verticalHeader().setVisible(False)
+        self.jobs_table.horizontalHeader().setStretchLastSection(True)
+        self.jobs_table.itemSelectionChanged.connect(self.job_selected)
+        self.pause_job_button = QPushButton("Pause", self)
+        self.pause_job_button.clicked.connect(self.toggle_pause_job)
+        self.cancel_job_button = QPushButton("Cancel Job", self)
+        self.cancel_job_button.clicked.connect(self.cancel_job)
+        self.retry_job_button = QPushButton("Retry", self)
+        self.retry_job_button.setToolTip("Queue a failed or cancelled job again. It resumes its run from the last "
+                                         "checkpoint (last.pt) where there is one.")
+        self.retry_job_button.clicked.connect(self.retry_job)
+        self.set_priority_button = QPushButton("Set Priority", self)
+        self.set_priority_button.setToolTip("Give the selected queued job the priority above.")
+        self.set_priority_button.clicked.connect(self.set_job_priority)
+        self.clear_jobs_button = QPushButton("Clear Finished", self)
+        self.clear_jobs_button.clicked.connect(self.training_queue.remove_finished)
+        job_buttons_layout = QHBoxLayout()
+        for button in (self.pause_job_button, self.cancel_job_button, self.retry_job_button, self.set_priority_button,
+                       self.clear_jobs_button):
+            job_buttons_layout.addWidget(button)
+        self.job_console = LogView(self)  # Output of the selected job
+        self.job_status_label = QLabel("", self)  # Epoch, throughput, memory and ETA of the selected job
+        self.loss_chart = MetricChart("Loss", self)
+        self.metrics_chart = MetricChart("Validation", self)
+        charts_layout = QHBoxLayout()
+        charts_layout.addWidget(self.loss_chart)
+        charts_layout.addWidget(self.metrics_chart)
+
         # --- Layout ---
         main_layout = QVBoxLayout(self)
         main_layout.addLayout(self.export_dataset_group_layout)
+        main_layout.addWidget(self.export_console)
         main_layout.addLayout(self.training_config_group_layout) # Add training config
+        main_layout.addLayout(self.queue_group_layout)
         main_layout.addWidget(self.start_training_button)
-        main_layout.addWidget(self.training_console)
+        main_layout.addWidget(self.jobs_table)
+        main_layout.addLayout(job_buttons_layout)
+        main_layout.addWidget(self.job_status_label)
+        main_layout.addLayout(charts_layout)
+        main_layout.addWidget(self.job_console)
         self.setLayout(main_layout) # Set the main layout. Very important!
 
+        self.training_queue.job_added.connect(self.job_added)
+        self.training_queue.job_changed.connect(self.job_changed)
+        self.training_queue.job_removed.connect(self.job_removed)
+        self.training_queue.job_output.connect(self.job_output)
+        self.training_queue.job_progress.connect(self.job_progress)
+        for job_id in self.training_queue.jobs:
+            self.job_added(job_id)
+        self.update_job_buttons()
+        self.training_queue.schedule()  # Jobs left in the queue by the last session
+
         # --- Data ---
-        self.process = None   # To store the QProcess instance
         self.image_paths = [] # Add the missing self.imagepaths
         self.classes = {}     # Add in the missing self.classes
+        self.annotation_store = AnnotationStore()
+        self.image_sizes = ImageSizeIndex()
+        self.hash_cache = PerceptualHashCache()
+        self.export_thread = None
 
     def browse_export_dir(self):
         """Opens a dialog to select the export directory."""
@@ -101,8 +249,31 @@ class TrainingTab(QWidget):
         if dir_path:
             self.export_dir_edit.setText(dir_path)
 
+    def validate_dataset(self):
+      """Computes dataset statistics and label problems and writes the JSON report."""
+      if not self.image_paths:
+          QMessageBox.warning(self, "Warning", "No images loaded to validate.")
+          return
+      # Next to the export if one is chosen, otherwise next to the images.
+      report_dir = self.export_dir_edit.text() or os.path.dirname(self.image_paths[0])
+      report_path = os.path.join(report_dir, REPORT_FILENAME)
+      QApplication.setOverrideCursor(Qt.WaitCursor)
+      try:
+          report = validate_dataset(self.image_paths, self.annotation_store, self.classes.keys(), self.image_sizes)
+          os.makedirs(report_dir, exist_ok=True)
+          write_report(report, report_path)
+      except Exception as e:
+          QMessageBox.critical(self, "Error", f"Error validating dataset: {e}")
+          return
+      finally:
+          QApplication.restoreOverrideCursor()
+      self.export_console.append(format_report(report))
+      self.export_console.append(f"Report written to {report_path}")
+
     def export_dataset(self):
       """Exports the labeled data in YOLO format."""
+      if self.export_thread is not None:
+          return
       export_dir = self.export_dir_edit.text()
       train_percent = self.train_percent_spinbox.value()
       valid_percent = self.valid_percent_spinbox.value()
@@ -120,193 +291,272 @@ class TrainingTab(QWidget):
           QMessageBox.warning(self, "Warning", "Train, Validation, and Test percentages must sum to 100%.")
           return
 
-      # Create export directories
-      try:
-          os.makedirs(export_dir, exist_ok=True)
-          train_img_dir = os.path.join(export_dir, "train", "images")
-          train_label_dir = os.path.join(export_dir, "train", "labels")
-          valid_img_dir = os.path.join(export_dir, "valid", "images")
-          valid_label_dir = os.path.join(export_dir, "valid", "labels")
-          test_img_dir = os.path.join(export_dir, "test", "images")
-          test_label_dir = os.path.join(export_dir, "test", "labels")
-          os.makedirs(train_img_dir, exist_ok=True)
-          os.makedirs(train_label_dir, exist_ok=True)
-          os.makedirs(valid_img_dir, exist_ok=True)
-          os.makedirs(valid_label_dir, exist_ok=True)
-          os.makedirs(test_img_dir, exist_ok=True)
-          os.makedirs(test_label_dir, exist_ok=True)
-      except OSError as e:
-          QMessageBox.critical(self, "Error", f"Error creating export directories: {e}")
+      exporter = DatasetExporter(
+          export_dir,
+          self.classes.keys(),
+          mode=self.export_mode_combo.currentText(),
+          max_workers=self.export_workers_spinbox.value(),
+          image_sizes=self.image_sizes
+      )
+      manifest = exporter.load_manifest()
+      if manifest is not None and "resume" in manifest:
+          self.export_console.append(f"Resuming the interrupted export ({len(manifest['resume']['pending'])} images left)")
+
+      # The whole pipeline runs in a worker thread so the window stays responsive.
+      self.export_thread = ExportThread(
+          exporter, self.image_paths, self.annotation_store,
+          (train_percent, valid_percent, test_percent),
+          seed=self.split_seed_spinbox.value(),
+          incremental=self.incremental_export_checkbox.isChecked(),
+          verify=self.verify_export_checkbox.isChecked(),
+          dedup_distance=self.dedup_distance_spinbox.value() if self.dedup_checkbox.isChecked() else None,
+          hash_cache=self.hash_cache,
+          resize_size=self.imgsz_spinbox.value() if self.preresize_checkbox.isChecked() else None,
+          shard_bytes=self.shard_size_spinbox.value() * 1024 * 1024 if self.pack_shards_checkbox.isChecked() else None,
+          parent=self
+      )
+      self.export_thread.progress.connect(self.update_export_progress)
+      self.export_thread.exported.connect(self.export_finished)
+      self.export_thread.failed.connect(self.export_failed)
+      self.export_thread.finished.connect(self.export_thread_finished)
+      self.set_exporting(True)
+      self.export_progress_bar.setRange(0, 0)  # Busy until the first progress report
+      self.export_progress_bar.setFormat("Preparing export...")
+      self.export_thread.start()
+
+    def cancel_export(self):
+      """Stops the running export; the next export resumes where it stopped."""
+      if self.export_thread is not None:
+          self.export_thread.cancel()
+          self.cancel_export_button.setEnabled(False)
+          self.export_progress_bar.setFormat("Cancelling...")
+
+    def set_exporting(self, exporting):
+      """Enables the controls that must not be used while an export runs."""
+      self.export_dataset_button.setEnabled(not exporting and bool(self.image_paths))
+      self.validate_dataset_button.setEnabled(not exporting and bool(self.image_paths))
+      self.cancel_export_button.setEnabled(exporting)
+      if exporting:
+          self.start_training_button.setEnabled(False)
+
+    def is_exporting(self):
+      return self.export_thread is not None
+
+    def update_export_progress(self, stage, done, total, bytes_done, eta):
+      """Progress signal of the ExportThread."""
+      self.export_progress_bar.setRange(0, max(total, 1))
+      self.export_progress_bar.setValue(done)
+      text = f"{stage} %v / %m"
+      if bytes_done:
+          text += f" ({bytes_done / (1024 * 1024):.0f} MB)"
+      if eta >= 0 and done < total:
+          minutes, seconds = divmod(int(eta), 60)
+          text += f", {minutes}:{seconds:02d} left"
+      self.export_progress_bar.setFormat(text)
+
+    def export_failed(self, message):
+      QMessageBox.critical(self, "Error", f"Error exporting dataset: {message}")
+
+    def export_thread_finished(self):
+      self.export_thread.deleteLater()
+      self.export_thread = None
+      self.set_exporting(False)
+      self.export_progress_bar.setFormat("%v / %m")
+
+    def export_finished(self, result):
+      """Writes train_config.yaml once the ExportThread has exported the dataset."""
+      export_dir = self.export_thread.exporter.export_dir
+      counts = result.split_counts
+      if result.duplicate_groups:
+          self.export_console.append(f"Near-duplicates: {result.duplicate_groups} groups kept in one split each")
+      self.export_console.append(f"Train images: {counts['train']}, Valid images: {counts['valid']}, "
+                                   f"Test images: {counts['test']}")
+      stats = result.stats
+      if stats is not None and stats.errors:
+          details = "\n".join(f"{os.path.basename(p)}: {e}" for p, e in stats.errors[:10])
+          QMessageBox.critical(self, "Error", f"Error copying {len(stats.errors)} files:\n{details}")
+          return
+      if result.resize_stats is not None and result.resize_stats.errors:
+          errors = result.resize_stats.errors
+          details = "\n".join(f"{os.path.basename(p)}: {e}" for p, e in errors[:10])
+          QMessageBox.critical(self, "Error", f"Error resizing {len(errors)} images:\n{details}")
+          return
+      if result.cancelled:
+          summary = f": {stats.summary()}" if stats is not None else ""
+          self.export_console.append(f"Export cancelled{summary}. Export again to resume.")
           return
-
-      # Split image paths into train, valid, and test sets
-      random.shuffle(self.image_paths)  # Shuffle for random split
-      num_images = len(self.image_paths)
-      train_split = int(num_images * train_percent / 100)
-      valid_split = int(num_images * valid_percent / 100)
-
-      train_images = self.image_paths[:train_split]
-      valid_images = self.image_paths[train_split : train_split + valid_split]
-      test_images = self.image_paths[train_split + valid_split:]
-
-      print(f"Train images: {len(train_images)}, Valid images: {len(valid_images)}, Test images: {len(test_images)}")
-
-      # Copy images and labels to the respective directories
-      image_sets = [
-          (train_images, train_img_dir, train_label_dir),
-          (valid_images, valid_img_dir, valid_label_dir),
-          (test_images, test_img_dir, test_label_dir),
-      ]
-
-      for image_list, img_dir, label_dir in image_sets:
-          for image_path in image_list:
-              try:
-                  # Copy image
-                  filename = os.path.basename(image_path)
-                  dest_image_path = os.path.join(img_dir, filename)
-                  shutil.copy2(image_path, dest_image_path) # Copy with metadata
-
-                  # Copy/Create label file (if annotations exist)
-                  if image_path in self.image_boxes:
-                      boxes = self.image_boxes[image_path]
-                      if boxes: # Only if there are any boxes annotated.
-                          label_filename = os.path.splitext(filename)[0] + ".txt"
-                          dest_label_path = os.path.join(label_dir, label_filename)
-                          self.save_annotation_to_path(image_path, dest_label_path, boxes)  #Need to define
-              except Exception as e:
-                  QMessageBox.critical(self, "Error", f"Error copying files: {e}")
-                  return  # Stop on error
-
-      # Create data.yaml file
-      data_yaml_path = os.path.join(export_dir, "data.yaml")
-      data_yaml_content = {
-          'train': os.path.relpath(train_img_dir, export_dir).replace("\\", "/"),  # Use relative paths
-          'val': os.path.relpath(valid_img_dir, export_dir).replace("\\", "/"),    # and forward slashes
-          'test': os.path.relpath(test_img_dir, export_dir).replace("\\", "/"),   # for cross-platform compatibility
-          'nc': len(self.classes),
-          'names': list(self.classes.keys())
-      }
-      try:
-          with open(data_yaml_path, 'w') as outfile:
-              yaml.dump(data_yaml_content, outfile, default_flow_style=False)
-      except Exception as e:
-           QMessageBox.critical(self, "Error", f"Error writing data.yaml: {e}")
-           return
 
       # Create train_config.yaml
-      train_config_path = os.path.join(export_dir, "train_config.yaml")
-      train_config_content = {
-          'model_weights': self.model_weights_combo.currentText(),  # Get selected model
-          'data_yaml': os.path.join(".", "data.yaml").replace("\\", "/"),  # Relative path
-          'epochs': self.epochs_spinbox.value(),      # Get values from spinboxes
-          'imgsz': self.imgsz_spinbox.value(),
-          'batch_size': self.batch_size_spinbox.value(),
-          'lr0': self.lr0_doublespinbox.value(),
-          'run_name': self.run_name_edit.text(),
-          'save_best': self.save_best_checkbox.isChecked()
-      }
       try:
-          with open(train_config_path, 'w') as outfile:
-              yaml.dump(train_config_content, outfile, default_flow_style=False)
+          write_train_config(
+              export_dir, result,
+              model_weights=self.model_weights_combo.currentText(),  # Get selected model
+              epochs=self.epochs_spinbox.value(),      # Get values from spinboxes
+              imgsz=self.imgsz_spinbox.value(),
+              batch_size=self.batch_size_spinbox.value(),
+              lr0=self.lr0_doublespinbox.value(),
+              run_name=self.run_name_edit.text(),
+              save_best=self.save_best_checkbox.isChecked(),
+              warm_start="best.pt" if self.warm_start_checkbox.isChecked() else None
+          )
       except Exception as e:
           QMessageBox.critical(self, "Error", f"Error writing train_config.yaml: {e}")
           return
 
-      QMessageBox.information(self, "Success", "Dataset exported successfully with training configuration!")
+      resize_summary = f"\nPre-resized: {result.resize_stats.summary()}" if result.resize_stats is not None else ""
+      QMessageBox.information(self, "Success", f"Dataset exported successfully with training configuration!\n\n{stats.summary()}{resize_summary}")
 
       # Enable the Start Training button
       self.start_training_button.setEnabled(True)
 
-    def save_annotation_to_path(self, image_path, label_file_path, boxes):
-      """Saves annotations for a single image to a specified path."""
-      img = cv2.imread(image_path)
-      if img is None:
-          print(f"Warning: Could not read image to get dimensions: {image_path}")
-          return
-
-      height, width, _ = img.shape
-
-      with open(label_file_path, "w+") as f:  # Open for writing (and create if it doesn't exist)
-          for x1, y1, x2, y2, class_name in boxes:
-              class_id = list(self.classes.keys()).index(class_name)
-
-              # Normalize coordinates (YOLO format)
-              x_center = ((x1 + x2) / 2) / width
-              y_center = ((y1 + y2) / 2) / height
-              box_width = (x2 - x1) / width
-              box_height = (y2 - y1) / height
-
-              f.write(f"{class_id} {x_center:.6f} {y_center:.6f} {box_width:.6f} {box_height:.6f}\n")
-
+    def shutdown(self):
+        """
+        Cancels a running export and waits for it, so its manifest checkpoint
+        is written. Running training jobs are stopped and queued again.
+        """
+        if self.export_thread is not None:
+            self.export_thread.cancel()
+            self.export_thread.wait()
+        self.training_queue.shutdown()
 
     def start_training(self):
-        """Starts the YOLOv8 training process in a separate QProcess."""
+        """Queues a training run of the exported train_config.yaml."""
         export_dir = self.export_dir_edit.text()
         if not export_dir:
             QMessageBox.warning(self, "Warning", "Please select an export directory first.")
             return
 
-        train_config_path = os.path.join(export_dir, "train_config.yaml")
+        train_config_path = os.path.join(export_dir, TRAIN_CONFIG_FILENAME)
         if not os.path.exists(train_config_path):
             QMessageBox.critical(self, "Error", f"train_config.yaml not found in {export_dir}.  Please export the dataset.")
             return
 
-
-        # Disable the Start Training button while training is in progress.
-        self.start_training_button.setEnabled(False)
-        QApplication.processEvents() # Process any pending events to keep UI responsive.
-
-        # Create a QProcess
-        self.process = QProcess(self)
-
-        # OPTIONAL: Merge stdout and stderr into a single stream.  Easier to handle.
-        self.process.setProcessChannelMode(QProcess.MergedChannels)
-
-        # Connect signals BEFORE starting the process
-        self.process.readyReadStandardOutput.connect(self.handle_stdout)
-        self.process.readyReadStandardError.connect(self.handle_stderr)  # Not used if merging channels
-        self.process.finished.connect(self.training_finished)
-        self.process.errorOccurred.connect(self.on_process_error)
-
-
-        # Build the command to run.  Use a separate script (train_script.py)
-        train_script_fullpath = os.path.join(os.path.dirname(__file__), "train_script.py")
-        command = [
-            sys.executable,  # Use the same Python interpreter as the GUI
-            "-u", # Unbuffered output.  VERY IMPORTANT for live output.
-            train_script_fullpath,
-            "--config",
-            train_config_path,
-        ]
-
-        self.training_console.append("Starting training process...")  # Debug message
-        self.process.start(command[0], command[1:])  # Start the process
-        self.training_console.append("Process started.  Waiting for output...")
-
-    def handle_stdout(self):
-      """Handles standard output from the training process."""
-      # If MergedChannels is used, both stdout and stderr will come through here
-      output = self.process.readAllStandardOutput().data().decode()
-      self.training_console.append(output)
-
-    def handle_stderr(self):
-      """Handles standard error from the training process."""
-      # Only used if NOT merging channels
-      error_output = self.process.readAllStandardError().data().decode()
-      self.training_console.append(f"<span style='color:red;'>{error_output}</span>")  # Display in red
-
-    def training_finished(self, exitCode, exitStatus):
-      """Called when the training process finishes."""
-      self.start_training_button.setEnabled(True)  # Re-enable the button
-      self.training_console.append(f"Training process finished with exit code {exitCode}")
-      QMessageBox.information(self, "Training Finished", "Training process has finished.")
-      self.process = None # Cleanup
-
-    def on_process_error(self, error):
-      """Handles errors that occur when starting or running the process."""
-      self.training_console.append(f"<span style='color:red;'>Process error occurred: {error}</span>")
-      self.start_training_button.setEnabled(True) # Re-enable button
-      self.process = None # Cleanup
+        extra_args = []
+        if self.pack_shards_checkbox.isChecked():
+            extra_args.append("--from-shards")  # Stream the shards to local scratch space first
+        try:
+            job = self.training_queue.add(
+                train_config_path,
+                priority=self.job_priority_spinbox.value(),
+                threads=self.job_threads_spinbox.value(),
+                pin_cpus=self.pin_cpus_checkbox.isChecked(),
+                extra_args=extra_args
+            )
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Error queueing the training run: {e}")
+            return
+        self.select_job(job.id)
+
+    # ---------------- JOBS -----------------
+
+    def selected_job(self):
+        row = self.jobs_table.currentRow()
+        if row < 0:
+            return None
+        return self.training_queue.jobs.get(self.jobs_table.item(row, 0).data(Qt.UserRole))
+
+    def select_job(self, job_id):
+        for row in range(self.jobs_table.rowCount()):
+            if self.jobs_table.item(row, 0).data(Qt.UserRole) == job_id:
+                self.jobs_table.selectRow(row)
+                return
+
+    def job_added(self, job_id):
+        row = self.jobs_table.rowCount()
+        self.jobs_table.insertRow(row)
+        for column in range(self.jobs_table.columnCount()):
+            self.jobs_table.setItem(row, column, QTableWidgetItem())
+        self.jobs_table.item(row, 0).setData(Qt.UserRole, job_id)
+        self.job_changed(job_id)
+
+    def job_changed(self, job_id):
+        job = self.training_queue.jobs[job_id]
+        for row in range(self.jobs_table.rowCount()):
+            if self.jobs_table.item(row, 0).data(Qt.UserRole) == job_id:
+                break
+        else:
+            return
+        budget = f"{job.threads} threads" if job.threads else "all CPUs"
+        if job.cpus:
+            budget += f" on {','.join(str(c) for c in job.cpus)}"
+        exit_code = "" if job.exit_code is None else str(job.exit_code)
+        for column, text in enumerate((str(job.id), job.name, job.status, str(job.priority), budget, exit_code)):
+            self.jobs_table.item(row, column).setText(text)
+        if job is self.selected_job():
+            self.update_job_buttons()
+
+    def job_removed(self, job_id):
+        for row in range(self.jobs_table.rowCount()):
+            if self.jobs_table.item(row, 0).data(Qt.UserRole) == job_id:
+                self.jobs_table.removeRow(row)
+                return
+
+    def job_output(self, job_id):
+        job = self.selected_job()
+        if job is not None and job.id == job_id:
+            self.job_console.log_updated()
+
+    def job_selected(self):
+        """Shows the console and charts of the selected job."""
+        job = self.selected_job()
+        self.job_console.set_log(job.log if job is not None else None)
+        if job is not None:
+            job.read_events()  # Loads the event file of runs from earlier sessions
+        self.update_job_progress(job)
+        self.update_job_buttons()
+
+    def job_progress(self, job_id):
+        job = self.selected_job()
+        if job is not None and job.id == job_id:
+            self.update_job_progress(job)
+
+    def update_job_progress(self, job):
+        """Redraws the loss and validation charts and the status line from the job's progress events."""
+        if job is None:
+            self.job_status_label.setText("")
+            self.loss_chart.set_series([])
+            self.metrics_chart.set_series([])
+            return
+        progress = job.progress
+        self.job_status_label.setText(progress.status_text())
+        names = sorted(progress.series)
+        self.loss_chart.set_series([(name, *progress.curve(name)) for name in names if "loss" in name])
+        self.metrics_chart.set_series([(name.replace("metrics/", "").replace("(B)", ""), *progress.curve(name))
+                                       for name in names if name.startswith("metrics/")])
+
+    def update_job_buttons(self):
+        job = self.selected_job()
+        status = job.status if job is not None else None
+        self.pause_job_button.setEnabled(status in (RUNNING, PAUSED, QUEUED, HELD)
+                                         and (status in (QUEUED, HELD) or can_pause()))
+        self.pause_job_button.setText("Resume" if status in (PAUSED, HELD) else ("Hold" if status == QUEUED else "Pause"))
+        self.cancel_job_button.setEnabled(job is not None and not job.is_finished)
+        self.retry_job_button.setEnabled(status in (FAILED, CANCELLED))
+        self.set_priority_button.setEnabled(status in (QUEUED, HELD))
+
+    def toggle_pause_job(self):
+        job = self.selected_job()
+        if job is None:
+            return
+        actions = {RUNNING: self.training_queue.pause, PAUSED: self.training_queue.resume,
+                   QUEUED: self.training_queue.hold, HELD: self.training_queue.release}
+        if job.status in actions:
+            actions[job.status](job.id)
+
+    def cancel_job(self):
+        job = self.selected_job()
+        if job is not None:
+            self.training_queue.cancel(job.id)
+
+    def retry_job(self):
+        job = self.selected_job()
+        if job is not None:
+            self.training_queue.retry(job.id)
+
+    def set_job_priority(self):
+        job = self.selected_job()
+        if job is not None:
+            self.training_queue.set_priority(job.id, self.job_priority_spinbox.value())
 
     def set_image_paths(self, image_paths):  #Added to pass image paths
         """Sets the image paths for the training tab (used during export)."""
@@ -315,6 +565,10 @@ class TrainingTab(QWidget):
     def set_classes(self, classes): # Added to pass classes data
       """Sets the classes dictionary (used during export)."""
       self.classes = classes
-    def set_image_boxes(self, image_boxes):  # Added
-        """Sets the image_boxes data (used during export)."""
-        self.image_boxes = image_boxes
\ No newline at end of file
+    def set_annotation_store(self, annotation_store):
+        """Sets the AnnotationStore holding the boxes (used during export)."""
+        self.annotation_store = annotation_store
+
+    def set_image_sizes(self, image_sizes):
+        """Sets the ImageSizeIndex shared with the annotation tab (used during export)."""
+        self.image_sizes = image_sizes
@@ -0,0 +1,89 @@
+# update_scheduler.py
+import time
+from collections import OrderedDict, deque
+
+from PyQt5.QtCore import QObject, QTimer
+
+FRAME_INTERVAL_MS = 16  # ~60 Hz display
+
+
+class LatencyStats:
+    """Rolling window of latency samples in milliseconds."""
+    def __init__(self, window=600):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, ms):
+        self.samples.append(ms)
+        self.count += 1
+
+    def summary(self):
+        if not self.samples:
+            return {"count": 0, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "mean_ms": sum(ordered) / len(ordered),
+            "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "max_ms": ordered[-1],
+        }
+
+
+class UpdateScheduler(QObject):
+    """
+    Coalesces UI work triggered by high-frequency events (dragging, resizing)
+    so each kind of update runs at most once per display frame.
+
+    Callers schedule a callback under a key; scheduling the same key again
+    before the next frame replaces the earlier callback. Two metrics are kept:
+    `latency` is, per key, the time from its first schedule() since the last
+    run to its callback having run (what the user perceives while dragging)
+    and `work` is the time spent running the callbacks of a frame.
+    """
+    def __init__(self, interval_ms=FRAME_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.interval_ms = interval_ms
+        self.latency = LatencyStats()
+        self.work = LatencyStats()
+        self._pending = OrderedDict()  # key -> (time of the key's first request, callback)
+        self._last_flush = 0.0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    def schedule(self, key, callback):
+        now = time.perf_counter()
+        first_request = self._pending[key][0] if key in self._pending else now
+        self._pending[key] = (first_request, callback)
+        if self._timer.isActive():
+            return
+        # Run on the next event loop pass if a frame has already elapsed since
+        # the last flush, otherwise wait for the rest of the frame.
+        elapsed_ms = (now - self._last_flush) * 1000
+        self._timer.start(max(0, int(self.interval_ms - elapsed_ms)))
+
+    def flush(self):
+        """Runs all pending callbacks now (also used before state they depend on changes)."""
+        self._timer.stop()
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, OrderedDict()
+        # Callbacks may schedule follow-up work for the next frame
+        start = time.perf_counter()
+        end = start
+        for first_request, callback in pending.values():
+            callback()
+            end = time.perf_counter()
+            self.latency.record((end - first_request) * 1000)
+        self._last_flush = end
+        self.work.record((end - start) * 1000)
+
+    def cancel(self, key):
+        self._pending.pop(key, None)
+
+    def report(self):
+        lat = self.latency.summary()
+        work = self.work.summary()
+        return (f"Drag latency: mean {lat['mean_ms']:.1f} ms, p95 {lat['p95_ms']:.1f} ms, "
+                f"max {lat['max_ms']:.1f} ms over {lat['count']} updates "
+                f"(work mean {work['mean_ms']:.1f} ms)")